@@ -0,0 +1,164 @@
+"""
+Artifact Store
+
+This module keeps the bodies of ideas, evaluations, tester feedback and problem
+drafts on local disk so that long-running batch workers do not accumulate them
+in memory. In offload mode the workflow state only holds `ArtifactHandle`s (the
+model class, its fingerprint digest and a title); bodies are loaded back lazily, and
+only when something actually reads them.
+
+Artifacts are content-addressed by their fingerprint, so storing the same model
+twice writes it once. Recently loaded bodies are kept in a small LRU cache.
+
+Usage:
+    # For every run in the process
+    GEN_PROBLEM_OFFLOAD=1 GEN_PROBLEM_ARTIFACT_DIR=/scratch/artifacts python gen_problem.py
+
+    # Reading offloaded bodies back
+    feedbacks = load_artifacts(final_state.artifacts, "feedback")
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import structures
+from codec import DEFAULT_CODEC, dump_model, load_model
+from functions import ProblemGenerationError
+from structures import ArtifactHandle, BaseModel
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_ARTIFACT_DIR = os.getenv("GEN_PROBLEM_ARTIFACT_DIR", "artifacts")
+DEFAULT_OFFLOAD = os.getenv("GEN_PROBLEM_OFFLOAD", "").lower() in ("1", "true", "yes")
+# Number of loaded bodies kept in memory per store.
+DEFAULT_CACHE_SIZE = 64
+
+
+# =============================================================================
+# Exceptions
+# =============================================================================
+
+class ArtifactError(ProblemGenerationError):
+    """Exception for missing or unreadable artifacts."""
+    pass
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class ArtifactStore:
+    """Content-addressed directory of serialized models with a bounded read cache."""
+
+    def __init__(self, root: str = DEFAULT_ARTIFACT_DIR, codec: str = DEFAULT_CODEC,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.root = root
+        self.codec = codec
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, BaseModel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, kind: str, fingerprint: str) -> str:
+        """File holding the body of one artifact."""
+        return os.path.join(self.root, kind, fingerprint[:2], f"{fingerprint}.{self.codec}")
+
+    def put(self, model: BaseModel, role: str) -> ArtifactHandle:
+        """Store `model` unless an identical body is already stored, and return its handle."""
+        kind = type(model).__name__
+        fingerprint = model.fingerprint()
+        path = self.path(kind, fingerprint)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename, so concurrent workers never read a partial body
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(dump_model(model, self.codec))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        title = getattr(model, "title", None) or getattr(model, "problem_title", "")
+        return ArtifactHandle(role=role, kind=kind, digest=fingerprint, title=title)
+
+    def load(self, handle: ArtifactHandle) -> BaseModel:
+        """Return the body of `handle`, reading it from disk on a cache miss."""
+        with self._lock:
+            if handle.digest in self._cache:
+                self._cache.move_to_end(handle.digest)
+                return self._cache[handle.digest]
+
+        cls = getattr(structures, handle.kind, None)
+        if not (isinstance(cls, type) and issubclass(cls, BaseModel)):
+            raise ArtifactError(f"Unknown artifact kind '{handle.kind}'")
+        try:
+            with open(self.path(handle.kind, handle.digest), "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            raise ArtifactError(f"Artifact {handle.kind}/{handle.digest} is missing from {self.root}")
+        # The store only holds dumps of validated models
+        model = load_model(cls, payload, self.codec, trusted=True)
+
+        with self._lock:
+            self._cache[handle.digest] = model
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return model
+
+    def __contains__(self, handle: ArtifactHandle) -> bool:
+        return os.path.exists(self.path(handle.kind, handle.digest))
+
+
+# =============================================================================
+# Process-Wide Store
+# =============================================================================
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    """Return the process-wide store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+def set_store(store: Optional[ArtifactStore]) -> None:
+    """Use `store` for every later offload; None restores the default store."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+# =============================================================================
+# State Helpers
+# =============================================================================
+
+def offload(role: str, models: Sequence[Optional[BaseModel]]) -> List[ArtifactHandle]:
+    """Store `models` (skipping None) and return their handles."""
+    store = get_store()
+    return [store.put(model, role) for model in models if model is not None]
+
+
+def load_artifacts(handles: Sequence[ArtifactHandle], role: str) -> List[BaseModel]:
+    """Load the bodies offloaded under `role` (e.g. from `state.artifacts`), oldest first."""
+    store = get_store()
+    return [store.load(handle) for handle in handles if handle.role == role]
+
+
+def load_artifact(handles: Sequence[ArtifactHandle], role: str) -> Optional[BaseModel]:
+    """Load the latest body offloaded under `role`, if any."""
+    for handle in reversed(handles):
+        if handle.role == role:
+            return get_store().load(handle)
+    return None
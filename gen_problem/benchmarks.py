@@ -0,0 +1,761 @@
+"""
+Micro-Benchmarks
+
+This module measures the local overhead of the problem generation system
+(pydantic validation, state mutation, ...) on synthetic data, so optimizations
+can be verified without calling any LLM. The whole workflow runs against the fake
+provider in fake_provider.py with zero latency, so only orchestration is timed.
+
+Results can be written to a JSON file and compared with a stored baseline; a
+metric that got worse by more than the tolerance is reported as a regression and
+makes the command exit with status 1. So does a missing baseline, unless the run
+saves one or is started with --no-compare. Baselines are machine-specific and are
+not committed. Metrics named *per_s, *per_min,
+*reduction_pct or *speedup are better when higher, all others when lower.
+
+Usage:
+    python benchmarks.py                 # run every benchmark
+    python benchmarks.py state_assignment
+    python benchmarks.py --save-baseline                 # store benchmark_baseline.json
+    python benchmarks.py --output results.json           # compare with the baseline
+    python benchmarks.py --no-compare                    # only report the results
+"""
+
+import argparse
+import dataclasses
+import functools
+import gc
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import timeit
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+from typing import Any, Callable, Dict, Iterator, List
+
+from langgraph.graph import StateGraph, END
+
+import artifact_store
+import codec
+import context_cache
+import corpus
+import dedup
+import fake_provider
+import gen_problem
+import metrics
+import run_log
+from context_cache import ContextCacheManager, FakeCacheProvider, estimate_tokens, use_context_cache
+from executor import ExecutionJob, run_jobs
+from fake_provider import FAKE_MODEL_NAME, FakeLLMProfile
+from functions import LLMProvider, ProblemGenerationService, convert_problem_to_markdown
+from prompt_assembly import assemble
+from prompt_encoding import PROMPT_ENCODINGS
+from prompts import TESTER_PROMPT
+from reporting import Reporter, headless, show, use_reporter
+from structures import (
+    CompetitiveViability, CompleteProblem, DifficultyLevel, Editorial, ExpertEvaluation, OverallRating,
+    ProblemIdea, ProblemGenerationState, ProblemRequirements, SolutionApproach, Subtask, TestCase, TestGenerator,
+    TesterFeedback
+)
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_BASELINE_PATH = os.getenv("GEN_PROBLEM_BENCH_BASELINE", "benchmark_baseline.json")
+# Relative change a metric may get worse by before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# Model whose prices bench_context_cache reports
+PRICED_MODEL = "gemini-2.5-pro-preview-03-25"
+_HIGHER_IS_BETTER = ("per_s", "per_min", "reduction_pct", "speedup")
+
+
+# =============================================================================
+# Sample Data
+# =============================================================================
+
+def make_sample_idea(index: int = 0, size: int = 1000) -> ProblemIdea:
+    """Build a problem idea whose text fields total roughly `size` characters per field."""
+    filler = ("lorem ipsum dolor sit amet " * (size // 27 + 1))[:size]
+    return ProblemIdea(
+        title=f"Sample Idea {index}",
+        description=f"{index} {filler}",
+        input_format=filler,
+        output_format=filler,
+        sample_input="3\n1 2 3",
+        sample_output="6",
+        key_insights=[filler] * 5,
+        time_complexity="O(n log n)",
+        space_complexity="O(n)",
+        engagement_factor=filler,
+        prerequisite_knowledge=["Prefix sums", "Binary search"]
+    )
+
+
+def make_sample_evaluation(idea: ProblemIdea, size: int = 1000) -> ExpertEvaluation:
+    """Build a recommended evaluation of `idea` with roughly `size` characters of feedback."""
+    filler = ("consectetur adipiscing elit " * (size // 28 + 1))[:size]
+    return ExpertEvaluation(
+        problem_title=idea.title,
+        overall_rating=OverallRating.GOOD,
+        total_score=80,
+        algorithm_quality=30,
+        creativity_originality=20,
+        problem_clarity=15,
+        requirement_alignment=10,
+        development_potential=5,
+        key_strengths=[filler] * 4,
+        major_concerns=[filler] * 3,
+        improvement_suggestions=[filler] * 5,
+        decision_reasoning=filler,
+        competitive_viability=CompetitiveViability.HIGH,
+        is_recommended=True
+    )
+
+
+def make_sample_problem(scale: int = 1) -> CompleteProblem:
+    """Build a complete problem whose text and code grow linearly with `scale`."""
+    text = "The kingdom has n cities connected by roads. " * (20 * scale)
+    code = "import sys\n" + "x = sum(range(10))\n" * (40 * scale) + "print(int(sys.stdin.read().split()[0]))\n"
+    return CompleteProblem(
+        title="Sample Problem",
+        difficulty=DifficultyLevel.DIV2_C,
+        algorithm_categories=["Graphs", "Shortest Paths"],
+        estimated_solve_time=45,
+        problem_statement=text,
+        input_specification=text,
+        output_specification="Print one integer.",
+        constraints="1 ≤ n ≤ 10^5, 1 ≤ w ≤ 10^9",
+        subtasks=[
+            Subtask(
+                name=f"Subtask {i}", points=100 // (2 * scale), constraints=f"1 ≤ n ≤ {10 ** (i + 1)}",
+                description=text[:200], expected_approach="Dijkstra", time_complexity="O(m log n)"
+            )
+            for i in range(1, 2 * scale + 1)
+        ],
+        test_cases=[
+            TestCase(input=f"{i}\n" + "1 2 3\n" * (10 * scale), output=str(i), explanation=text[:300])
+            for i in range(1, 3 * scale + 1)
+        ],
+        solution_approaches=[
+            SolutionApproach(
+                name=f"Approach {i}", description=text, complexity="O(n log n)", code=code,
+                suitable_for=[f"Subtask {j}" for j in range(1, 2 * scale + 1)]
+            )
+            for i in range(1, 3 + scale)
+        ],
+        editorial=Editorial(
+            problem_analysis=text,
+            key_insights=[text[:400]] * (3 * scale),
+            solution_progression=text,
+            proof_of_correctness=text,
+            implementation_details=text,
+            common_pitfalls=[text[:200]] * (2 * scale),
+            alternative_approaches=[text[:200]] * scale
+        ),
+        test_generators=[
+            TestGenerator(
+                name=f"gen_{i}", description=text[:200], code=code,
+                target_subtasks=[f"Subtask {i}"]
+            )
+            for i in range(1, 2 * scale + 1)
+        ],
+        tags=["graphs", "dijkstra"]
+    )
+
+
+def make_sample_state(idea_count: int = 9, idea_size: int = 20000, problem_scale: int = 0) -> ProblemGenerationState:
+    """Build a state holding several large evaluated ideas with one of them selected."""
+    ideas = [make_sample_idea(i, idea_size) for i in range(idea_count)]
+    evaluations = [make_sample_evaluation(idea, idea_size // 10) for idea in ideas]
+    return ProblemGenerationState(
+        requirements=ProblemRequirements(topic="Data Structures", constraints="n ≤ 10^5"),
+        ideas=ideas,
+        expert_evaluations=evaluations,
+        selected_idea=ideas[-1],
+        best_evaluation=evaluations[-1],
+        complete_problem=make_sample_problem(problem_scale) if problem_scale else None,
+        max_regenerations=3,
+        max_revisions=3
+    )
+
+
+class SampleWorkflowService:
+    """Stand-in for the LLM-backed workflow service that answers with sample models."""
+
+    def __init__(self, seed: int = 0):
+        self._rng = random.Random(seed)
+        self.problem_service = self
+
+    def create_problem_ideas(self, requirements: ProblemRequirements) -> List[ProblemIdea]:
+        # Random descriptions, so the duplicate filter never rejects sample ideas
+        return [
+            make_sample_idea(i, 2000).model_copy(update={
+                "description": " ".join(f"w{self._rng.getrandbits(30)}" for _ in range(60))
+            })
+            for i in range(3)
+        ]
+
+    def evaluate_ideas(self, requirements: ProblemRequirements, ideas: List[ProblemIdea]) -> List[ExpertEvaluation]:
+        return [make_sample_evaluation(idea, 2000) for idea in ideas]
+
+    def test_complete_problem(self, problem: CompleteProblem) -> List[TesterFeedback]:
+        # Serious enough to trigger one revision
+        return [TesterFeedback(solved=False, understanding_clarity=2, difficulty_perception="Hard",
+                               bad_feedbacks=["Statement is long " * 20] * 3)]
+
+    def complete_problem(self, problem_idea: ProblemIdea, expert_evaluation: ExpertEvaluation,
+                         problem_requirements: ProblemRequirements) -> CompleteProblem:
+        return make_sample_problem(2).model_copy(update={"title": problem_idea.description[:40]})
+
+    def reflect_on_feedback(self, problem: CompleteProblem, feedbacks: List[TesterFeedback]) -> CompleteProblem:
+        return problem.model_copy(update={"title": f"{problem.title} (revised)"})
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def measure(func: Callable[[], object], number: int = 200, repeat: int = 5) -> float:
+    """Return the best per-call time of `func` in microseconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def slope(xs: List[float], ys: List[float]) -> float:
+    """Least-squares slope of `ys` over `xs`."""
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    return (sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+            / sum((x - mean_x) ** 2 for x in xs))
+
+
+def measure_allocations(func: Callable[[], object]) -> float:
+    """Return the peak memory allocated during one call of `func` in KiB."""
+    with traced_allocations():
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        return (tracemalloc.get_traced_memory()[1] - before) / 1024
+
+
+@contextmanager
+def traced_allocations() -> Iterator[None]:
+    """Trace allocations within the block; tracing the caller started is left running."""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+@contextmanager
+def patched(target: Any, **values: Any) -> Iterator[None]:
+    """
+    Replace attributes of a module or object within the block and restore them afterwards.
+
+    Benchmarks swap process-wide state (services, singletons, configs) only through
+    this, so a failing benchmark never leaks its stand-ins into the next one.
+    """
+    missing = object()
+    saved = {name: getattr(target, name, missing) for name in values}
+    for name, value in values.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is missing:
+                delattr(target, name)
+            else:
+                setattr(target, name, value)
+
+
+def _legacy_selected_idea_check(state: ProblemGenerationState) -> None:
+    """The previous validate_selected_idea_exists: compare full model dumps."""
+    if state.selected_idea:
+        idea_list = [idea.model_dump() for idea in state.ideas]
+        if state.selected_idea.model_dump() not in idea_list:
+            raise ValueError("selected_idea must be one of the ideas in the 'ideas' list")
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+def bench_state_assignment() -> Dict[str, float]:
+    """Cost of one field assignment on a state holding large ideas (validate_assignment path)."""
+    results = {}
+    for idea_size in (1000, 20000, 200000):
+        state = make_sample_state(idea_size=idea_size)
+
+        def assign() -> None:
+            state.current_step = "benchmark"
+
+        results[f"assignment_us[idea_size={idea_size}]"] = measure(assign)
+        results[f"legacy_check_us[idea_size={idea_size}]"] = measure(
+            lambda: _legacy_selected_idea_check(state), number=20
+        )
+    return results
+
+
+def bench_fingerprint() -> Dict[str, float]:
+    """Cached canonical fingerprints versus re-serializing with model_dump_json."""
+    results = {}
+    for scale in (1, 10):
+        problem = make_sample_problem(scale)
+        problem.fingerprint()
+        results[f"model_dump_json_us[scale={scale}]"] = measure(problem.model_dump_json, number=50)
+        results[f"fingerprint_cached_us[scale={scale}]"] = measure(problem.fingerprint)
+        results[f"fingerprint_group_us[scale={scale}]"] = measure(lambda: problem.fingerprint("statement"))
+
+        def reassign_and_fingerprint() -> None:
+            problem.title = "Sample Problem"
+            problem.fingerprint()
+
+        results[f"fingerprint_after_assign_us[scale={scale}]"] = measure(reassign_and_fingerprint)
+    return results
+
+
+def _transition_graph(node: Callable[[ProblemGenerationState], Any], steps: int = 6):
+    """Compile a linear graph that runs `node` `steps` times."""
+    workflow = StateGraph(ProblemGenerationState)
+    for index in range(steps):
+        workflow.add_node(f"step_{index}", node)
+        workflow.add_edge(f"step_{index}", f"step_{index + 1}" if index + 1 < steps else END)
+    workflow.set_entry_point("step_0")
+    return workflow.compile()
+
+
+def bench_graph_transition() -> Dict[str, float]:
+    """Per-transition cost of nodes returning the whole state versus a partial update."""
+    def full_state_node(state: ProblemGenerationState) -> ProblemGenerationState:
+        state.current_step = "benchmark"
+        return state
+
+    def partial_update_node(state: ProblemGenerationState) -> Dict[str, Any]:
+        return {"current_step": "benchmark"}
+
+    steps = 6
+    results = {}
+    for problem_scale in (1, 10):
+        state = make_sample_state(problem_scale=problem_scale)
+        for label, node in (("full_state", full_state_node), ("partial_update", partial_update_node)):
+            app = _transition_graph(node, steps)
+            results[f"{label}_us_per_step[scale={problem_scale}]"] = measure(
+                lambda: app.invoke(state), number=5, repeat=3
+            ) / steps
+            results[f"{label}_peak_kib[scale={problem_scale}]"] = measure_allocations(lambda: app.invoke(state))
+
+        final = dict(state)
+        results[f"final_revalidate_us[scale={problem_scale}]"] = measure(
+            lambda: ProblemGenerationState(**final), number=20
+        )
+        results[f"final_construct_us[scale={problem_scale}]"] = measure(
+            lambda: ProblemGenerationState.model_construct(**final), number=20
+        )
+    return results
+
+
+def bench_reporting() -> Dict[str, float]:
+    """Cost of showing a complete problem with a sink attached versus headless."""
+    results = {}
+    for scale in (1, 10):
+        problem = make_sample_problem(scale)
+        for label, reporter in (("rendered", Reporter(sink=lambda text: None)), ("headless", headless())):
+            with use_reporter(reporter):
+                results[f"{label}_us[scale={scale}]"] = measure(lambda: show(problem.display), number=20)
+    return results
+
+
+def bench_codec() -> Dict[str, float]:
+    """Dump and load throughput of every codec versus pydantic JSON with full validation."""
+    problems = [make_sample_problem(2) for _ in range(200)]
+    results = {}
+
+    baseline = [problem.model_dump_json() for problem in problems]
+    results["pydantic_json_dump_per_s"] = len(problems) / (measure(
+        lambda: [problem.model_dump_json() for problem in problems], number=1, repeat=3) / 1e6)
+    results["pydantic_json_load_per_s"] = len(problems) / (measure(
+        lambda: [CompleteProblem.model_validate_json(payload) for payload in baseline], number=1, repeat=3) / 1e6)
+    results["pydantic_json_load_peak_kib"] = measure_allocations(
+        lambda: [CompleteProblem.model_validate_json(payload) for payload in baseline])
+
+    for name in sorted(codec.CODECS):
+        payloads = [codec.dump_model(problem, name) for problem in problems]
+        results[f"{name}_dump_per_s"] = len(problems) / (measure(
+            lambda: [codec.dump_model(problem, name) for problem in problems], number=1, repeat=3) / 1e6)
+        results[f"{name}_bytes_per_problem"] = sum(map(len, payloads)) / len(payloads)
+        for trusted in (False, True):
+            label = f"{name}_{'trusted' if trusted else 'validated'}"
+            load = lambda: [codec.load_model(CompleteProblem, payload, name, trusted) for payload in payloads]
+            results[f"{label}_load_per_s"] = len(problems) / (measure(load, number=1, repeat=3) / 1e6)
+            results[f"{label}_load_peak_kib"] = measure_allocations(load)
+    return results
+
+
+def bench_dedup() -> Dict[str, float]:
+    """Near-duplicate lookups against an index of 100k stored problems."""
+    index = dedup.DuplicateIndex()
+    data = random.Random(0).randbytes(100_000 * dedup.NUM_PERM * 4)
+    signatures = [dedup.signature_from_bytes(data, offset) for offset in range(0, len(data), dedup.NUM_PERM * 4)]
+    for number, signature in enumerate(signatures):
+        index.add_signature(f"problem:{number}", signature)
+    novel = dedup.as_signature([value ^ 1 for value in signatures[0]])
+
+    idea = make_sample_idea(0, 1000)
+    index.add_idea(idea)
+    variant = idea.description.replace("lorem", "lorem ipsum", 3)
+    signature = dedup.minhash(variant)
+
+    return {
+        "minhash_us[description=1000 chars]": measure(lambda: dedup.minhash(variant), number=50),
+        "lookup_us[entries=100k]": measure(lambda: index.query_signature(signature), number=200),
+        "lookup_matches": float(len(index.query_signature(signature))),
+        "lookup_us[entries=100k, novel]": measure(lambda: index.query_signature(novel), number=200),
+    }
+
+
+def bench_batch_memory(batch_size: int = 500) -> Dict[str, float]:
+    """Memory retained by a batch worker that keeps every finished run state, with and without offload."""
+    results = {}
+    with tempfile.TemporaryDirectory() as root, use_reporter(headless()), \
+            patched(gen_problem, workflow_service=SampleWorkflowService()), \
+            patched(artifact_store, _store=artifact_store.ArtifactStore(root)):
+        app = gen_problem.build_problem_generation_graph()
+        for offload in (False, True):
+            label = "offload" if offload else "inline"
+            finished, runs, footprints = [], [], []
+            with traced_allocations():
+                for run in range(1, batch_size + 1):
+                    state = ProblemGenerationState(
+                        requirements=ProblemRequirements(topic="Graphs", constraints="n ≤ 10^5"),
+                        max_regenerations=1, max_revisions=1, offload=offload
+                    )
+                    finished.append(app.invoke(state))
+                    if run % 25 == 0:
+                        gc.collect()
+                        runs.append(run)
+                        footprints.append(tracemalloc.get_traced_memory()[0] / 1024)
+            # Slope over the second half, once caches have warmed up
+            half = len(runs) // 2
+            results[f"{label}_kib_per_run[runs={batch_size}]"] = slope(runs[half:], footprints[half:])
+            results[f"{label}_retained_kib[runs={batch_size}]"] = footprints[-1]
+    return results
+
+
+def bench_context_cache(problems: int = 20) -> Dict[str, float]:
+    """Token usage and cost of completion, testing and reflection calls with and without prefix caching."""
+    service = ProblemGenerationService()
+    requirements = ProblemRequirements(topic="Graphs", constraints="n ≤ 10^5")
+    idea = make_sample_idea(0, 1000)
+    evaluation = make_sample_evaluation(idea, 1000)
+    problem = make_sample_problem(2)
+    feedback = TesterFeedback(solved=True, understanding_clarity=4, difficulty_perception="Medium")
+    calls = [
+        (service.completion_service, (idea, requirements, evaluation), CompleteProblem),
+        (service.testing_service, ("Statement_Tester", problem), TesterFeedback),
+        (service.reflection_service, (problem, [feedback]), CompleteProblem),
+    ]
+    results = {}
+    with ExitStack() as stack:
+        # The fake provider goes through the same context cache path as Gemini
+        for llm_service, _, _ in calls:
+            stack.enter_context(patched(
+                llm_service, config=dataclasses.replace(llm_service.config, provider=LLMProvider.FAKE)))
+        stack.enter_context(patched(fake_provider, _profile=FakeLLMProfile(time_scale=0.0, seed=0)))
+        root = stack.enter_context(tempfile.TemporaryDirectory())
+
+        for label, caching in (("uncached", False), ("cached", True)):
+            path = os.path.join(root, f"{label}.jsonl")
+            manager = ContextCacheManager(FakeCacheProvider())
+            with patched(metrics, _sink=metrics.MetricsSink(path)), patched(context_cache, _manager=manager), \
+                    use_context_cache(caching):
+                for _ in range(problems):
+                    for llm_service, args, output_type in calls:
+                        prompt = llm_service._build_prompt(*args)
+                        llm_service._invoke_with_retry(llm_service._get_llm_instance(output_type, prompt), prompt)
+
+            for row in metrics.summarize(metrics.load_records(path), by="stage"):
+                # Priced as Gemini; the fake model itself has no price
+                cost = metrics.estimate_cost(PRICED_MODEL, row["input_tokens"], row["cached_tokens"],
+                                             row["output_tokens"])
+                results[f"{label}_input_tokens[{row['stage']}]"] = row["input_tokens"] / problems
+                results[f"{label}_cached_tokens[{row['stage']}]"] = row["cached_tokens"] / problems
+                results[f"{label}_cache_hits[{row['stage']}]"] = row["cache_hits"] / problems
+                results[f"{label}_cost_usd_per_1k_problems[{row['stage']}]"] = cost / problems * 1000
+            results[f"{label}_caches_created"] = manager.provider_for(FAKE_MODEL_NAME).created
+    return results
+
+
+def bench_tester_views(rounds: int = 3) -> Dict[str, float]:
+    """Input tokens of every tester prompt with the whole problem versus the tester's view, per revision round."""
+    testing_service = ProblemGenerationService().testing_service
+    problem = make_sample_problem(2)
+    results = {}
+    for revision in range(rounds + 1):
+        for tester in TESTER_PROMPT:
+            full = estimate_tokens(str(assemble(TESTER_PROMPT[tester], complete_problem=problem.model_dump_json())))
+            view = estimate_tokens(str(testing_service._build_prompt(tester, problem)))
+            results[f"full_tokens[{tester},round={revision}]"] = full
+            results[f"view_tokens[{tester},round={revision}]"] = view
+            results[f"reduction_pct[{tester},round={revision}]"] = 100 * (1 - view / full)
+        # Revisions typically add samples, editorial pitfalls and a generator
+        problem = problem.model_copy(update={
+            "test_cases": problem.test_cases + [problem.test_cases[-1]],
+            "editorial": problem.editorial.model_copy(update={
+                "common_pitfalls": problem.editorial.common_pitfalls + [problem.problem_statement[:400]]
+            }),
+            "test_generators": problem.test_generators + [problem.test_generators[-1]],
+        })
+    return results
+
+
+def _recorded_problems(limit: int = 50) -> List[CompleteProblem]:
+    """Problems from the local corpus, or sample problems of growing size when there is none."""
+    if os.path.exists(corpus.DEFAULT_CORPUS_PATH):
+        with corpus.ProblemCorpus(corpus.DEFAULT_CORPUS_PATH) as store:
+            problems = [store.get(entry.id) for entry in store.query(limit=limit)]
+        if problems:
+            return problems
+    return [make_sample_problem(scale) for scale in range(1, 5)]
+
+
+def bench_prompt_encoding() -> Dict[str, float]:
+    """Prompt tokens and build time of every stage per payload encoding, over the recorded problems."""
+    problems = _recorded_problems()
+    service = ProblemGenerationService()
+    requirements = ProblemRequirements(topic="Graphs", constraints="n ≤ 10^5")
+    idea = make_sample_idea(0, 1000)
+    evaluation = make_sample_evaluation(idea, 1000)
+    feedbacks = [
+        TesterFeedback(solved=False, understanding_clarity=3, difficulty_perception="Hard",
+                       bad_feedbacks=["Sample 2 does not match the statement"], ambiguities=["Is the graph directed?"],
+                       improvement_suggestions=["Add a sample with a disconnected graph"])
+    ] * 3
+
+    results = {}
+    for encoding in PROMPT_ENCODINGS:
+        builders = {
+            "idea_creation": lambda problem: service.idea_service._build_prompt("algorithm_strategist", requirements),
+            "evaluation": lambda problem: service.evaluation_service._build_prompt(requirements, idea),
+            "completion": lambda problem: service.completion_service._build_prompt(idea, requirements, evaluation),
+            "reflection": lambda problem: service.reflection_service._build_prompt(problem, feedbacks),
+        }
+        for tester in TESTER_PROMPT:
+            builders[f"testing:{tester}"] = lambda problem, tester=tester: service.testing_service._build_prompt(tester, problem)
+        with ExitStack() as stack:
+            for llm_service in (service.idea_service, service.evaluation_service, service.completion_service,
+                                service.testing_service, service.reflection_service):
+                stack.enter_context(patched(
+                    llm_service, config=dataclasses.replace(llm_service.config, prompt_encoding=encoding)))
+
+            for stage, build in builders.items():
+                tokens = [estimate_tokens(build(problem).dynamic) for problem in problems]
+                results[f"{encoding}_input_tokens[{stage}]"] = sum(tokens) / len(tokens)
+                results[f"{encoding}_build_us[{stage}]"] = sum(
+                    measure(lambda: build(problem), number=20, repeat=3) for problem in problems) / len(problems)
+    return results
+
+
+def bench_graph_build() -> Dict[str, float]:
+    """Compiling the workflow graph, against fetching the compiled graph generate_problem shares across runs."""
+    gen_problem.get_problem_generation_graph()
+    return {
+        "graph_build_ms": measure(gen_problem.build_problem_generation_graph, number=5, repeat=3) / 1000,
+        "graph_get_us": measure(gen_problem.get_problem_generation_graph, number=1000),
+    }
+
+
+def bench_node_overhead(runs: int = 10) -> Dict[str, float]:
+    """Wall time per workflow node with instant fake LLM responses, i.e. orchestration overhead."""
+    service = gen_problem.workflow_service.problem_service
+    timings: Dict[str, List[float]] = {}
+    with ExitStack() as stack:
+        for llm_service in (service.idea_service, service.evaluation_service, service.completion_service,
+                            service.testing_service, service.reflection_service):
+            stack.enter_context(patched(
+                llm_service, config=dataclasses.replace(llm_service.config, provider=LLMProvider.FAKE)))
+        stack.enter_context(patched(fake_provider, _profile=FakeLLMProfile(
+            time_scale=0.0, acceptance_rate=1.0, revision_rate=0.3, seed=0)))
+        stack.enter_context(patched(dedup, _index=dedup.DuplicateIndex()))
+        stack.enter_context(patched(context_cache, _manager=ContextCacheManager()))
+        stack.enter_context(patched(metrics, _sink=metrics.MetricsSink("")))
+        root = stack.enter_context(tempfile.TemporaryDirectory())
+        # Node updates go to the run logs of the temporary directory too
+        stack.enter_context(patched(gen_problem, record_update=functools.partial(run_log.record_update, directory=root)))
+        stack.enter_context(use_reporter(headless()))
+
+        app = gen_problem.get_problem_generation_graph()
+        for _ in range(runs):
+            state = ProblemGenerationState(
+                requirements=ProblemRequirements(topic="Arrays", constraints="n ≤ 10^5"),
+                run_id=run_log.new_run_id(), max_regenerations=2, max_revisions=2
+            )
+            run_log.start_run(state, root)
+            started = time.perf_counter()
+            for update in app.stream(state, stream_mode="updates"):
+                finished = time.perf_counter()
+                for node in update:
+                    timings.setdefault(node, []).append(finished - started)
+                started = finished
+            run_log.finish_run(state.run_id, root)
+    return {f"node_us[{node}]": sum(times) / len(times) * 1e6 for node, times in timings.items()}
+
+
+def bench_problem_validation() -> Dict[str, float]:
+    """Validating large CompleteProblem objects from Python data and from JSON."""
+    results = {}
+    for scale in (1, 10, 50):
+        problem = make_sample_problem(scale)
+        data = problem.model_dump()
+        payload = problem.model_dump_json()
+        results[f"validate_us[scale={scale}]"] = measure(lambda: CompleteProblem.model_validate(data), number=10)
+        results[f"validate_json_us[scale={scale}]"] = measure(
+            lambda: CompleteProblem.model_validate_json(payload), number=10)
+    return results
+
+
+def bench_markdown() -> Dict[str, float]:
+    """Rendering the statement and solution markdown of a problem."""
+    return {
+        f"markdown_us[scale={scale}]": measure(lambda: convert_problem_to_markdown(problem), number=20)
+        for scale, problem in ((scale, make_sample_problem(scale)) for scale in (1, 10))
+    }
+
+
+def bench_run_log(updates: int = 200) -> Dict[str, float]:
+    """Recording node updates in the run log, including the final flush to disk."""
+    state = make_sample_state(problem_scale=2)
+    with tempfile.TemporaryDirectory() as root:
+        state.run_id = run_log.new_run_id()
+        started = time.perf_counter()
+        run_log.start_run(state, root)
+        for step in range(updates):
+            run_log.record_update(state, {"current_step": f"step_{step}", "revision_count": 1}, root)
+        recorded = time.perf_counter()
+        run_log.finish_run(state.run_id, root)
+        flushed = time.perf_counter()
+    return {
+        "record_update_us": (recorded - started) / updates * 1e6,
+        "finish_run_ms": (flushed - recorded) * 1000,
+    }
+
+
+def bench_execution(jobs: int = 64) -> Dict[str, float]:
+    """Sandboxed test execution throughput of the current backend on small generator programs."""
+    code = "import random\nn = random.randint(1, 1000)\nprint(n)\nprint(*[random.randint(1, 10**9) for _ in range(n)])\n"
+    run_jobs([ExecutionJob(code=code, seed=0)])
+    started = time.perf_counter()
+    results = run_jobs([ExecutionJob(code=code, seed=seed) for seed in range(1, jobs + 1)])
+    elapsed = time.perf_counter() - started
+    single = measure(lambda: run_jobs([ExecutionJob(code=code, seed=jobs + 1)]), number=1, repeat=3)
+    return {
+        "jobs_per_s": sum(result.ok for result in results) / elapsed,
+        "single_job_ms": single / 1000,
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, float]]] = {
+    "state_assignment": bench_state_assignment,
+    "fingerprint": bench_fingerprint,
+    "graph_transition": bench_graph_transition,
+    "reporting": bench_reporting,
+    "codec": bench_codec,
+    "dedup": bench_dedup,
+    "batch_memory": bench_batch_memory,
+    "context_cache": bench_context_cache,
+    "tester_views": bench_tester_views,
+    "prompt_encoding": bench_prompt_encoding,
+    "graph_build": bench_graph_build,
+    "node_overhead": bench_node_overhead,
+    "problem_validation": bench_problem_validation,
+    "markdown": bench_markdown,
+    "run_log": bench_run_log,
+    "execution": bench_execution,
+}
+
+
+# =============================================================================
+# Baselines
+# =============================================================================
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Describe every metric that got worse than its baseline value by more than `tolerance`."""
+    regressions = []
+    for name, metrics_ in results.items():
+        for metric, value in metrics_.items():
+            previous = baseline.get(name, {}).get(metric)
+            if not previous:
+                continue
+            change = (value - previous) / abs(previous)
+            if any(marker in metric for marker in _HIGHER_IS_BETTER):
+                change = -change
+            if change > tolerance:
+                regressions.append(f"{name}.{metric}: {previous:.2f} -> {value:.2f} ({change:+.0%} worse)")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the micro-benchmarks")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run (default: all of {list(BENCHMARKS)})")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--no-compare", action="store_true", help="Only report the results")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    compare_results = not (args.save_baseline or args.no_compare)
+    if compare_results and not os.path.exists(args.baseline):
+        raise SystemExit(f"No benchmark baseline at {args.baseline}. Store one on this machine with "
+                         f"--save-baseline, or pass --no-compare to only report the results.")
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name in args.names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {list(BENCHMARKS)}")
+            continue
+        print(f"\n=== {name} ===")
+        results[name] = BENCHMARKS[name]()
+        for metric, value in results[name].items():
+            print(f"{metric:<50} {value:>12.2f}")
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        # Benchmarks that were not run keep their previous baseline
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+            report["results"] = dict(previous.get("results", {}), **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return
+
+    if compare_results:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+        for regression in regressions:
+            print(f"  {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+LLM Cassettes
+
+This module records the structured responses of the LLM services in functions.py
+into cassette files and replays them in place of the real model, so the workflow
+in gen_problem.py can be run, profiled and regression-tested offline and
+deterministically.
+
+Every service gets one JSONL cassette in the cassette directory. A record holds
+the hash of the full prompt (and output type), the parsed response, the usage
+metadata reported by the provider and the latency of the call. When the same
+prompt was recorded several times (e.g. ideas regenerated from identical
+requirements), replay returns the recorded responses in order and then starts
+over. Replay can optionally sleep for the recorded latency, scaled by a factor,
+so timings stay realistic.
+
+Usage:
+    GEN_PROBLEM_CASSETTE_MODE=record python gen_problem.py
+    GEN_PROBLEM_CASSETTE_MODE=replay GEN_PROBLEM_CASSETTE_LATENCY=1 python gen_problem.py
+    python cassettes.py stats [--dir cassettes]
+
+Replayed ideas are indexed by the duplicate filter like live ones; point
+GEN_PROBLEM_DEDUP_INDEX at a scratch file when replaying the same cassette twice.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+CASSETTE_MODES = ("record", "replay")
+# Empty disables cassettes.
+DEFAULT_CASSETTE_MODE = os.getenv("GEN_PROBLEM_CASSETTE_MODE", "").lower()
+DEFAULT_CASSETTE_DIR = os.getenv("GEN_PROBLEM_CASSETTE_DIR", "cassettes")
+# Replay sleeps for the recorded latency times this factor; 0 replays instantly.
+DEFAULT_LATENCY_SCALE = float(os.getenv("GEN_PROBLEM_CASSETTE_LATENCY", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class CassetteMissError(LookupError):
+    """Raised on replay when a prompt was never recorded."""
+    pass
+
+
+def prompt_key(output_type: type, prompt: Any) -> str:
+    """Hash identifying a call: the output type and the full prompt text."""
+    return hashlib.sha256(f"{output_type.__name__}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# Cassette
+# =============================================================================
+
+@dataclass
+class CassetteRecord:
+    """One recorded LLM call."""
+    key: str
+    output_type: str
+    response: Dict[str, Any]
+    usage: Optional[Dict[str, Any]] = None
+    latency: float = 0.0
+
+
+class Cassette:
+    """Directory of per-service cassettes, in record or replay mode."""
+
+    def __init__(self, directory: str = DEFAULT_CASSETTE_DIR, mode: str = "replay",
+                 latency_scale: float = DEFAULT_LATENCY_SCALE):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Available: {list(CASSETTE_MODES)}")
+        self.directory = directory
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._records: Dict[str, Dict[str, List[CassetteRecord]]] = {}
+        self._positions: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def path(self, service: str) -> str:
+        return os.path.join(self.directory, f"{service}.jsonl")
+
+    # ------------------------------------------------------------------ record
+
+    def recorder(self, service: str, output_type: type, llm: Runnable) -> Runnable:
+        """Wrap a structured-output runnable (`include_raw=True`) so every parsed response is recorded."""
+        def record(prompt: Any, config: RunnableConfig) -> Dict[str, Any]:
+            started = time.perf_counter()
+            response = llm.invoke(prompt, config=config)
+            parsed = response.get("parsed") if isinstance(response, dict) else response
+            if parsed is not None and not (isinstance(response, dict) and response.get("parsing_error")):
+                usage = getattr(response.get("raw"), "usage_metadata", None) if isinstance(response, dict) else None
+                self.write(service, CassetteRecord(
+                    key=prompt_key(output_type, prompt),
+                    output_type=output_type.__name__,
+                    response=parsed.model_dump(mode="json"),
+                    usage=dict(usage) if usage else None,
+                    latency=time.perf_counter() - started,
+                ))
+            return response
+
+        return RunnableLambda(record)
+
+    def write(self, service: str, record: CassetteRecord) -> None:
+        line = json.dumps(record.__dict__, ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(service), "a", encoding="utf-8") as f:
+                f.write(line)
+
+    # ------------------------------------------------------------------ replay
+
+    def load(self, service: str) -> Dict[str, List[CassetteRecord]]:
+        """Recorded calls of one service by prompt key; read once per cassette."""
+        with self._lock:
+            if service not in self._records:
+                records: Dict[str, List[CassetteRecord]] = defaultdict(list)
+                if os.path.exists(self.path(service)):
+                    with open(self.path(service), encoding="utf-8") as f:
+                        for line in f:
+                            if line.strip():
+                                record = CassetteRecord(**json.loads(line))
+                                records[record.key].append(record)
+                logger.info(f"Loaded {sum(map(len, records.values()))} recorded {service} calls from {self.directory}")
+                self._records[service] = records
+            return self._records[service]
+
+    def next_record(self, service: str, key: str) -> CassetteRecord:
+        """The next recorded response to a prompt, cycling through repeated recordings."""
+        records = self.load(service).get(key)
+        if not records:
+            raise CassetteMissError(f"No recording of this {service} prompt in {self.path(service)} (key {key[:12]})")
+        with self._lock:
+            position = self._positions[(service, key)]
+            self._positions[(service, key)] = position + 1
+        return records[position % len(records)]
+
+    def replayer(self, service: str, output_type: type) -> Runnable:
+        """Stand-in for a structured-output model (`include_raw=True`) answering from the cassette."""
+        def replay(prompt: Any) -> Dict[str, Any]:
+            record = self.next_record(service, prompt_key(output_type, prompt))
+            if self.latency_scale > 0:
+                time.sleep(record.latency * self.latency_scale)
+            raw = AIMessage(content="", usage_metadata=record.usage) if record.usage else AIMessage(content="")
+            return {"raw": raw, "parsed": output_type.model_validate(record.response), "parsing_error": None}
+
+        return RunnableLambda(replay)
+
+
+# =============================================================================
+# Process-Wide Cassette
+# =============================================================================
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the process-wide cassette, or None when cassettes are disabled."""
+    global _cassette
+    if not DEFAULT_CASSETTE_MODE and _cassette is None:
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(mode=DEFAULT_CASSETTE_MODE)
+        return _cassette
+
+
+def set_cassette(cassette: Optional[Cassette]) -> None:
+    """Record or replay every later call with `cassette`; None restores the default."""
+    global _cassette
+    with _cassette_lock:
+        _cassette = cassette
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect recorded LLM cassettes")
+    parser.add_argument("--dir", default=DEFAULT_CASSETTE_DIR, help="Cassette directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="Recorded calls, distinct prompts and latency per service")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.dir)
+    services = sorted(name[:-len(".jsonl")] for name in os.listdir(args.dir) if name.endswith(".jsonl"))
+    print(f"{'service':<28} {'calls':>6} {'prompts':>8} {'mean s':>8} {'total s':>9}")
+    for service in services:
+        records = [record for group in cassette.load(service).values() for record in group]
+        latency = sum(record.latency for record in records)
+        print(f"{service:<28} {len(records):>6} {len(cassette.load(service)):>8} "
+              f"{latency / max(len(records), 1):>8.2f} {latency:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Output Checking
+
+This module decides whether a program's output is accepted. It provides a
+token-streaming comparator with whitespace and floating-point tolerance that
+never loads both outputs fully, support for LLM-written special judges that are
+prepared once and cached, and batch checking across all cores.
+"""
+
+import io
+import math
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Union
+
+from structures import CompleteProblem
+from executor import ExecutionJob, run_jobs, run_jobs_locally
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+CHUNK_SIZE = 1 << 16
+DEFAULT_ABS_TOLERANCE = 1e-6
+DEFAULT_REL_TOLERANCE = 1e-6
+CHECKER_TIME_LIMIT = 10.0
+
+# Outputs smaller than this are compared in-process; larger batches go to a pool.
+PARALLEL_THRESHOLD_BYTES = 1 << 20
+
+_WHITESPACE = b" \t\r\n\f\v"
+_FLOAT_TOKEN_RE = re.compile(rb"[+-]?(?:\d+\.\d*|\.\d+|\d+(?=[eE]))(?:[eE][+-]?\d+)?|[+-]?(?:inf|nan)", re.IGNORECASE)
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass
+class CheckJob:
+    """One output to check against the expected answer."""
+    input: str
+    expected: str
+    actual: str
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """Verdict for one checked output."""
+    accepted: bool
+    message: str = ""
+
+
+# =============================================================================
+# Token-Streaming Comparator
+# =============================================================================
+
+def stream_tokens(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield whitespace-separated tokens from a binary stream one chunk at a time."""
+    carry = b""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        parts = (carry + chunk).split()
+        if not parts:
+            carry = b""
+            continue
+        # The last token may continue in the next chunk
+        if chunk[-1] not in _WHITESPACE:
+            carry = parts.pop()
+        else:
+            carry = b""
+        yield from parts
+    if carry:
+        yield carry
+
+
+def _as_stream(data: Union[str, bytes, BinaryIO]) -> BinaryIO:
+    """Wrap in-memory outputs so they can be streamed like files."""
+    if isinstance(data, str):
+        return io.BytesIO(data.encode("utf-8"))
+    if isinstance(data, bytes):
+        return io.BytesIO(data)
+    return data
+
+
+def _tokens_match(expected: bytes, actual: bytes, abs_tol: float, rel_tol: float) -> bool:
+    """Compare two tokens exactly, or numerically when the expected token is a float."""
+    if expected == actual:
+        return True
+    if not _FLOAT_TOKEN_RE.fullmatch(expected):
+        return False
+    try:
+        want, got = float(expected), float(actual)
+    except ValueError:
+        return False
+    if math.isnan(want) or math.isnan(got):
+        return math.isnan(want) and math.isnan(got)
+    return math.isclose(want, got, rel_tol=rel_tol, abs_tol=abs_tol)
+
+
+def compare_outputs(
+    expected: Union[str, bytes, BinaryIO],
+    actual: Union[str, bytes, BinaryIO],
+    abs_tol: float = DEFAULT_ABS_TOLERANCE,
+    rel_tol: float = DEFAULT_REL_TOLERANCE
+) -> CheckResult:
+    """
+    Compare two outputs token by token, ignoring whitespace differences.
+
+    Integer and word tokens must match exactly; tokens written as floats in the
+    expected output are accepted within the absolute or relative tolerance.
+    """
+    expected_tokens = stream_tokens(_as_stream(expected))
+    actual_tokens = stream_tokens(_as_stream(actual))
+
+    position = 0
+    for want in expected_tokens:
+        position += 1
+        got = next(actual_tokens, None)
+        if got is None:
+            return CheckResult(False, f"output ended early: expected '{want.decode(errors='replace')}' at token {position}")
+        if not _tokens_match(want, got, abs_tol, rel_tol):
+            return CheckResult(False, (
+                f"token {position}: expected '{want.decode(errors='replace')[:50]}', "
+                f"found '{got.decode(errors='replace')[:50]}'"
+            ))
+
+    extra = next(actual_tokens, None)
+    if extra is not None:
+        return CheckResult(False, f"extra output after token {position}: '{extra.decode(errors='replace')[:50]}'")
+    return CheckResult(True)
+
+
+def compare_files(expected_path: str, actual_path: str, **tolerances) -> CheckResult:
+    """Stream-compare two output files without reading either fully."""
+    with open(expected_path, "rb") as expected, open(actual_path, "rb") as actual:
+        return compare_outputs(expected, actual, **tolerances)
+
+
+def _compare_job(job: CheckJob) -> CheckResult:
+    """Pool entry point for the default comparator."""
+    return compare_outputs(job.expected, job.actual)
+
+
+# =============================================================================
+# Special Judges
+# =============================================================================
+
+def run_special_judge(checker_code: str, jobs: List[CheckJob], max_workers: Optional[int] = None) -> List[CheckResult]:
+    """
+    Run an LLM-written special judge on a batch of outputs.
+
+    The judge is called as `checker <input> <output> <answer>` and accepts with
+    exit code 0. It is prepared (written or compiled) once and reused for every
+    job through the executor's program cache. Judges read files from this
+    host, so they always run locally.
+    """
+    with tempfile.TemporaryDirectory(prefix="gen_problem_check_") as work_dir:
+        runs = []
+        for index, job in enumerate(jobs):
+            paths = []
+            for name, content in (("in", job.input), ("out", job.actual), ("ans", job.expected)):
+                path = os.path.join(work_dir, f"{index}.{name}")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                paths.append(path)
+            runs.append(ExecutionJob(code=checker_code, args=paths, time_limit=CHECKER_TIME_LIMIT))
+
+        return [
+            CheckResult(result.ok, (result.stderr or result.stdout).strip()[:500])
+            for result in run_jobs_locally(runs, max_workers=max_workers)
+        ]
+
+
+# =============================================================================
+# Batch Checking
+# =============================================================================
+
+def check_batch(problem: CompleteProblem, jobs: List[CheckJob], max_workers: Optional[int] = None) -> List[CheckResult]:
+    """Check a batch of outputs across all cores with the problem's special judge or the default comparator."""
+    if not jobs:
+        return []
+    if problem.special_judge:
+        return run_special_judge(problem.special_judge, jobs, max_workers=max_workers)
+
+    if sum(len(job.expected) + len(job.actual) for job in jobs) < PARALLEL_THRESHOLD_BYTES:
+        return [_compare_job(job) for job in jobs]
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(_compare_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def stress_test(problem: CompleteProblem, testcases: List[dict], time_limit: float = CHECKER_TIME_LIMIT) -> List[dict]:
+    """
+    Cross-check every solution on the cases of the subtasks it claims to solve.
+
+    Returns:
+        List of failures, each with the solution name, case id and checker message
+    """
+    runs = []
+    for solution in problem.solution_approaches[:-1]:
+        for case in testcases:
+            if "input" in case and set(case.get("subtasks", [])) & set(solution.suitable_for):
+                runs.append((solution, case))
+
+    results = run_jobs([
+        ExecutionJob(code=solution.code, language=solution.language, stdin=case["input"], time_limit=time_limit)
+        for solution, case in runs
+    ])
+
+    failures = []
+    finished = []
+    for (solution, case), result in zip(runs, results):
+        if result.ok:
+            finished.append((solution, case, result.stdout))
+        else:
+            reason = "time limit exceeded" if result.timed_out else f"runtime error: {result.stderr.strip()[:200]}"
+            failures.append({"solution": solution.name, "case_id": case["id"], "message": reason})
+
+    verdicts = check_batch(problem, [
+        CheckJob(input=case["input"], expected=case["output"], actual=output)
+        for _, case, output in finished
+    ])
+    for (solution, case, _), verdict in zip(finished, verdicts):
+        if not verdict.accepted:
+            failures.append({"solution": solution.name, "case_id": case["id"], "message": verdict.message})
+
+    return failures
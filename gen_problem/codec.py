@@ -0,0 +1,220 @@
+"""
+Fast Model Serialization
+
+This module persists and reloads the models in structures.py (states, problems,
+ideas, ...) through pluggable byte codecs: the standard library `json`, `orjson`
+and msgpack (via `ormsgpack` or `msgpack`). The optional codecs are used when the
+package is installed.
+
+Loading normally validates the data. Records the pipeline wrote itself can
+instead be loaded with `trusted=True`, which rebuilds the model tree directly
+and skips validation entirely; never use it for data from outside the pipeline.
+
+Archives hold many records in one file, each prefixed with its byte length, so
+thousands of problems can be streamed without loading the whole file at once.
+"""
+
+import json
+import struct
+import typing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, TypeVar
+
+from functions import ProblemGenerationError
+from structures import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:
+    ormsgpack = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_CODEC = "orjson" if orjson is not None else "json"
+_HEADER = struct.Struct(">I")
+
+M = TypeVar("M", bound=BaseModel)
+
+
+# =============================================================================
+# Exceptions
+# =============================================================================
+
+class CodecError(ProblemGenerationError):
+    """Exception for unknown or unavailable codecs and malformed archives."""
+    pass
+
+
+# =============================================================================
+# Codecs
+# =============================================================================
+
+def _json_dumps(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _available_codecs() -> Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = {"json": (_json_dumps, json.loads)}
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)
+    if ormsgpack is not None:
+        codecs["msgpack"] = (ormsgpack.packb, ormsgpack.unpackb)
+    elif msgpack is not None:
+        codecs["msgpack"] = (msgpack.packb, lambda payload: msgpack.unpackb(payload, raw=False))
+    return codecs
+
+
+CODECS = _available_codecs()
+
+
+def get_codec(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """Return the (dumps, loads) pair of a codec."""
+    if name not in CODECS:
+        raise CodecError(f"Codec '{name}' is not available. Available: {sorted(CODECS)}")
+    return CODECS[name]
+
+
+# =============================================================================
+# Trusted Construction
+# =============================================================================
+
+# Per model class: nested model fields as (model class, is list), and fields with defaults
+_construct_plans: Dict[type, Tuple[Dict[str, Tuple[type, bool]], Dict[str, Any]]] = {}
+
+
+def _nested_model(annotation: Any) -> Optional[Tuple[type, bool]]:
+    """Find the model class inside `Model`, `Optional[Model]` or `List[Model]`."""
+    origin = typing.get_origin(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    if origin in (list, List):
+        inner = _nested_model(typing.get_args(annotation)[0])
+        return (inner[0], True) if inner and not inner[1] else None
+    if origin in (typing.Union, typing.Annotated):
+        for arg in typing.get_args(annotation):
+            nested = _nested_model(arg)
+            if nested:
+                return nested
+    return None
+
+
+def _construct_plan(cls: type) -> Tuple[Dict[str, Tuple[type, bool]], Dict[str, Any]]:
+    if cls not in _construct_plans:
+        nested = {}
+        defaults = {}
+        for name, field in cls.model_fields.items():
+            model = _nested_model(field.annotation)
+            if model:
+                nested[name] = model
+            if not field.is_required():
+                defaults[name] = field
+        _construct_plans[cls] = (nested, defaults)
+    return _construct_plans[cls]
+
+
+def construct_trusted(cls: Type[M], data: Dict[str, Any]) -> M:
+    """
+    Rebuild a model tree from plain data without validating anything.
+    
+    Faster than `model_construct`, which still resolves every default and private
+    attribute in Python: instances are created directly with their field values
+    and fresh fingerprint state. Missing fields get their defaults and unknown keys
+    are ignored, as validation would do, but values are not checked, so only pass
+    trusted data.
+    """
+    nested, defaults = _construct_plan(cls)
+    fields = cls.model_fields
+    values = dict(data)
+    if any(name not in fields for name in values):
+        values = {name: value for name, value in values.items() if name in fields}
+    fields_set = set(values)
+    for name, (model_cls, is_list) in nested.items():
+        value = values.get(name)
+        if value is None:
+            continue
+        if is_list:
+            values[name] = [construct_trusted(model_cls, item) for item in value]
+        else:
+            values[name] = construct_trusted(model_cls, value)
+    if len(values) < len(fields):
+        for name, field in defaults.items():
+            if name not in values:
+                values[name] = field.get_default(call_default_factory=True)
+    
+    model = cls.__new__(cls)
+    object.__setattr__(model, "__dict__", values)
+    object.__setattr__(model, "__pydantic_fields_set__", fields_set)
+    object.__setattr__(model, "__pydantic_extra__", None)
+    object.__setattr__(model, "__pydantic_private__", {})
+    model._reset_fingerprint_state()
+    return model
+
+
+# =============================================================================
+# Single Models
+# =============================================================================
+
+def dump_model(model: BaseModel, codec: str = DEFAULT_CODEC) -> bytes:
+    """Serialize one model to bytes."""
+    dumps, _ = get_codec(codec)
+    if codec == "json":
+        return model.model_dump_json().encode("utf-8")
+    return dumps(model.model_dump(mode="json"))
+
+
+def load_model(cls: Type[M], payload: bytes, codec: str = DEFAULT_CODEC, trusted: bool = False) -> M:
+    """Deserialize one model; `trusted` skips validation for data this module wrote."""
+    if codec == "json" and not trusted:
+        return cls.model_validate_json(payload)
+    _, loads = get_codec(codec)
+    data = loads(payload)
+    return construct_trusted(cls, data) if trusted else cls.model_validate(data)
+
+
+# =============================================================================
+# Archives
+# =============================================================================
+
+def save_archive(path: str, models: Iterable[BaseModel], codec: str = DEFAULT_CODEC) -> int:
+    """Write length-prefixed records to `path` and return how many were written."""
+    count = 0
+    with open(path, "wb") as f:
+        for model in models:
+            payload = dump_model(model, codec)
+            f.write(_HEADER.pack(len(payload)))
+            f.write(payload)
+            count += 1
+    return count
+
+
+def iter_archive(path: str, cls: Type[M], codec: str = DEFAULT_CODEC, trusted: bool = False) -> Iterator[M]:
+    """Stream the models of an archive one by one."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            if len(header) < _HEADER.size:
+                raise CodecError(f"Truncated record header in archive '{path}'")
+            size = _HEADER.unpack(header)[0]
+            payload = f.read(size)
+            if len(payload) < size:
+                raise CodecError(f"Truncated record in archive '{path}'")
+            yield load_model(cls, payload, codec, trusted)
+
+
+def load_archive(path: str, cls: Type[M], codec: str = DEFAULT_CODEC, trusted: bool = False) -> List[M]:
+    """Load every model of an archive."""
+    return list(iter_archive(path, cls, codec, trusted))
@@ -0,0 +1,319 @@
+"""
+Provider Context Caching
+
+This module keeps provider-side caches of the static prompt prefixes built by
+prompt_assembly.py, so that the long instructions of a prompt are uploaded once
+and later calls only send (and pay full price for) their dynamic inputs.
+
+`ContextCacheManager` hands out one cache handle per (model, prefix): it creates
+the cache on first use, refreshes its TTL shortly before it expires and forgets
+handles the provider rejects (see `is_cache_error`), so the caller can fall back
+to sending the full prompt. Prefixes below the provider's minimum cacheable size
+are never cached. Caching is off unless GEN_PROBLEM_CONTEXT_CACHE=1; a single run
+can turn it on or off with `use_context_cache`. Provider caches are billed for as
+long as they live, so `cache_run` deletes them when the last run using them ends,
+and the process-wide manager deletes what is left when the process exits.
+
+Providers:
+    GeminiCacheProvider  Gemini explicit context caching (google-genai)
+    FakeCacheProvider    in-memory caches for the fake chat model (fake_provider.py),
+                         which reports cache reads in its usage metadata, to verify
+                         cache-hit accounting offline
+"""
+
+import atexit
+import datetime
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from fake_provider import FAKE_MODEL_NAME
+
+try:
+    from google import genai
+    from google.genai import types as genai_types
+except ImportError:
+    genai = None
+    genai_types = None
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+CONTEXT_CACHE_ENABLED = os.getenv("GEN_PROBLEM_CONTEXT_CACHE", "0").lower() in ("1", "true", "yes")
+DEFAULT_CACHE_TTL = int(os.getenv("GEN_PROBLEM_CONTEXT_CACHE_TTL", "3600"))
+# Refresh a cache when it has less than this many seconds left.
+DEFAULT_REFRESH_MARGIN = 300
+# Minimum prefix size Gemini accepts for explicit caching.
+MIN_CACHE_TOKENS = 4096
+# Rough size estimate for mixed English/Vietnamese prompts.
+CHARS_PER_TOKEN = 3
+# How Gemini reports a cache that expired or was evicted, e.g.
+# "403 PERMISSION_DENIED. CachedContent not found (or permission denied)"
+_CACHE_ERROR_RE = re.compile(r"cached ?content\b.*\b(not found|expired|does not exist|permission denied)", re.I | re.S)
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of `text`."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+class ContextCacheError(Exception):
+    """Exception for a cache handle the provider no longer holds."""
+    pass
+
+
+def is_cache_error(error: BaseException) -> bool:
+    """Whether a model call failed because the cache it referred to is gone."""
+    return isinstance(error, ContextCacheError) or bool(_CACHE_ERROR_RE.search(str(error)))
+
+
+# =============================================================================
+# Providers
+# =============================================================================
+
+class CacheProvider:
+    """Creates, extends and deletes provider-side caches of a text prefix."""
+
+    def create(self, model: str, text: str, ttl: int) -> Tuple[str, float]:
+        """Cache `text` for `model`; return the cache name and its expiry timestamp."""
+        raise NotImplementedError
+
+    def refresh(self, name: str, ttl: int) -> float:
+        """Extend a cache by `ttl` seconds from now; return the new expiry timestamp."""
+        raise NotImplementedError
+
+    def delete(self, name: str) -> None:
+        raise NotImplementedError
+
+    def bind(self, llm: Any, name: str) -> Any:
+        """A copy of the chat model `llm` that refers to cache `name`."""
+        return llm.model_copy(update={"cached_content": name})
+
+
+class GeminiCacheProvider(CacheProvider):
+    """Gemini explicit context caching through the google-genai client."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        if genai is None:
+            raise ImportError("Gemini context caching requires the google-genai package")
+        self.client = genai.Client(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+
+    def create(self, model: str, text: str, ttl: int) -> Tuple[str, float]:
+        cache = self.client.caches.create(
+            model=model,
+            config=genai_types.CreateCachedContentConfig(
+                display_name=f"gen-problem-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}",
+                contents=[genai_types.Content(role="user", parts=[genai_types.Part(text=text)])],
+                ttl=f"{ttl}s",
+            ),
+        )
+        return cache.name, self._expiry(cache, ttl)
+
+    def refresh(self, name: str, ttl: int) -> float:
+        cache = self.client.caches.update(name=name, config=genai_types.UpdateCachedContentConfig(ttl=f"{ttl}s"))
+        return self._expiry(cache, ttl)
+
+    def delete(self, name: str) -> None:
+        self.client.caches.delete(name=name)
+
+    @staticmethod
+    def _expiry(cache: Any, ttl: int) -> float:
+        expire_time = getattr(cache, "expire_time", None)
+        if isinstance(expire_time, datetime.datetime):
+            return expire_time.timestamp()
+        return time.time() + ttl
+
+
+class FakeCacheProvider(CacheProvider):
+    """In-memory cache provider for the fake chat model."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.caches: Dict[str, Tuple[str, float]] = {}
+        self.created = 0
+        self.refreshed = 0
+        self.deleted = 0
+
+    def create(self, model: str, text: str, ttl: int) -> Tuple[str, float]:
+        self.created += 1
+        name = f"cachedContents/fake-{self.created}"
+        self.caches[name] = (text, self.clock() + ttl)
+        return name, self.caches[name][1]
+
+    def refresh(self, name: str, ttl: int) -> float:
+        if name not in self.caches:
+            raise KeyError(f"Unknown cache {name}")
+        self.refreshed += 1
+        self.caches[name] = (self.caches[name][0], self.clock() + ttl)
+        return self.caches[name][1]
+
+    def delete(self, name: str) -> None:
+        if self.caches.pop(name, None) is not None:
+            self.deleted += 1
+
+    def read(self, name: str) -> str:
+        """The text held by a live cache."""
+        if name not in self.caches or self.caches[name][1] <= self.clock():
+            raise ContextCacheError(f"Cache {name} does not exist or has expired")
+        return self.caches[name][0]
+
+    def bind(self, llm: Any, name: str) -> Any:
+        return llm.model_copy(update={"cached_content": name, "cache_provider": self})
+
+
+# =============================================================================
+# Cache Manager
+# =============================================================================
+
+@dataclass
+class CacheEntry:
+    """A live provider cache of one prompt prefix."""
+    name: str
+    expire_at: float
+
+
+class ContextCacheManager:
+    """Hands out provider cache handles for static prompt prefixes, creating and refreshing them."""
+
+    def __init__(self, provider: Optional[CacheProvider] = None, ttl: int = DEFAULT_CACHE_TTL,
+                 refresh_margin: int = DEFAULT_REFRESH_MARGIN, min_tokens: int = MIN_CACHE_TOKENS,
+                 clock: Callable[[], float] = time.time):
+        self._provider = provider
+        self._providers: Dict[str, CacheProvider] = {}
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.clock = clock
+        self._entries: Dict[Tuple[str, str], CacheEntry] = {}
+        # Runs inside `cache_run`; their caches are deleted when the last one ends
+        self._runs = 0
+        # Held while talking to the provider, so a prefix is never cached twice
+        self._lock = threading.Lock()
+
+    def provider_for(self, model: str) -> CacheProvider:
+        """The provider given to the manager, else the one serving `model`."""
+        if self._provider is not None:
+            return self._provider
+        kind = "fake" if model == FAKE_MODEL_NAME else "gemini"
+        if kind not in self._providers:
+            self._providers[kind] = FakeCacheProvider(self.clock) if kind == "fake" else GeminiCacheProvider()
+        return self._providers[kind]
+
+    def bind(self, model: str, llm: Any, name: str) -> Any:
+        """A copy of the chat model `llm` that refers to cache `name`."""
+        return self.provider_for(model).bind(llm, name)
+
+    def handle(self, model: str, prefix: str) -> Optional[str]:
+        """Return a live cache name for `prefix`, or None to send the full prompt instead."""
+        if estimate_tokens(prefix) < self.min_tokens:
+            return None
+        key = (model, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+            try:
+                if entry is None or entry.expire_at <= now:
+                    entry = CacheEntry(*self.provider_for(model).create(model, prefix, self.ttl))
+                    logger.info(f"Created context cache {entry.name} for a {len(prefix)}-char prefix of {model}")
+                elif entry.expire_at - now < self.refresh_margin:
+                    entry.expire_at = self.provider_for(model).refresh(entry.name, self.ttl)
+            except Exception as e:
+                logger.warning(f"Context caching unavailable, sending the full prompt: {e}")
+                self._entries.pop(key, None)
+                return None
+            self._entries[key] = entry
+            return entry.name
+
+    def invalidate(self, name: str) -> None:
+        """Forget a handle the provider rejected; the next call recreates the cache."""
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry.name == name]:
+                del self._entries[key]
+
+    def close(self) -> None:
+        """Delete every cache this manager created."""
+        with self._lock:
+            for (model, _), entry in self._entries.items():
+                try:
+                    self.provider_for(model).delete(entry.name)
+                except Exception as e:
+                    logger.warning(f"Failed to delete context cache {entry.name}: {e}")
+            self._entries.clear()
+
+    def begin_run(self) -> None:
+        """Note a run that uses this manager's caches."""
+        with self._lock:
+            self._runs += 1
+
+    def end_run(self) -> None:
+        """Note the end of a run; the last one to end deletes the caches."""
+        with self._lock:
+            self._runs -= 1
+            if self._runs > 0:
+                return
+        self.close()
+
+
+_manager: Optional[ContextCacheManager] = None
+_manager_lock = threading.Lock()
+# Per-run override of CONTEXT_CACHE_ENABLED; None keeps the default
+_enabled: ContextVar[Optional[bool]] = ContextVar("gen_problem_context_cache", default=None)
+
+
+@contextmanager
+def use_context_cache(enabled: Optional[bool]) -> Iterator[None]:
+    """Turn context caching on or off within the block; None keeps the current setting."""
+    if enabled is None:
+        yield
+        return
+    token = _enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _enabled.reset(token)
+
+
+@contextmanager
+def cache_run(enabled: Optional[bool]) -> Iterator[None]:
+    """`use_context_cache` for a whole run, deleting its caches once no other run uses them."""
+    with use_context_cache(enabled):
+        manager = get_cache_manager()
+        if manager is None:
+            yield
+            return
+        manager.begin_run()
+        try:
+            yield
+        finally:
+            manager.end_run()
+
+
+def get_cache_manager() -> Optional[ContextCacheManager]:
+    """Return the process-wide manager, or None when context caching is disabled."""
+    global _manager
+    enabled = _enabled.get()
+    if enabled is False or (enabled is None and not CONTEXT_CACHE_ENABLED and _manager is None):
+        return None
+    with _manager_lock:
+        if _manager is None:
+            _manager = ContextCacheManager()
+            atexit.register(_manager.close)
+        return _manager
+
+
+def set_cache_manager(manager: Optional[ContextCacheManager]) -> None:
+    """Use `manager` for every later call; None restores the default."""
+    global _manager
+    with _manager_lock:
+        _manager = manager
@@ -0,0 +1,338 @@
+"""
+Problem Corpus Store
+
+This module keeps every generated problem in a local SQLite database instead of
+loose markdown files. Each `CompleteProblem` is stored once per content
+fingerprint, indexed by topic, difficulty, algorithm categories and tags, with
+a full-text (FTS5) index over its title and statement and references to its
+test case artifacts. Queries stay fast at tens of thousands of problems.
+
+Usage:
+    python corpus.py stats
+    python corpus.py search "segment tree" --category "Data Structures"
+    python corpus.py export demo/ [--ids 3 7]
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from codec import DEFAULT_CODEC, dump_model, load_model
+from functions import ProblemGenerationError, convert_problem_to_markdown
+from structures import CompleteProblem
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_CORPUS_PATH = os.getenv("GEN_PROBLEM_CORPUS", os.path.join("corpus", "problems.db"))
+# The codec is recorded per row, so changing it never breaks existing corpora
+CORPUS_CODEC = DEFAULT_CODEC
+SIMILAR_QUERY_TERMS = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    topic TEXT NOT NULL DEFAULT '',
+    difficulty TEXT NOT NULL,
+    estimated_solve_time INTEGER,
+    created_at REAL NOT NULL,
+    codec TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    testcase_path TEXT,
+    manifest TEXT
+);
+CREATE INDEX IF NOT EXISTS problems_topic ON problems(topic);
+CREATE INDEX IF NOT EXISTS problems_difficulty ON problems(difficulty);
+CREATE TABLE IF NOT EXISTS problem_categories (
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    category TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (category, problem_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS problem_tags (
+    problem_id INTEGER NOT NULL REFERENCES problems(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (tag, problem_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS problems_fts USING fts5(
+    title, statement, categories, tags, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+# =============================================================================
+# Exceptions and Data Classes
+# =============================================================================
+
+class CorpusError(ProblemGenerationError):
+    """Exception for corpus storage errors."""
+    pass
+
+
+@dataclass
+class CorpusEntry:
+    """Summary row of a stored problem, without the problem body."""
+    id: int
+    fingerprint: str
+    title: str
+    topic: str
+    difficulty: str
+    testcase_path: Optional[str]
+    score: Optional[float] = None
+
+
+# =============================================================================
+# Corpus
+# =============================================================================
+
+class ProblemCorpus:
+    """SQLite-backed store of generated problems."""
+
+    def __init__(self, path: str = DEFAULT_CORPUS_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        try:
+            self.conn.executescript(_SCHEMA)
+        except sqlite3.OperationalError as e:
+            raise CorpusError(f"Cannot initialize corpus at '{path}' (is FTS5 available?): {e}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ProblemCorpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------ writing
+
+    def add(
+        self,
+        problem: CompleteProblem,
+        topic: str = "",
+        testcase_path: Optional[str] = None,
+        manifest: Optional[Dict[str, List[int]]] = None
+    ) -> int:
+        """Store a problem and return its id; a problem already stored keeps its id."""
+        with self.conn:
+            return self._insert(problem, topic, testcase_path, manifest)
+
+    def ingest(self, records: Iterable[Tuple[CompleteProblem, str]]) -> List[int]:
+        """Bulk-store (problem, topic) pairs in a single transaction."""
+        with self.conn:
+            return [self._insert(problem, topic, None, None) for problem, topic in records]
+
+    def attach_testcases(self, problem_id: int, testcase_path: str, manifest: Optional[Dict[str, List[int]]] = None) -> None:
+        """Record where the test case artifacts of a problem live."""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE problems SET testcase_path = ?, manifest = COALESCE(?, manifest) WHERE id = ?",
+                (testcase_path, json.dumps(manifest) if manifest is not None else None, problem_id)
+            )
+
+    def _insert(
+        self,
+        problem: CompleteProblem,
+        topic: str,
+        testcase_path: Optional[str],
+        manifest: Optional[Dict[str, List[int]]]
+    ) -> int:
+        fingerprint = problem.fingerprint()
+        row = self.conn.execute("SELECT id FROM problems WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        if row:
+            return row[0]
+
+        cursor = self.conn.execute(
+            "INSERT INTO problems (fingerprint, title, topic, difficulty, estimated_solve_time, created_at,"
+            " codec, payload, testcase_path, manifest) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                fingerprint, problem.title, topic, problem.difficulty, problem.estimated_solve_time, time.time(),
+                CORPUS_CODEC, dump_model(problem, CORPUS_CODEC), testcase_path,
+                json.dumps(manifest) if manifest is not None else None
+            )
+        )
+        problem_id = cursor.lastrowid
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO problem_categories (problem_id, category) VALUES (?, ?)",
+            [(problem_id, category) for category in problem.algorithm_categories]
+        )
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO problem_tags (problem_id, tag) VALUES (?, ?)",
+            [(problem_id, tag) for tag in problem.tags]
+        )
+        self.conn.execute(
+            "INSERT INTO problems_fts (rowid, title, statement, categories, tags) VALUES (?, ?, ?, ?, ?)",
+            (problem_id, problem.title, problem.problem_statement,
+             " ".join(problem.algorithm_categories), " ".join(problem.tags))
+        )
+        return problem_id
+
+    # ------------------------------------------------------------------ reading
+
+    def get(self, problem_id: int) -> CompleteProblem:
+        """Load a stored problem; rows were written by this module, so loading skips validation."""
+        row = self.conn.execute("SELECT codec, payload FROM problems WHERE id = ?", (problem_id,)).fetchone()
+        if row is None:
+            raise CorpusError(f"No problem with id {problem_id}")
+        return load_model(CompleteProblem, row[1], row[0], trusted=True)
+
+    def get_manifest(self, problem_id: int) -> Optional[Dict[str, List[int]]]:
+        row = self.conn.execute("SELECT manifest FROM problems WHERE id = ?", (problem_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM problems").fetchone()[0]
+
+    def query(
+        self,
+        text: Optional[str] = None,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        limit: int = 50
+    ) -> List[CorpusEntry]:
+        """Find problems by any combination of full-text terms and indexed attributes."""
+        clauses, params = [], []
+        if topic:
+            clauses.append("p.topic = ?")
+            params.append(topic)
+        if difficulty:
+            clauses.append("p.difficulty = ?")
+            params.append(difficulty)
+        if category:
+            clauses.append("p.id IN (SELECT problem_id FROM problem_categories WHERE category = ?)")
+            params.append(category)
+        if tag:
+            clauses.append("p.id IN (SELECT problem_id FROM problem_tags WHERE tag = ?)")
+            params.append(tag)
+
+        if text:
+            match = " ".join(_quote_term(term) for term in _terms(text))
+            if not match:
+                return []
+            sql = ("SELECT p.id, p.fingerprint, p.title, p.topic, p.difficulty, p.testcase_path, bm25(problems_fts)"
+                   " FROM problems_fts JOIN problems p ON p.id = problems_fts.rowid WHERE problems_fts MATCH ?")
+            params.insert(0, match)
+            order = "ORDER BY bm25(problems_fts)"
+        else:
+            sql = "SELECT p.id, p.fingerprint, p.title, p.topic, p.difficulty, p.testcase_path, NULL FROM problems p WHERE 1"
+            order = "ORDER BY p.id DESC"
+
+        sql += "".join(f" AND {clause}" for clause in clauses) + f" {order} LIMIT ?"
+        params.append(limit)
+        return [CorpusEntry(*row) for row in self.conn.execute(sql, params)]
+
+    def find_similar(self, problem: CompleteProblem, limit: int = 10) -> List[CorpusEntry]:
+        """
+        Rank stored problems by textual overlap with `problem` (novelty search).
+
+        Uses the most frequent distinctive terms of the title and statement as an
+        OR query; lower scores are more similar. The problem itself is excluded.
+        """
+        counts = Counter(_terms(f"{problem.title} {problem.problem_statement}"))
+        terms = [term for term, _ in counts.most_common(SIMILAR_QUERY_TERMS)]
+        if not terms:
+            return []
+        rows = self.conn.execute(
+            "SELECT p.id, p.fingerprint, p.title, p.topic, p.difficulty, p.testcase_path, bm25(problems_fts)"
+            " FROM problems_fts JOIN problems p ON p.id = problems_fts.rowid"
+            " WHERE problems_fts MATCH ? AND p.fingerprint != ? ORDER BY bm25(problems_fts) LIMIT ?",
+            (" OR ".join(_quote_term(term) for term in terms), problem.fingerprint(), limit)
+        )
+        return [CorpusEntry(*row) for row in rows]
+
+    # ---------------------------------------------------------------- exporting
+
+    def export(self, directory: str, ids: Optional[Sequence[int]] = None) -> List[str]:
+        """Write statement and solution markdown for the given (default: all) problems."""
+        os.makedirs(directory, exist_ok=True)
+        if ids is None:
+            ids = [row[0] for row in self.conn.execute("SELECT id FROM problems ORDER BY id")]
+
+        written = []
+        for problem_id in ids:
+            problem_statement, solution = convert_problem_to_markdown(self.get(problem_id))
+            for name, content in ((f"problem_statement{problem_id}.md", problem_statement),
+                                  (f"solution{problem_id}.md", solution)):
+                path = os.path.join(directory, name)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(content)
+                written.append(path)
+        return written
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+_TERM_PATTERN = re.compile(r"\w{3,}", re.UNICODE)
+
+
+def _terms(text: str) -> List[str]:
+    """Lowercase word terms of at least three characters."""
+    return [term.lower() for term in _TERM_PATTERN.findall(text) if not term.isdigit()]
+
+
+def _quote_term(term: str) -> str:
+    """Quote a term so FTS5 never parses it as query syntax."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query and export the problem corpus")
+    parser.add_argument("--db", default=DEFAULT_CORPUS_PATH, help="Corpus database path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("stats", help="Show corpus size and difficulty distribution")
+
+    search = subparsers.add_parser("search", help="Search problems")
+    search.add_argument("text", nargs="?", default=None)
+    search.add_argument("--topic")
+    search.add_argument("--difficulty")
+    search.add_argument("--category")
+    search.add_argument("--tag")
+    search.add_argument("--limit", type=int, default=20)
+
+    export = subparsers.add_parser("export", help="Export problems as markdown")
+    export.add_argument("directory")
+    export.add_argument("--ids", type=int, nargs="*", default=None)
+
+    args = parser.parse_args()
+    with ProblemCorpus(args.db) as corpus:
+        if args.command == "stats":
+            print(f"Problems: {corpus.count()}")
+            for difficulty, count in corpus.conn.execute(
+                "SELECT difficulty, COUNT(*) FROM problems GROUP BY difficulty ORDER BY difficulty"
+            ):
+                print(f"  {difficulty:<24} {count}")
+        elif args.command == "search":
+            entries = corpus.query(args.text, args.topic, args.difficulty, args.category, args.tag, args.limit)
+            for entry in entries:
+                print(f"{entry.id:>6}  {entry.difficulty:<22} {entry.title}")
+        else:
+            for path in corpus.export(args.directory, args.ids):
+                print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Coverage-Guided Test Selection
+
+This module shrinks the final test set. It runs the optimal solution on every
+candidate case under line and branch coverage instrumentation (`sys.monitoring`
+on Python 3.12+, `sys.settrace` otherwise), then keeps a small set of cases that
+preserves full coverage together with the largest test of every subtask.
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Set, Tuple
+
+from structures import CompleteProblem
+from executor import ExecutionJob, normalize_language, prepare_program, run_jobs_locally
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+COVERAGE_TIME_LIMIT = 30.0
+
+# Runs a target script and writes the covered lines and branches to a report.
+# Line events are disabled after their first hit so instrumentation cost stays
+# close to zero; branch events are only disabled when the interpreter reports
+# each branch direction separately.
+_COVERAGE_RUNNER = '''
+import json, runpy, sys
+
+target, report = sys.argv[1], sys.argv[2]
+sys.argv = [target]
+covered = set()
+monitoring = getattr(sys, "monitoring", None)
+
+if monitoring is not None:
+    tool = monitoring.COVERAGE_ID
+    events = monitoring.events
+    monitoring.use_tool_id(tool, "gen_problem")
+
+    def on_line(code, line):
+        if code.co_filename == target:
+            covered.add(("L", line))
+        return monitoring.DISABLE
+
+    def on_branch(code, source, destination):
+        if code.co_filename == target:
+            covered.add(("B", source, destination))
+            return monitoring.DISABLE if split_branches else None
+        return monitoring.DISABLE
+
+    enabled = events.LINE
+    monitoring.register_callback(tool, events.LINE, on_line)
+    split_branches = hasattr(events, "BRANCH_LEFT")
+    branch_events = (events.BRANCH_LEFT, events.BRANCH_RIGHT) if split_branches else (events.BRANCH,)
+    for event in branch_events:
+        monitoring.register_callback(tool, event, on_branch)
+        enabled |= event
+    monitoring.set_events(tool, enabled)
+else:
+    def trace_lines(frame, event, arg):
+        if event == "line":
+            covered.add(("L", frame.f_lineno))
+        return trace_lines
+
+    def trace_calls(frame, event, arg):
+        return trace_lines if frame.f_code.co_filename == target else None
+
+    sys.settrace(trace_calls)
+
+try:
+    runpy.run_path(target, run_name="__main__")
+finally:
+    sys.settrace(None)
+    with open(report, "w") as f:
+        json.dump(sorted(covered), f)
+'''
+
+
+# =============================================================================
+# Coverage Collection
+# =============================================================================
+
+def collect_coverage(problem: CompleteProblem, testcases: List[dict]) -> List[Set[Tuple]]:
+    """Run the optimal solution on every case in parallel and return each case's coverage set."""
+    solution = problem.get_optimal_solution()
+    target = prepare_program(solution.code, solution.language)
+
+    with tempfile.TemporaryDirectory(prefix="gen_problem_cov_") as report_dir:
+        reports = [os.path.join(report_dir, f"{index}.json") for index in range(len(testcases))]
+        # Report files live on this host, so coverage runs are never distributed
+        run_jobs_locally([
+            ExecutionJob(
+                code=_COVERAGE_RUNNER,
+                stdin=case["input"],
+                args=[target, report],
+                time_limit=COVERAGE_TIME_LIMIT
+            )
+            for case, report in zip(testcases, reports)
+        ])
+
+        coverage = []
+        for report in reports:
+            try:
+                with open(report, encoding="utf-8") as f:
+                    coverage.append({tuple(item) for item in json.load(f)})
+            except (OSError, ValueError):
+                coverage.append(set())
+        return coverage
+
+
+# =============================================================================
+# Selection
+# =============================================================================
+
+def _mandatory_cases(problem: CompleteProblem, testcases: List[dict]) -> Set[int]:
+    """Indices of the largest case per subtask plus every anti-naive case."""
+    mandatory = {index for index, case in enumerate(testcases) if case.get("anti_naive")}
+    for subtask in problem.subtasks:
+        members = [i for i, case in enumerate(testcases) if subtask.name in case.get("subtasks", [])]
+        if members:
+            mandatory.add(max(members, key=lambda i: len(testcases[i]["input"])))
+    return mandatory
+
+
+def select_testcases(problem: CompleteProblem, testcases: List[dict]) -> Tuple[List[dict], Dict[str, Any]]:
+    """
+    Select a small subset of test cases that keeps full coverage.
+
+    Starts from the mandatory cases, then greedily adds the case covering the
+    most still-uncovered lines and branches, preferring smaller inputs on ties.
+
+    Returns:
+        tuple: (selected test cases in original order, coverage report)
+    """
+    solution = problem.get_optimal_solution()
+    if not testcases or normalize_language(solution.language) != "python":
+        return list(testcases), {
+            "skipped": True,
+            "reason": "coverage requires a Python optimal solution" if testcases else "no test cases",
+            "candidate_count": len(testcases),
+            "selected_count": len(testcases)
+        }
+
+    coverage = collect_coverage(problem, testcases)
+    universe = set().union(*coverage)
+
+    selected = _mandatory_cases(problem, testcases)
+    covered = set().union(*(coverage[i] for i in selected)) if selected else set()
+
+    while covered != universe:
+        best = max(
+            (i for i in range(len(testcases)) if i not in selected),
+            key=lambda i: (len(coverage[i] - covered), -len(testcases[i]["input"]))
+        )
+        selected.add(best)
+        covered |= coverage[best]
+
+    kept = [testcases[i] for i in sorted(selected)]
+    report = {
+        "skipped": False,
+        "candidate_count": len(testcases),
+        "selected_count": len(kept),
+        "lines_covered": sorted(item[1] for item in universe if item[0] == "L"),
+        "branches_covered": sum(1 for item in universe if item[0] == "B"),
+        "selected_ids": [case["id"] for case in kept],
+        "dropped_ids": [case["id"] for i, case in enumerate(testcases) if i not in selected],
+        "per_case": {
+            case["id"]: {"lines": sum(1 for item in coverage[i] if item[0] == "L"),
+                         "branches": sum(1 for item in coverage[i] if item[0] == "B")}
+            for i, case in enumerate(testcases)
+        }
+    }
+    return kept, report
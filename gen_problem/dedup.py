@@ -0,0 +1,294 @@
+"""
+Near-Duplicate Detection
+
+This module keeps a MinHash/LSH index over the idea descriptions and problem
+statements generated so far, so that ideas which are variations of an earlier
+problem can be rejected before paying for evaluation, completion and testing.
+
+Texts are reduced to word 3-shingles and summarized by a 128-value MinHash
+signature. Signatures are split into 16 bands of 8 values; two texts become
+candidates when any band matches exactly, which happens with high probability
+above a Jaccard similarity of about 0.7. Candidates are then confirmed on the
+full signature. A lookup touches 16 hash buckets regardless of index size.
+
+The index is persisted as an append-only file of fixed-size signature records,
+so adding an entry never rewrites the file. Signatures are numpy arrays when
+numpy is installed, and `array('I')` arrays computed in pure Python (slower, same
+values) otherwise.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from structures import CompleteProblem, ProblemIdea
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+NUM_PERM = 128
+NUM_BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_DUPLICATE_THRESHOLD = 0.7
+DEFAULT_INDEX_PATH = os.getenv("GEN_PROBLEM_DEDUP_INDEX", os.path.join("corpus", "dedup.bin"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_UINT64_MASK = (1 << 64) - 1
+_UINT32_MASK = 0xFFFFFFFF
+
+
+def _permutation_parameter(name: str, index: int) -> int:
+    # Derived from a fixed seed: signatures are persisted, so the permutations must never change
+    digest = hashlib.blake2b(f"{name}{index}".encode("ascii"), digest_size=8, key=b"20240601").digest()
+    return int.from_bytes(digest, "little") % (_MERSENNE_PRIME - 1)
+
+
+_PERM_A = [_permutation_parameter("a", i) + 1 for i in range(NUM_PERM)]
+_PERM_B = [_permutation_parameter("b", i) for i in range(NUM_PERM)]
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Record header: key length, label length; followed by key, label and the signature
+_RECORD_HEADER = struct.Struct(">HH")
+_SIGNATURE_BYTES = NUM_PERM * 4
+
+if np is not None:
+    _NP_PERM_A = np.array(_PERM_A, dtype=np.uint64)
+    _NP_PERM_B = np.array(_PERM_B, dtype=np.uint64)
+
+# A signature: NUM_PERM unsigned 32-bit values, as a numpy array or an array('I')
+Signature = Any
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# MinHash
+# =============================================================================
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Lowercase word n-grams of `text` (single words for very short texts)."""
+    words = [word.lower() for word in _WORD_PATTERN.findall(text)]
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def as_signature(values: Sequence[int]) -> Signature:
+    """A signature holding `values` (unsigned 32-bit)."""
+    if np is not None:
+        return np.asarray(values, dtype=np.uint32)
+    return array("I", values)
+
+
+def signature_from_bytes(data: bytes, offset: int = 0) -> Signature:
+    """The signature stored at `offset` of `data` (native byte order, as written by the index)."""
+    if np is not None:
+        return np.frombuffer(data, dtype=np.uint32, count=NUM_PERM, offset=offset)
+    signature = array("I")
+    signature.frombytes(data[offset:offset + _SIGNATURE_BYTES])
+    return signature
+
+
+def _shingle_hash(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def minhash(text: str) -> Signature:
+    """Return the MinHash signature of `text` as NUM_PERM unsigned 32-bit values."""
+    grams = shingles(text)
+    if not grams:
+        return as_signature([_UINT32_MASK] * NUM_PERM)
+    # (a * h + b) mod p for every permutation and shingle; the product wraps modulo 2^64 (as in
+    # numpy), which keeps the permutations independent enough in practice.
+    # Truncating the minima to 32 bits halves memory; distinct minima collide with probability 2^-32
+    if np is not None:
+        hashes = np.fromiter((_shingle_hash(gram) for gram in grams), dtype=np.uint64, count=len(grams))
+        values = (np.outer(hashes, _NP_PERM_A) + _NP_PERM_B) % np.uint64(_MERSENNE_PRIME)
+        return (values.min(axis=0) & np.uint64(_UINT32_MASK)).astype(np.uint32)
+    hashes = [_shingle_hash(gram) for gram in grams]
+    return array("I", (
+        min(((a * h + b) & _UINT64_MASK) % _MERSENNE_PRIME for h in hashes) & _UINT32_MASK
+        for a, b in zip(_PERM_A, _PERM_B)
+    ))
+
+
+def estimate_similarity(first: Signature, second: Signature) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    if np is not None and isinstance(first, np.ndarray):
+        return float(np.count_nonzero(first == second)) / NUM_PERM
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+# =============================================================================
+# LSH Index
+# =============================================================================
+
+@dataclass
+class DuplicateMatch:
+    """An indexed entry similar to the queried text."""
+    key: str
+    label: str
+    similarity: float
+
+
+class DuplicateIndex:
+    """In-memory LSH index of MinHash signatures, optionally backed by an append-only file."""
+
+    def __init__(self, threshold: float = DEFAULT_DUPLICATE_THRESHOLD, path: Optional[str] = None):
+        self.threshold = threshold
+        self.path = path
+        self._rows = NUM_PERM // NUM_BANDS
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(NUM_BANDS)]
+        self._signatures: Dict[str, Signature] = {}
+        self._labels: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._signatures
+
+    def _bands(self, signature: Signature) -> List[bytes]:
+        return [signature[i * self._rows:(i + 1) * self._rows].tobytes() for i in range(NUM_BANDS)]
+
+    def add_signature(self, key: str, signature: Signature, label: str = "") -> None:
+        """Index a precomputed signature under `key`; re-adding a key is a no-op."""
+        with self._lock:
+            if self._insert(key, signature, label) and self.path:
+                self._append(key, signature, label)
+
+    def _insert(self, key: str, signature: Signature, label: str) -> bool:
+        if key in self._signatures:
+            return False
+        self._signatures[key] = signature
+        self._labels[key] = label
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            buckets[band].append(key)
+        return True
+
+    def _append(self, key: str, signature: Signature, label: str) -> None:
+        key_bytes = key.encode("utf-8")
+        label_bytes = label.encode("utf-8")[:0xFFFF]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.write(_RECORD_HEADER.pack(len(key_bytes), len(label_bytes)) + key_bytes + label_bytes
+                    + as_signature(signature).tobytes())
+
+    def add(self, key: str, text: str, label: str = "") -> None:
+        """Index a text under `key`."""
+        self.add_signature(key, minhash(text), label)
+
+    def query_signature(self, signature: Signature, threshold: Optional[float] = None) -> List[DuplicateMatch]:
+        """Return indexed entries at or above the similarity threshold, most similar first."""
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for buckets, band in zip(self._buckets, self._bands(signature)):
+                candidates.update(buckets.get(band, ()))
+            matches = []
+            for key in candidates:
+                similarity = estimate_similarity(signature, self._signatures[key])
+                if similarity >= threshold:
+                    matches.append(DuplicateMatch(key, self._labels[key], similarity))
+        return sorted(matches, key=lambda match: -match.similarity)
+
+    def query(self, text: str, threshold: Optional[float] = None) -> List[DuplicateMatch]:
+        """Return indexed entries similar to `text`."""
+        return self.query_signature(minhash(text), threshold)
+
+    # ---------------------------------------------------------------- problems
+
+    def add_idea(self, idea: ProblemIdea) -> None:
+        self.add(f"idea:{idea.fingerprint()}", idea.description, idea.title)
+
+    def add_problem(self, problem: CompleteProblem) -> None:
+        self.add(f"problem:{problem.fingerprint()}", problem.problem_statement, problem.title)
+
+    # ------------------------------------------------------------- persistence
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_INDEX_PATH, threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> "DuplicateIndex":
+        """Load an index file; new entries are appended to it. A missing file yields an empty index."""
+        index = cls(threshold, path)
+        if not os.path.exists(path):
+            return index
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + _RECORD_HEADER.size <= len(data):
+            key_length, label_length = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+            end = offset + key_length + label_length + _SIGNATURE_BYTES
+            if end > len(data):
+                logger.warning(f"Ignoring truncated record at the end of {path}")
+                break
+            key = data[offset:offset + key_length].decode("utf-8")
+            label = data[offset + key_length:offset + key_length + label_length].decode("utf-8", errors="replace")
+            signature = signature_from_bytes(data, end - _SIGNATURE_BYTES)
+            index._insert(key, signature, label)
+            offset = end
+        return index
+
+
+# =============================================================================
+# Process-Wide Index
+# =============================================================================
+
+_index: Optional[DuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index(path: str = DEFAULT_INDEX_PATH) -> DuplicateIndex:
+    """Return the process-wide index, loading it from disk on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex.load(path)
+            logger.info(f"Loaded duplicate index with {len(_index)} entries from {path}")
+        return _index
+
+
+def set_index(index: Optional[DuplicateIndex]) -> None:
+    """Use `index` for every later lookup; None reloads the default index on next use."""
+    global _index
+    with _index_lock:
+        _index = index
+
+
+def filter_duplicate_ideas(ideas: List[ProblemIdea], index: Optional[DuplicateIndex] = None) -> Tuple[List[ProblemIdea], List[Tuple[ProblemIdea, DuplicateMatch]]]:
+    """
+    Split ideas into novel ones and near-duplicates.
+
+    An idea is a duplicate when it resembles anything indexed so far or an
+    earlier idea of the same batch.
+
+    Returns:
+        tuple: (novel ideas, [(duplicate idea, best match), ...])
+    """
+    if index is None:
+        index = get_index()
+    novel, duplicates = [], []
+    batch = DuplicateIndex(index.threshold)
+    for idea in ideas:
+        signature = minhash(idea.description)
+        matches = index.query_signature(signature) + batch.query_signature(signature)
+        if matches:
+            duplicates.append((idea, max(matches, key=lambda match: match.similarity)))
+        else:
+            novel.append(idea)
+            batch.add_signature(f"idea:{idea.fingerprint()}", signature, idea.title)
+    return novel, duplicates
@@ -0,0 +1,457 @@
+"""
+Distributed Test Execution
+
+This module spreads sandboxed generator, solution and checker jobs across several
+machines. A coordinator embedded in the pipeline process listens on TCP or a Unix
+socket; workers on any host connect to it, pull jobs, run them through the local
+executor and send back the results.
+
+The coordinator keeps one job queue per worker connection. An idle worker steals
+from the back of the longest queue, jobs held by a lost worker are retried
+elsewhere, and jobs are keyed by content hash so identical jobs only run once
+(except jobs marked not cacheable, such as repeated timing runs).
+Successful results stay in a bounded LRU cache across batches; failures are only
+handed to the batches waiting for them, so a later batch runs the job again. A
+batch fails if no worker is connected for `worker_timeout` seconds. Listening
+beyond loopback requires a shared token. Everything can be tested on a single
+machine with `spawn_local_workers`.
+
+Usage:
+    # On the pipeline host
+    coordinator = Coordinator("0.0.0.0:7700", token="SECRET").start()
+    executor.set_backend(coordinator)
+
+    # On every worker host
+    python distributed.py worker --connect 10.0.0.5:7700 --slots 8 --token SECRET
+"""
+
+import argparse
+import hmac
+import ipaddress
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from executor import ExecutionError, ExecutionJob, ExecutionResult, run_program
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_ADDRESS = "127.0.0.1:7700"
+# Shared secret of the coordinator and its workers; required beyond loopback.
+DEFAULT_TOKEN = os.getenv("GEN_PROBLEM_WORKER_TOKEN", "")
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RESULT_CACHE_SIZE = 4096
+# Seconds a batch waits while no worker is connected before it fails.
+DEFAULT_WORKER_TIMEOUT = float(os.getenv("GEN_PROBLEM_WORKER_TIMEOUT", "60"))
+# Extra seconds a worker gets beyond the job's own time limit before it is presumed lost.
+RESULT_GRACE_PERIOD = 30.0
+_HEADER = struct.Struct(">I")
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Exceptions
+# =============================================================================
+
+class DistributedError(ExecutionError):
+    """Exception for coordinator and worker protocol errors."""
+    pass
+
+
+# =============================================================================
+# Wire Protocol
+# =============================================================================
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    """Send one length-prefixed JSON message."""
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock: socket.socket) -> Optional[dict]:
+    """Receive one length-prefixed JSON message, or None if the peer closed the connection."""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _recv_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload.decode("utf-8"))
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly `size` bytes from a socket."""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def parse_address(address: str) -> Tuple[int, object]:
+    """Parse `host:port` or `unix:/path` into a socket family and address."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def is_loopback(host: str) -> bool:
+    """Whether `host` only accepts connections from this machine."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# =============================================================================
+# Coordinator
+# =============================================================================
+
+class Coordinator:
+    """Work-stealing job coordinator implementing the executor backend interface."""
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, token: str = DEFAULT_TOKEN, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 cache_size: int = DEFAULT_RESULT_CACHE_SIZE, worker_timeout: float = DEFAULT_WORKER_TIMEOUT):
+        self.address = address
+        self.token = token
+        self.max_attempts = max_attempts
+        self.cache_size = cache_size
+        self.worker_timeout = worker_timeout
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = threading.Condition()
+        self._queues: Dict[int, Deque[str]] = {}
+        self._orphans: Deque[str] = deque()
+        self._jobs: Dict[str, ExecutionJob] = {}
+        self._attempts: Dict[str, int] = {}
+        # Results of jobs some batch is waiting for, and how many batches wait for each
+        self._results: Dict[str, ExecutionResult] = {}
+        self._waiters: Dict[str, int] = {}
+        # Successful results by content hash, least recently used first
+        self._cache: "OrderedDict[str, ExecutionResult]" = OrderedDict()
+        # Ids of submitted jobs that are not cacheable, each unique to its submission
+        self._uncached: Set[str] = set()
+        self._submissions = itertools.count()
+        self._next_worker = 0
+        self._closed = False
+        self._server: Optional[socket.socket] = None
+
+    # ------------------------------------------------------------------ server
+
+    def start(self) -> "Coordinator":
+        """
+        Start listening for workers in a background thread.
+
+        Raises:
+            DistributedError: If the address is reachable from other hosts and no token is set
+        """
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_INET and not self.token and not is_loopback(bind_address[0]):
+            raise DistributedError(f"A token is required to listen on {self.address}; workers could forge results")
+        if family == socket.AF_UNIX and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+        self._server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(bind_address)
+        self._server.listen()
+        if family == socket.AF_INET:
+            self.address = f"{bind_address[0]}:{self._server.getsockname()[1]}"
+
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        self.logger.info(f"Coordinator listening on {self.address}")
+        return self
+
+    def close(self) -> None:
+        """Stop accepting workers and release every waiting connection."""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        if self._server is not None:
+            self._server.close()
+
+    def __enter__(self) -> "Coordinator":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _accept_loop(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_worker, args=(conn,), daemon=True).start()
+
+    def _serve_worker(self, conn: socket.socket) -> None:
+        """Handle one worker connection: hand out jobs and collect results."""
+        with conn:
+            hello = recv_message(conn)
+            if (not hello or hello.get("type") != "hello"
+                    or not hmac.compare_digest(str(hello.get("token", "")), self.token)):
+                self.logger.warning("Rejected worker with invalid handshake")
+                return
+
+            with self._lock:
+                worker_id = self._next_worker
+                self._next_worker += 1
+                self._queues[worker_id] = deque()
+                self._lock.notify_all()
+
+            job_id = None
+            try:
+                while True:
+                    job_id = self._take_job(worker_id)
+                    if job_id is None:
+                        send_message(conn, {"type": "shutdown"})
+                        return
+
+                    job = self._jobs[job_id]
+                    send_message(conn, {"type": "job", "job_id": job_id, "job": asdict(job)})
+                    conn.settimeout(job.time_limit + RESULT_GRACE_PERIOD)
+                    reply = recv_message(conn)
+                    conn.settimeout(None)
+                    if not reply or reply.get("job_id") != job_id:
+                        raise DistributedError("worker sent no result")
+
+                    self._complete(job_id, ExecutionResult(**reply["result"]))
+                    job_id = None
+            except (OSError, ValueError, DistributedError) as e:
+                self.logger.warning(f"Lost worker {worker_id}: {e}")
+            finally:
+                self._drop_worker(worker_id, job_id)
+
+    # --------------------------------------------------------------- scheduling
+
+    def _take_job(self, worker_id: int) -> Optional[str]:
+        """Pop from the worker's own queue, else steal; block until work arrives."""
+        with self._lock:
+            while not self._closed:
+                if self._orphans:
+                    return self._orphans.popleft()
+                own = self._queues[worker_id]
+                if own:
+                    return own.popleft()
+                victim = max(self._queues.values(), key=len, default=None)
+                if victim:
+                    return victim.pop()
+                self._lock.wait()
+            return None
+
+    def _complete(self, job_id: str, result: ExecutionResult) -> None:
+        """Hand a result to the batches waiting for it (or cache it) and drop the job body."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._attempts.pop(job_id, None)
+            if self._waiters.get(job_id):
+                self._results[job_id] = result
+            else:
+                self._remember(job_id, result)
+            self._lock.notify_all()
+
+    def _remember(self, job_id: str, result: ExecutionResult) -> None:
+        """Cache a successful result, evicting the least recently used ones."""
+        if job_id in self._uncached:
+            self._uncached.discard(job_id)
+            return
+        if not result.ok:
+            return
+        self._cache[job_id] = result
+        self._cache.move_to_end(job_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _drop_worker(self, worker_id: int, in_flight: Optional[str]) -> None:
+        """Forget a worker, requeue its queue and retry the job it was running."""
+        with self._lock:
+            self._orphans.extend(self._queues.pop(worker_id, deque()))
+            if in_flight is not None and in_flight in self._jobs:
+                self._attempts[in_flight] = self._attempts.get(in_flight, 0) + 1
+                if self._attempts[in_flight] >= self.max_attempts:
+                    self._complete(in_flight, ExecutionResult(
+                        stdout="", stderr="worker lost too many times", returncode=-1, elapsed=0.0
+                    ))
+                else:
+                    self._orphans.append(in_flight)
+            self._lock.notify_all()
+
+    # --------------------------------------------------------------- interface
+
+    def run_jobs(self, jobs: Sequence[ExecutionJob], max_workers: Optional[int] = None) -> List[ExecutionResult]:
+        """
+        Distribute a batch of jobs and wait for every result, preserving input order.
+
+        Raises:
+            DistributedError: If the coordinator closes or no worker is connected for `worker_timeout` seconds
+        """
+        with self._lock:
+            # A job that is not cacheable gets an id of its own, so it is never merged or cached
+            job_ids = []
+            for job in jobs:
+                job_id = job.content_hash()
+                if not job.cacheable:
+                    job_id = f"{job_id}:{next(self._submissions)}"
+                    self._uncached.add(job_id)
+                job_ids.append(job_id)
+
+            ready: Dict[str, ExecutionResult] = {}
+            pending: List[str] = []
+            new_ids = []
+            for job_id, job in zip(job_ids, jobs):
+                if job_id in ready or job_id in pending:
+                    continue
+                cached = self._cache.get(job_id)
+                if cached is not None:
+                    self._cache.move_to_end(job_id)
+                    ready[job_id] = cached
+                    continue
+                pending.append(job_id)
+                self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+                if job_id not in self._jobs and job_id not in self._results:
+                    self._jobs[job_id] = job
+                    new_ids.append(job_id)
+
+            queues = list(self._queues.values())
+            for index, job_id in enumerate(new_ids):
+                (queues[index % len(queues)] if queues else self._orphans).append(job_id)
+            self._lock.notify_all()
+
+            try:
+                self._wait_for(pending)
+                ready.update((job_id, self._results[job_id]) for job_id in pending)
+            finally:
+                self._release(pending)
+            return [ready[job_id] for job_id in job_ids]
+
+    def _wait_for(self, job_ids: List[str]) -> None:
+        """Block until every job has a result; fail once no worker was connected for `worker_timeout`."""
+        idle_since = None
+        while not all(job_id in self._results for job_id in job_ids):
+            if self._closed:
+                raise DistributedError("coordinator closed before all jobs finished")
+            if self._queues:
+                idle_since = None
+                self._lock.wait()
+                continue
+            now = time.monotonic()
+            idle_since = idle_since if idle_since is not None else now
+            if now - idle_since >= self.worker_timeout:
+                raise DistributedError(f"No worker connected to {self.address} for {self.worker_timeout:g}s")
+            self._lock.wait(self.worker_timeout - (now - idle_since))
+
+    def _release(self, job_ids: Iterable[str]) -> None:
+        """Stop waiting for jobs: cache delivered results and cancel jobs nobody waits for anymore."""
+        for job_id in job_ids:
+            self._waiters[job_id] -= 1
+            if self._waiters[job_id]:
+                continue
+            del self._waiters[job_id]
+            result = self._results.pop(job_id, None)
+            if result is not None:
+                self._remember(job_id, result)
+                continue
+            # Not started yet: drop it; a job already running completes into the cache
+            for queue in [self._orphans, *self._queues.values()]:
+                if job_id in queue:
+                    queue.remove(job_id)
+                    self._jobs.pop(job_id, None)
+                    self._attempts.pop(job_id, None)
+                    self._uncached.discard(job_id)
+                    break
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+def _worker_slot(address: str, token: str, retry_delay: float) -> None:
+    """Run jobs over one connection until the coordinator shuts it down."""
+    family, connect_address = parse_address(address)
+    while True:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(connect_address)
+                send_message(sock, {"type": "hello", "token": token, "host": socket.gethostname()})
+                while True:
+                    message = recv_message(sock)
+                    if message is None or message.get("type") == "shutdown":
+                        return
+                    job = ExecutionJob(**message["job"])
+                    try:
+                        result = run_program(job)
+                    except ExecutionError as e:
+                        result = ExecutionResult(stdout="", stderr=str(e), returncode=-1, elapsed=0.0)
+                    send_message(sock, {"type": "result", "job_id": message["job_id"], "result": asdict(result)})
+        except OSError as e:
+            logger.warning(f"Connection to {address} failed: {e}; retrying in {retry_delay}s")
+            time.sleep(retry_delay)
+
+
+def run_worker(address: str, slots: Optional[int] = None, token: str = DEFAULT_TOKEN, retry_delay: float = 2.0) -> None:
+    """Serve the coordinator with one connection per slot (defaults to all cores)."""
+    threads = [
+        threading.Thread(target=_worker_slot, args=(address, token, retry_delay), daemon=True)
+        for _ in range(slots or os.cpu_count() or 1)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def spawn_local_workers(address: str, count: int, slots: int = 1, token: str = DEFAULT_TOKEN) -> List[subprocess.Popen]:
+    """Start `count` worker processes on this machine, e.g. to test the protocol."""
+    script = os.path.abspath(__file__)
+    # The token goes through the environment so it does not show up in process listings
+    env = {**os.environ, "GEN_PROBLEM_WORKER_TOKEN": token}
+    return [
+        subprocess.Popen(
+            [sys.executable, script, "worker", "--connect", address, "--slots", str(slots)],
+            cwd=os.path.dirname(script), env=env
+        )
+        for _ in range(count)
+    ]
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Distributed test execution worker")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker = subparsers.add_parser("worker", help="Run jobs for a coordinator")
+    worker.add_argument("--connect", default=DEFAULT_ADDRESS, help="host:port or unix:/path of the coordinator")
+    worker.add_argument("--slots", type=int, default=None, help="Concurrent jobs (default: all cores)")
+    worker.add_argument("--token", default=DEFAULT_TOKEN, help="Shared secret (default: GEN_PROBLEM_WORKER_TOKEN)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    run_worker(args.connect, slots=args.slots, token=args.token)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Sandboxed Program Execution
+
+This module runs LLM-written programs (test generators, solutions, validators)
+in isolated subprocesses with time and memory limits, caches prepared sources
+and compiled binaries by content hash, and fans batches of runs out across all
+CPU cores.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Protocol, Sequence
+
+from functions import ProblemGenerationError
+from tracing import span
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_TIME_LIMIT = 10.0
+DEFAULT_MEMORY_LIMIT_MB = 1024
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "gen_problem_exec")
+
+LANGUAGE_ALIASES = {
+    "python": "python",
+    "python3": "python",
+    "py": "python",
+    "cpp": "cpp",
+    "c++": "cpp",
+    "cpp17": "cpp",
+}
+
+# Resource limits are applied by the child itself, never through `preexec_fn`,
+# which can deadlock after fork while other threads are running.
+_SET_MEMORY_LIMIT = (
+    "def _limit(megabytes):\n"
+    "    try:\n"
+    "        import resource\n"
+    "        limit = int(megabytes) * 1024 * 1024\n"
+    "        if limit > 0:\n"
+    "            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))\n"
+    "    except (ImportError, ValueError, OSError):\n"
+    "        pass\n"
+)
+
+# Python programs are started through this bootstrap, which applies the memory
+# limit and seeds the module-level `random` generator before the program runs.
+_PYTHON_BOOTSTRAP = _SET_MEMORY_LIMIT + (
+    "import random, runpy, sys\n"
+    "path, seed, megabytes = sys.argv[1], sys.argv[2], sys.argv[3]\n"
+    "_limit(megabytes)\n"
+    "if seed:\n"
+    "    random.seed(int(seed))\n"
+    "sys.argv = [path] + sys.argv[4:]\n"
+    "runpy.run_path(path, run_name='__main__')\n"
+)
+
+# Compiled programs are started through `prlimit` or, where it is missing, this
+# shim, which applies the memory limit and then execs the program.
+_PRLIMIT = shutil.which("prlimit") if os.name == "posix" else None
+_EXEC_SHIM = _SET_MEMORY_LIMIT + (
+    "import os, sys\n"
+    "_limit(sys.argv[1])\n"
+    "os.execv(sys.argv[2], sys.argv[2:])\n"
+)
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Exceptions
+# =============================================================================
+
+class ExecutionError(ProblemGenerationError):
+    """Exception for program preparation or execution errors."""
+    pass
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass
+class ExecutionJob:
+    """A single program run: source code, stdin, arguments and limits."""
+    code: str
+    stdin: str = ""
+    args: List[str] = field(default_factory=list)
+    language: str = "python"
+    seed: Optional[int] = None
+    time_limit: float = DEFAULT_TIME_LIMIT
+    # False for runs that must really happen every time, e.g. repeated timing runs;
+    # backends that share results between identical jobs run these separately
+    cacheable: bool = True
+
+    def content_hash(self) -> str:
+        """Return a hash identifying this job by content, used to deduplicate results."""
+        payload = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ExecutionResult:
+    """Outcome of a single program run."""
+    stdout: str
+    stderr: str
+    returncode: int
+    elapsed: float
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """Whether the program finished in time with exit code 0."""
+        return not self.timed_out and self.returncode == 0
+
+
+# =============================================================================
+# Program Preparation
+# =============================================================================
+
+_prepare_lock = threading.Lock()
+_prepared: Dict[str, str] = {}
+
+
+def normalize_language(language: str) -> str:
+    """Map a free-form language name to a supported language key."""
+    key = (language or "python").strip().lower()
+    if key not in LANGUAGE_ALIASES:
+        raise ExecutionError(f"Unsupported language '{language}'. Available: {sorted(set(LANGUAGE_ALIASES.values()))}")
+    return LANGUAGE_ALIASES[key]
+
+
+def source_hash(code: str) -> str:
+    """Return the content hash used to cache a program source."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def prepare_program(code: str, language: str = "python") -> str:
+    """
+    Write (and for compiled languages, build) a program once and return its path.
+
+    Prepared programs are cached by language and source hash, so repeated runs of
+    the same generator or solution never re-write or re-compile it.
+    """
+    language = normalize_language(language)
+    key = f"{language}:{source_hash(code)}"
+
+    with _prepare_lock:
+        if key in _prepared and os.path.exists(_prepared[key]):
+            return _prepared[key]
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        digest = key.split(":", 1)[1][:32]
+
+        if language == "python":
+            path = os.path.join(CACHE_DIR, f"{digest}.py")
+            if not os.path.exists(path):
+                _write_atomic(path, code)
+        else:
+            path = os.path.join(CACHE_DIR, f"{digest}.bin")
+            if not os.path.exists(path):
+                source = os.path.join(CACHE_DIR, f"{digest}.cpp")
+                _write_atomic(source, code)
+                compiled = subprocess.run(
+                    ["g++", "-O2", "-std=c++17", "-o", path, source],
+                    capture_output=True, text=True
+                )
+                if compiled.returncode != 0:
+                    raise ExecutionError(f"Compilation failed: {compiled.stderr.strip()[:2000]}")
+
+        _prepared[key] = path
+        return path
+
+
+def _write_atomic(path: str, content: str) -> None:
+    """Write a file so that concurrent readers never observe partial content."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _limited_command(path: str, args: Sequence[str], memory_limit_mb: int) -> List[str]:
+    """Command running a compiled program under the memory limit."""
+    if os.name != "posix":
+        return [path, *args]
+    if _PRLIMIT:
+        return [_PRLIMIT, f"--as={memory_limit_mb * 1024 * 1024}", "--", path, *args]
+    return [sys.executable, "-c", _EXEC_SHIM, str(memory_limit_mb), path, *args]
+
+
+# =============================================================================
+# Execution
+# =============================================================================
+
+class ExecutionBackend(Protocol):
+    """Anything that can run a batch of jobs, e.g. a distributed coordinator."""
+
+    def run_jobs(self, jobs: Sequence[ExecutionJob], max_workers: Optional[int] = None) -> List[ExecutionResult]:
+        ...
+
+
+_backend: Optional[ExecutionBackend] = None
+
+
+def set_backend(backend: Optional[ExecutionBackend]) -> None:
+    """Route every `run_jobs` call through `backend`; None restores local execution."""
+    global _backend
+    _backend = backend
+
+
+def run_program(job: ExecutionJob, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB) -> ExecutionResult:
+    """Run a single job in a sandboxed subprocess and capture its output."""
+    with span("execute", language=job.language, seed=job.seed, time_limit=job.time_limit) as run_span:
+        result = _run_sandboxed(job, memory_limit_mb)
+        run_span.set_attributes(returncode=result.returncode, timed_out=result.timed_out)
+        return result
+
+
+def _run_sandboxed(job: ExecutionJob, memory_limit_mb: int) -> ExecutionResult:
+    language = normalize_language(job.language)
+    with span("prepare", language=language):
+        path = prepare_program(job.code, language)
+    seed = "" if job.seed is None else str(job.seed)
+
+    if language == "python":
+        command = [sys.executable, "-c", _PYTHON_BOOTSTRAP, path, seed, str(memory_limit_mb), *job.args]
+    else:
+        command = _limited_command(path, job.args, memory_limit_mb)
+
+    env = dict(os.environ, PYTHONHASHSEED="0", TESTCASE_SEED=seed)
+
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(
+            command,
+            input=job.stdin,
+            capture_output=True,
+            text=True,
+            timeout=job.time_limit,
+            env=env,
+            cwd=CACHE_DIR,
+        )
+    except subprocess.TimeoutExpired as e:
+        return ExecutionResult(
+            stdout=_decode(e.stdout),
+            stderr=_decode(e.stderr),
+            returncode=-1,
+            elapsed=time.perf_counter() - start,
+            timed_out=True
+        )
+
+    return ExecutionResult(
+        stdout=completed.stdout,
+        stderr=completed.stderr,
+        returncode=completed.returncode,
+        elapsed=time.perf_counter() - start
+    )
+
+
+def _decode(data) -> str:
+    """Decode partial output captured from a timed-out process."""
+    if data is None:
+        return ""
+    if isinstance(data, bytes):
+        return data.decode("utf-8", errors="replace")
+    return data
+
+
+def run_jobs(jobs: Sequence[ExecutionJob], max_workers: Optional[int] = None) -> List[ExecutionResult]:
+    """Run a batch of jobs on the configured backend, preserving input order."""
+    with span("run_jobs", jobs=len(jobs), backend=type(_backend).__name__ if _backend is not None else "local"):
+        if _backend is not None:
+            return _backend.run_jobs(jobs, max_workers=max_workers)
+        return run_jobs_locally(jobs, max_workers=max_workers)
+
+
+def run_jobs_locally(jobs: Sequence[ExecutionJob], max_workers: Optional[int] = None) -> List[ExecutionResult]:
+    """
+    Run a batch of jobs across all local cores, preserving input order.
+
+    Each job is its own subprocess, so a thread pool is enough to keep every
+    core busy. Jobs that cannot be prepared yield a failed result instead of
+    aborting the batch. Every job runs in a copy of the caller's context, so its
+    trace span nests under the caller's.
+    """
+    if not jobs:
+        return []
+
+    def run_one(job: ExecutionJob) -> ExecutionResult:
+        try:
+            return run_program(job)
+        except ExecutionError as e:
+            logger.warning(f"Execution failed: {e}")
+            return ExecutionResult(stdout="", stderr=str(e), returncode=-1, elapsed=0.0)
+
+    workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        contexts = [copy_context() for _ in jobs]
+        return list(pool.map(lambda context, job: context.run(run_one, job), contexts, jobs))
@@ -0,0 +1,355 @@
+"""
+Fake LLM Provider
+
+This module is a local stand-in for the Gemini chat model, so the workflow can be
+load-tested without a network. It answers every structured-output request with a
+schema-valid `ProblemIdea`, `ExpertEvaluation`, `CompleteProblem` or
+`TesterFeedback` built from templates. The completed problem is a small working
+problem (sum of an array) whose generator, validator and solutions really run, so
+test generation downstream does real work too.
+
+A `FakeLLMProfile` shapes the traffic:
+    latency      log-normal per output type (median seconds, sigma), scaled by time_scale
+    errors       share of calls failing with a server error or a 429 rate limit,
+                 plus a concurrency quota above which calls are rejected with 429
+    outcomes     share of ideas the evaluator accepts and share of tester
+                 feedbacks serious enough to request a revision
+
+Usage:
+    # Every service in the process
+    GEN_PROBLEM_LLM_PROVIDER=fake GEN_PROBLEM_FAKE_PROFILE='{"time_scale": 0.01}' python gen_problem.py
+
+    set_fake_profile(FakeLLMProfile(time_scale=0.01, rate_limit_rate=0.05, seed=7))
+"""
+
+import copy
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from structures import (
+    CompetitiveViability, CompleteProblem, DifficultyLevel, Editorial, ExpertEvaluation, OverallRating,
+    ProblemIdea, SolutionApproach, Subtask, TestCase, TestGenerator, TesterFeedback
+)
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+FAKE_MODEL_NAME = "fake"
+# JSON object overriding FakeLLMProfile fields, e.g. '{"time_scale": 0.01, "error_rate": 0.02}'
+FAKE_PROFILE_ENV_VAR = "GEN_PROBLEM_FAKE_PROFILE"
+# Roughly what the real model takes per output type.
+DEFAULT_LATENCY_MEDIANS = {
+    "ProblemIdea": 25.0,
+    "ExpertEvaluation": 20.0,
+    "CompleteProblem": 90.0,
+    "TesterFeedback": 30.0,
+}
+CHARS_PER_TOKEN = 3
+
+_VOCABULARY = (
+    "array tree graph query segment prefix suffix modulo prime path cycle interval string palindrome "
+    "matrix grid robot city road bridge tower coin game player turn score bitmask subset permutation "
+    "sequence window heap stack queue deque hash binary search greedy knapsack divisor gcd lcm digit "
+    "parity color island river mountain train ticket festival garden lantern crystal dragon castle"
+).split()
+
+
+# =============================================================================
+# Profile
+# =============================================================================
+
+@dataclass
+class FakeLLMProfile:
+    """Latency, failure and outcome distributions of the fake provider."""
+    latency_medians: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LATENCY_MEDIANS))
+    latency_sigma: float = 0.4
+    # Multiplies every latency; load tests compress hours into seconds with e.g. 0.01
+    time_scale: float = 1.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    # Calls beyond this many in flight are rejected with 429 (None: unlimited)
+    max_concurrent_calls: Optional[int] = None
+    # Share of ideas the evaluator recommends
+    acceptance_rate: float = 0.7
+    # Share of tester feedbacks serious enough to request a revision on their own;
+    # with three testers a round is revised with probability 1 - (1 - rate)^3
+    revision_rate: float = 0.2
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMProfile":
+        overrides = json.loads(os.getenv(FAKE_PROFILE_ENV_VAR) or "{}")
+        unknown = set(overrides) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f"Unknown fake profile fields: {sorted(unknown)}")
+        return cls(**overrides)
+
+
+_profile: Optional[FakeLLMProfile] = None
+_profile_lock = threading.Lock()
+
+
+def get_fake_profile() -> FakeLLMProfile:
+    """Return the process-wide profile, read from GEN_PROBLEM_FAKE_PROFILE on first use."""
+    global _profile
+    with _profile_lock:
+        if _profile is None:
+            _profile = FakeLLMProfile.from_env()
+        return _profile
+
+
+def set_fake_profile(profile: Optional[FakeLLMProfile]) -> None:
+    """Use `profile` for every fake model created later; None restores the default."""
+    global _profile
+    with _profile_lock:
+        _profile = profile
+
+
+# =============================================================================
+# Errors
+# =============================================================================
+
+class FakeServerError(Exception):
+    """Simulated 500 response."""
+    status_code = 500
+
+
+class FakeRateLimitError(Exception):
+    """Simulated 429 response."""
+    status_code = 429
+
+
+# =============================================================================
+# Templates
+# =============================================================================
+
+_GENERATOR_CODE = """import random
+n = random.randint(1, 1000)
+print(n)
+print(*[random.randint(-10**9, 10**9) for _ in range(n)])
+"""
+
+_VALIDATOR_CODE = """import sys
+tokens = sys.stdin.read().split()
+n = int(tokens[0])
+values = list(map(int, tokens[1:]))
+if not 1 <= n <= 10**5 or len(values) != n or any(abs(v) > 10**9 for v in values):
+    sys.exit("input violates the constraints")
+"""
+
+_NAIVE_CODE = """n = int(input())
+total = 0
+for value in map(int, input().split()):
+    total = total + value
+print(total)
+"""
+
+_OPTIMAL_CODE = """import sys
+tokens = sys.stdin.read().split()
+print(sum(map(int, tokens[1:])))
+"""
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+def fake_idea(rng: random.Random) -> ProblemIdea:
+    """An idea with a random description, so the duplicate filter never rejects it."""
+    return ProblemIdea(
+        title=f"The {_phrase(rng, 2).title()} Problem",
+        description=f"Given an array, {_phrase(rng, 40)}.",
+        input_format="The first line contains n. The second line contains n integers a_i.",
+        output_format="Print a single integer.",
+        sample_input="3\n1 2 3",
+        sample_output="6",
+        key_insights=[_phrase(rng, 12) for _ in range(3)],
+        time_complexity="O(n)",
+        space_complexity="O(1)",
+        engagement_factor=_phrase(rng, 20),
+        prerequisite_knowledge=["Prefix sums"]
+    )
+
+
+def fake_evaluation(rng: random.Random, profile: FakeLLMProfile) -> ExpertEvaluation:
+    """A consistent evaluation that recommends the idea with probability `acceptance_rate`."""
+    recommended = rng.random() < profile.acceptance_rate
+    scores = [rng.randint(20, 35), rng.randint(10, 25), rng.randint(8, 20), rng.randint(8, 15), rng.randint(2, 5)]
+    if not recommended:
+        scores = [score // 2 for score in scores]
+    return ExpertEvaluation(
+        problem_title=_phrase(rng, 3).title(),
+        overall_rating=OverallRating.GOOD if recommended else OverallRating.REJECT,
+        total_score=sum(scores),
+        algorithm_quality=scores[0],
+        creativity_originality=scores[1],
+        problem_clarity=scores[2],
+        requirement_alignment=scores[3],
+        development_potential=scores[4],
+        key_strengths=[_phrase(rng, 15) for _ in range(3)],
+        major_concerns=[_phrase(rng, 15) for _ in range(2)],
+        improvement_suggestions=[_phrase(rng, 15) for _ in range(3)],
+        decision_reasoning=_phrase(rng, 40),
+        competitive_viability=CompetitiveViability.HIGH if recommended else CompetitiveViability.LOW,
+        is_recommended=recommended,
+        rejection_reason=None if recommended else _phrase(rng, 20)
+    )
+
+
+def fake_problem(rng: random.Random) -> CompleteProblem:
+    """A small complete problem whose generator, validator and solutions run."""
+    story = _phrase(rng, 150)
+    return CompleteProblem(
+        title=f"The {_phrase(rng, 2).title()} Sum",
+        difficulty=DifficultyLevel.DIV2_A,
+        algorithm_categories=["Implementation"],
+        estimated_solve_time=10,
+        problem_statement=f"{story}. Print the sum of the n given integers.",
+        input_specification="The first line contains n (1 ≤ n ≤ 10^5). The second line contains n integers a_i.",
+        output_specification="Print the sum of the integers.",
+        constraints="1 ≤ n ≤ 10^5, |a_i| ≤ 10^9",
+        subtasks=[
+            Subtask(name="Subtask 1", points=40, constraints="n ≤ 1000", description="Small arrays",
+                    expected_approach="Loop", time_complexity="O(n)"),
+            Subtask(name="Subtask 2", points=60, constraints="n ≤ 10^5", description="Full constraints",
+                    expected_approach="Loop", time_complexity="O(n)"),
+        ],
+        test_cases=[
+            TestCase(input="3\n1 2 3", output="6", explanation="1 + 2 + 3 = 6"),
+            TestCase(input="2\n-5 5", output="0", explanation="-5 + 5 = 0"),
+        ],
+        solution_approaches=[
+            SolutionApproach(name="Naive loop", description=_phrase(rng, 30), complexity="O(n)",
+                             code=_NAIVE_CODE, suitable_for=["Subtask 1", "Subtask 2"]),
+            SolutionApproach(name="Built-in sum", description=_phrase(rng, 30), complexity="O(n)",
+                             code=_OPTIMAL_CODE, suitable_for=["Subtask 1", "Subtask 2"]),
+        ],
+        editorial=Editorial(
+            problem_analysis=_phrase(rng, 80),
+            key_insights=[_phrase(rng, 20) for _ in range(3)],
+            solution_progression=_phrase(rng, 80),
+            implementation_details=_phrase(rng, 40),
+            common_pitfalls=["Overflow in languages with fixed-width integers"]
+        ),
+        test_generators=[
+            TestGenerator(name="random_arrays", description="Random arrays", code=_GENERATOR_CODE,
+                          target_subtasks=["Subtask 1", "Subtask 2"])
+        ],
+        input_validator=_VALIDATOR_CODE
+    )
+
+
+def fake_feedback(rng: random.Random, profile: FakeLLMProfile) -> TesterFeedback:
+    """Feedback that alone requests a revision with probability `revision_rate`."""
+    serious = rng.random() < profile.revision_rate
+    return TesterFeedback(
+        solved=not serious,
+        understanding_clarity=2 if serious else rng.choice([4, 5]),
+        difficulty_perception="Hard" if serious else "Easy",
+        good_feedbacks=[_phrase(rng, 12) for _ in range(2)],
+        bad_feedbacks=[_phrase(rng, 12) for _ in range(3 if serious else 1)],
+        ambiguities=[_phrase(rng, 10)] if serious else [],
+        improvement_suggestions=[_phrase(rng, 12)]
+    )
+
+
+# =============================================================================
+# Chat Model
+# =============================================================================
+
+class FakeChatModel:
+    """Stand-in chat model supporting `with_structured_output`, the only interface the services use."""
+
+    model = FAKE_MODEL_NAME
+
+    def __init__(self, temperature: float = 0.0, profile: Optional[FakeLLMProfile] = None):
+        self.temperature = temperature
+        self.profile = profile or get_fake_profile()
+        # Set through FakeCacheProvider.bind (see context_cache.py)
+        self.cached_content: Optional[str] = None
+        self.cache_provider: Any = None
+
+    def model_copy(self, update: Optional[Dict[str, Any]] = None) -> "FakeChatModel":
+        """A copy with some attributes replaced, like a pydantic chat model."""
+        copied = copy.copy(self)
+        copied.__dict__.update(update or {})
+        return copied
+
+    def with_structured_output(self, schema: type, include_raw: bool = False) -> Runnable:
+        builders: Dict[type, Callable[[random.Random], Any]] = {
+            ProblemIdea: fake_idea,
+            ExpertEvaluation: lambda rng: fake_evaluation(rng, self.profile),
+            CompleteProblem: fake_problem,
+            TesterFeedback: lambda rng: fake_feedback(rng, self.profile),
+        }
+        if schema not in builders:
+            raise ValueError(f"The fake provider cannot produce {schema.__name__}")
+
+        def respond(prompt: Any) -> Any:
+            # A cached prefix is billed as cache reads; a missing cache fails like Gemini's
+            cached_text = self.cache_provider.read(self.cached_content) if self.cached_content else ""
+            rng = _next_rng(self.profile)
+            _simulate_call(rng, self.profile, schema.__name__)
+            output = builders[schema](rng)
+            if not include_raw:
+                return output
+            cached_tokens = len(cached_text) // CHARS_PER_TOKEN
+            input_tokens = cached_tokens + len(str(prompt)) // CHARS_PER_TOKEN
+            output_tokens = len(output.model_dump_json()) // CHARS_PER_TOKEN
+            usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                     "total_tokens": input_tokens + output_tokens}
+            if cached_tokens:
+                usage["input_token_details"] = {"cache_read": cached_tokens}
+            return {"raw": AIMessage(content="", usage_metadata=usage), "parsed": output, "parsing_error": None}
+
+        return RunnableLambda(respond)
+
+
+_seed_rng = random.Random()
+_seeded_profile: Optional[FakeLLMProfile] = None
+_in_flight = 0
+_state_lock = threading.Lock()
+
+
+def _next_rng(profile: FakeLLMProfile) -> random.Random:
+    """Independent generator per call; reproducible sequence of seeds for seeded profiles."""
+    global _seeded_profile
+    with _state_lock:
+        if profile is not _seeded_profile:
+            _seed_rng.seed(profile.seed)
+            _seeded_profile = profile
+        return random.Random(_seed_rng.getrandbits(64))
+
+
+def _simulate_call(rng: random.Random, profile: FakeLLMProfile, output_type: str) -> None:
+    """Sleep for a sampled latency, then fail as the profile dictates."""
+    global _in_flight
+    with _state_lock:
+        over_quota = profile.max_concurrent_calls is not None and _in_flight >= profile.max_concurrent_calls
+        _in_flight += 1
+    try:
+        median = profile.latency_medians.get(output_type, 10.0)
+        latency = median * math.exp(rng.gauss(0.0, profile.latency_sigma)) * profile.time_scale
+        roll = rng.random()
+        if over_quota or roll < profile.rate_limit_rate:
+            # Rejections come back quickly
+            time.sleep(min(latency, 0.5 * profile.time_scale))
+            raise FakeRateLimitError("429 Resource has been exhausted (simulated)")
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            time.sleep(latency * rng.random())
+            raise FakeServerError("500 Internal error (simulated)")
+        time.sleep(latency)
+    finally:
+        with _state_lock:
+            _in_flight -= 1
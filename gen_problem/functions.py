@@ -6,9 +6,11 @@ problems using various LLM models. It includes proper error handling, logging, a
 validation mechanisms.
 """
 
-import json
+import functools
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Union
+import os
 from dataclasses import dataclass
 from enum import Enum
 from abc import ABC, abstractmethod
@@ -18,7 +20,14 @@ from structures import (
     CompleteProblem, TesterFeedback
 )
 from prompts import CREATOR_PROMPTS, TESTER_PROMPT, problem_evaluator_prompt, problem_completer_prompt, reflect_prompt
-from models import gemini_2_5_pro
+from models import fake_llm, gemini_2_5_pro
+from metrics import CallMetrics, CallTimer, record_call
+from prompt_assembly import AssembledPrompt, assemble
+from prompt_encoding import DEFAULT_PROMPT_ENCODING, encode
+from context_cache import ContextCacheManager, get_cache_manager, is_cache_error
+from cassettes import CassetteMissError, get_cassette
+from tracing import set_attributes, span
+from langchain_core.runnables import RunnableLambda
 
 
 # =============================================================================
@@ -28,6 +37,7 @@ from models import gemini_2_5_pro
 class LLMProvider(str, Enum):
     """Available LLM providers for different tasks."""
     GEMINI_2_5_PRO = "gemini_2_5_pro"
+    FAKE = "fake"
 
 
 @dataclass
@@ -37,15 +47,20 @@ class LLMConfig:
     temperature: float = 0.6
     max_retries: int = 3
     timeout: int = 30
+    # How models are rendered into prompts: "json", "compact" or "terse" (see prompt_encoding.py)
+    prompt_encoding: str = DEFAULT_PROMPT_ENCODING
 
 
+# Provider of every task; "fake" runs the workflow offline (see fake_provider.py)
+DEFAULT_PROVIDER = LLMProvider(os.getenv("GEN_PROBLEM_LLM_PROVIDER", LLMProvider.GEMINI_2_5_PRO.value))
+
 # Default configurations for different tasks
 DEFAULT_CONFIGS = {
-    "idea_creation": LLMConfig(LLMProvider.GEMINI_2_5_PRO, temperature=0.7),
-    "evaluation": LLMConfig(LLMProvider.GEMINI_2_5_PRO, temperature=0.6),
-    "completion": LLMConfig(LLMProvider.GEMINI_2_5_PRO, temperature=0.6),
-    "testing": LLMConfig(LLMProvider.GEMINI_2_5_PRO, temperature=0.5),
-    "reflection": LLMConfig(LLMProvider.GEMINI_2_5_PRO, temperature=0.5)
+    "idea_creation": LLMConfig(DEFAULT_PROVIDER, temperature=0.7),
+    "evaluation": LLMConfig(DEFAULT_PROVIDER, temperature=0.6),
+    "completion": LLMConfig(DEFAULT_PROVIDER, temperature=0.6),
+    "testing": LLMConfig(DEFAULT_PROVIDER, temperature=0.5),
+    "reflection": LLMConfig(DEFAULT_PROVIDER, temperature=0.5)
 }
 
 
@@ -77,41 +92,140 @@ class PromptError(ProblemGenerationError):
 # Base Service Classes
 # =============================================================================
 
+def _traced_process(service: str, process):
+    """Wrap a service's `process` in a span naming the role (creator/tester) and problem it works on."""
+    @functools.wraps(process)
+    def traced(self, *args, **kwargs):
+        role = next((arg for arg in args if isinstance(arg, str)), None)
+        title = next((arg.title for arg in args if isinstance(getattr(arg, "title", None), str)), None)
+        with span(f"{service}.process", stage=self.stage, role=role, title=title) as process_span:
+            result = process(self, *args, **kwargs)
+            if title is None:
+                process_span.set_attributes(title=getattr(result, "title", None))
+            return result
+    return traced
+
+
+@dataclass
+class _CachedCall:
+    """A model call referring to a provider context cache, and the same call sending the full prompt."""
+    cached: Any
+    uncached: Any
+    handle: str
+    manager: ContextCacheManager
+
+    def invoke(self, prompt: Any, config: Optional[Dict[str, Any]] = None) -> Any:
+        return self.cached.invoke(prompt, config=config)
+
+
 class BaseLLMService(ABC):
     """Abstract base class for LLM services."""
     
+    # Workflow stage the service serves, used to group call metrics
+    stage: str = ""
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "process" in cls.__dict__:
+            cls.process = _traced_process(cls.__name__, cls.process)
+    
     def __init__(self, config: Optional[LLMConfig] = None):
         self.config = config or LLMConfig(LLMProvider.GEMINI_2_5_PRO)
         self.logger = logging.getLogger(self.__class__.__name__)
+        self.model_name = self.config.provider.value
     
-    def _get_llm_instance(self, output_type: type):
-        """Get configured LLM instance with structured output."""
+    def _get_llm_instance(self, output_type: type, prompt: Optional[AssembledPrompt] = None):
+        """
+        Get configured LLM instance with structured output (and the raw response, for token usage).
+        
+        When the static prefix of `prompt` is held in a provider context cache, the
+        instance refers to that cache and only sends the prompt's dynamic inputs;
+        `_invoke_with_retry` falls back to the full prompt if the cache is gone.
+        With a cassette (see cassettes.py) calls are recorded, or answered from
+        the recording without building a model at all.
+        """
+        cassette = get_cassette()
+        if cassette is not None and cassette.mode == "replay":
+            return cassette.replayer(self.__class__.__name__, output_type)
         try:
             if self.config.provider == LLMProvider.GEMINI_2_5_PRO:
-                return gemini_2_5_pro(temperature=self.config.temperature).with_structured_output(output_type)
+                llm = gemini_2_5_pro(temperature=self.config.temperature)
+            elif self.config.provider == LLMProvider.FAKE:
+                llm = fake_llm(temperature=self.config.temperature)
             else:
                 raise LLMError(f"Unsupported LLM provider: {self.config.provider}")
+            self.model_name = getattr(llm, "model", self.model_name)
+            
+            def structured(model, render):
+                runnable = RunnableLambda(render) | model.with_structured_output(output_type, include_raw=True)
+                if cassette is not None:
+                    runnable = cassette.recorder(self.__class__.__name__, output_type, runnable)
+                return runnable
+            
+            uncached = structured(llm, str)
+            manager = get_cache_manager()
+            cached_content = manager.handle(self.model_name, prompt.static) if prompt is not None and manager else None
+            if not cached_content:
+                return uncached
+            cached = structured(manager.bind(self.model_name, llm, cached_content), lambda p: p.dynamic)
+            return _CachedCall(cached, uncached, cached_content, manager)
         except Exception as e:
             raise LLMError(f"Failed to initialize LLM: {str(e)}") from e
     
-    def _invoke_with_retry(self, llm, prompt: str, retries: int = None) -> Any:
-        """Invoke LLM with retry mechanism."""
+    def _invoke_with_retry(self, llm, prompt: Union[str, AssembledPrompt], retries: int = None) -> Any:
+        """Invoke LLM with retry mechanism, recording one metrics record for the whole call."""
         max_retries = retries or self.config.max_retries
         last_exception = None
+        metrics = CallMetrics(
+            service=self.__class__.__name__, stage=self.stage, model=self.model_name, prompt_chars=len(prompt)
+        )
+        started = time.perf_counter()
         
-        for attempt in range(max_retries + 1):
-            try:
-                self.logger.debug(f"LLM invocation attempt {attempt + 1}/{max_retries + 1}")
-                response = llm.invoke(prompt)
-                self.logger.debug("LLM invocation successful")
-                return response
-            except Exception as e:
-                last_exception = e
-                self.logger.warning(f"LLM invocation attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_retries:
-                    continue
-        
-        raise LLMError(f"LLM invocation failed after {max_retries + 1} attempts: {str(last_exception)}") from last_exception
+        try:
+            attempt = 0
+            while attempt <= max_retries:
+                metrics.retries = attempt
+                timer = CallTimer()
+                attempt_started = time.perf_counter()
+                try:
+                    with span("llm_attempt", model=self.model_name, attempt=attempt + 1) as attempt_span:
+                        self.logger.debug(f"LLM invocation attempt {attempt + 1}/{max_retries + 1}")
+                        response = llm.invoke(prompt, config={"callbacks": [timer]})
+                        metrics.time_to_first_byte = timer.elapsed(attempt_started)
+                        # Structured output with include_raw=True: {"raw": AIMessage, "parsed": ..., "parsing_error": ...}
+                        if isinstance(response, dict) and "parsed" in response:
+                            usage = getattr(response.get("raw"), "usage_metadata", None)
+                            metrics.add_usage(usage)
+                            if usage:
+                                attempt_span.set_attributes(input_tokens=usage.get("input_tokens"),
+                                                            output_tokens=usage.get("output_tokens"))
+                            if response.get("parsing_error") is not None:
+                                raise response["parsing_error"]
+                            response = response["parsed"]
+                    self.logger.debug("LLM invocation successful")
+                    return response
+                except Exception as e:
+                    last_exception = e
+                    if isinstance(llm, _CachedCall) and is_cache_error(e):
+                        # The cache expired or was evicted: forget it and send the full prompt
+                        self.logger.warning(f"Context cache {llm.handle} is gone, resending the full prompt: {e}")
+                        llm.manager.invalidate(llm.handle)
+                        llm = llm.uncached
+                        continue
+                    self.logger.warning(f"LLM invocation attempt {attempt + 1} failed: {str(e)}")
+                    # A prompt missing from a replayed cassette never succeeds
+                    if isinstance(e, CassetteMissError):
+                        break
+                    attempt += 1
+            
+            metrics.success = False
+            metrics.error = str(last_exception)[:500]
+            raise LLMError(f"LLM invocation failed after {max_retries + 1} attempts: {str(last_exception)}") from last_exception
+        finally:
+            metrics.latency = time.perf_counter() - started
+            record_call(metrics)
+            set_attributes(model=metrics.model, input_tokens=metrics.input_tokens, output_tokens=metrics.output_tokens,
+                           cached_tokens=metrics.cached_tokens, retries=metrics.retries)
     
     @abstractmethod
     def process(self, *args, **kwargs) -> Any:
@@ -126,8 +240,10 @@ class BaseLLMService(ABC):
 class ProblemIdeaService(BaseLLMService):
     """Service for creating problem ideas."""
     
+    stage = "idea_creation"
+    
     def __init__(self):
-        super().__init__(DEFAULT_CONFIGS["idea_creation"])
+        super().__init__(DEFAULT_CONFIGS[self.stage])
     
     def process(self, creator: str, problem_requirements: ProblemRequirements) -> ProblemIdea:
         """Create a problem idea based on creator and requirements."""
@@ -135,8 +251,8 @@ class ProblemIdeaService(BaseLLMService):
             self._validate_creator(creator)
             self._validate_requirements(problem_requirements)
             
-            llm = self._get_llm_instance(ProblemIdea)
             prompt = self._build_prompt(creator, problem_requirements)
+            llm = self._get_llm_instance(ProblemIdea, prompt)
             
             self.logger.info(f"Creating problem idea with creator: {creator}")
             response = self._invoke_with_retry(llm, prompt)
@@ -160,11 +276,12 @@ class ProblemIdeaService(BaseLLMService):
         if not requirements.topic.strip():
             raise ValidationError("Problem topic cannot be empty")
     
-    def _build_prompt(self, creator: str, requirements: ProblemRequirements) -> str:
+    def _build_prompt(self, creator: str, requirements: ProblemRequirements) -> AssembledPrompt:
         """Build prompt for problem idea creation."""
         try:
-            return CREATOR_PROMPTS[creator].format(
-                problem_requirements=requirements.model_dump_json()
+            return assemble(
+                CREATOR_PROMPTS[creator],
+                problem_requirements=encode(requirements, self.config.prompt_encoding)
             )
         except KeyError as e:
             raise PromptError(f"Prompt template error: missing key {e}")
@@ -182,16 +299,18 @@ class ProblemIdeaService(BaseLLMService):
 class ExpertEvaluationService(BaseLLMService):
     """Service for evaluating problem ideas."""
     
+    stage = "evaluation"
+    
     def __init__(self):
-        super().__init__(DEFAULT_CONFIGS["evaluation"])
+        super().__init__(DEFAULT_CONFIGS[self.stage])
     
     def process(self, problem_requirements: ProblemRequirements, problem_idea: ProblemIdea) -> ExpertEvaluation:
         """Evaluate a problem idea based on requirements."""
         try:
             self._validate_inputs(problem_requirements, problem_idea)
             
-            llm = self._get_llm_instance(ExpertEvaluation)
             prompt = self._build_prompt(problem_requirements, problem_idea)
+            llm = self._get_llm_instance(ExpertEvaluation, prompt)
             
             self.logger.info(f"Evaluating problem idea: {problem_idea.title}")
             response = self._invoke_with_retry(llm, prompt)
@@ -211,12 +330,13 @@ class ExpertEvaluationService(BaseLLMService):
         if not idea.title.strip():
             raise ValidationError("Problem idea title cannot be empty")
     
-    def _build_prompt(self, requirements: ProblemRequirements, idea: ProblemIdea) -> str:
+    def _build_prompt(self, requirements: ProblemRequirements, idea: ProblemIdea) -> AssembledPrompt:
         """Build prompt for problem evaluation."""
         try:
-            return problem_evaluator_prompt.format(
-                problem_requirements=requirements.model_dump_json(),
-                problem_idea=idea.model_dump_json()
+            return assemble(
+                problem_evaluator_prompt,
+                problem_requirements=encode(requirements, self.config.prompt_encoding),
+                problem_idea=encode(idea, self.config.prompt_encoding)
             )
         except Exception as e:
             raise PromptError(f"Failed to build evaluation prompt: {str(e)}")
@@ -230,16 +350,18 @@ class ExpertEvaluationService(BaseLLMService):
 class ProblemCompletionService(BaseLLMService):
     """Service for completing problem ideas into full problems."""
     
+    stage = "completion"
+    
     def __init__(self):
-        super().__init__(DEFAULT_CONFIGS["completion"])
+        super().__init__(DEFAULT_CONFIGS[self.stage])
     
     def process(self, problem_idea: ProblemIdea, problem_requirements: ProblemRequirements, expert_evaluation: ExpertEvaluation) -> CompleteProblem:
         """Complete a problem idea into a full problem."""
         try:
             self._validate_inputs(problem_idea, problem_requirements)
             
-            llm = self._get_llm_instance(CompleteProblem)
             prompt = self._build_prompt(problem_idea, problem_requirements, expert_evaluation)
+            llm = self._get_llm_instance(CompleteProblem, prompt)
             
             self.logger.info(f"Completing problem: {problem_idea.title}")
             response = self._invoke_with_retry(llm, prompt)
@@ -259,13 +381,14 @@ class ProblemCompletionService(BaseLLMService):
         if not idea.description.strip():
             raise ValidationError("Problem idea description cannot be empty")
     
-    def _build_prompt(self, idea: ProblemIdea, requirements: ProblemRequirements, evaluation: ExpertEvaluation) -> str:
+    def _build_prompt(self, idea: ProblemIdea, requirements: ProblemRequirements, evaluation: ExpertEvaluation) -> AssembledPrompt:
         """Build prompt for problem completion."""
         try:
-            return problem_completer_prompt.format(
-                problem_idea=idea.model_dump_json(),
-                problem_requirements=requirements.model_dump_json(),
-                expert_evaluation=evaluation.model_dump_json()
+            return assemble(
+                problem_completer_prompt,
+                problem_idea=encode(idea, self.config.prompt_encoding),
+                problem_requirements=encode(requirements, self.config.prompt_encoding),
+                expert_evaluation=encode(evaluation, self.config.prompt_encoding)
             )
         except Exception as e:
             raise PromptError(f"Failed to build completion prompt: {str(e)}")
@@ -283,8 +406,10 @@ class ProblemCompletionService(BaseLLMService):
 class ProblemTestingService(BaseLLMService):
     """Service for testing complete problems."""
     
+    stage = "testing"
+    
     def __init__(self):
-        super().__init__(DEFAULT_CONFIGS["testing"])
+        super().__init__(DEFAULT_CONFIGS[self.stage])
     
     def process(self, tester: str, complete_problem: CompleteProblem) -> TesterFeedback:
         """Test a complete problem using specified tester."""
@@ -292,8 +417,8 @@ class ProblemTestingService(BaseLLMService):
             self._validate_tester(tester)
             self._validate_problem(complete_problem)
             
-            llm = self._get_llm_instance(TesterFeedback)
             prompt = self._build_prompt(tester, complete_problem)
+            llm = self._get_llm_instance(TesterFeedback, prompt)
             
             self.logger.info(f"Testing problem '{complete_problem.title}' with tester: {tester}")
             response = self._invoke_with_retry(llm, prompt)
@@ -319,11 +444,13 @@ class ProblemTestingService(BaseLLMService):
         if not problem.problem_statement.strip():
             raise ValidationError("Problem statement cannot be empty")
     
-    def _build_prompt(self, tester: str, problem: CompleteProblem) -> str:
+    def _build_prompt(self, tester: str, problem: CompleteProblem) -> AssembledPrompt:
         """Build prompt for problem testing."""
         try:
-            return TESTER_PROMPT[tester].format(
-                complete_problem=problem.model_dump_json()
+            return assemble(
+                TESTER_PROMPT[tester],
+                complete_problem=encode(problem, self.config.prompt_encoding,
+                                        include=CompleteProblem.TESTER_VIEWS.get(tester))
             )
         except KeyError as e:
             raise PromptError(f"Tester prompt template error: missing key {e}")
@@ -339,16 +466,18 @@ class ProblemTestingService(BaseLLMService):
 class ProblemReflectionService(BaseLLMService):
     """Service for reflecting on tester feedback and improving problems."""
     
+    stage = "reflection"
+    
     def __init__(self):
-        super().__init__(DEFAULT_CONFIGS["reflection"])
+        super().__init__(DEFAULT_CONFIGS[self.stage])
     
     def process(self, complete_problem: CompleteProblem, tester_feedbacks: List[TesterFeedback]) -> CompleteProblem:
         """Reflect on tester feedback and improve the problem."""
         try:
             self._validate_inputs(complete_problem, tester_feedbacks)
             
-            llm = self._get_llm_instance(CompleteProblem)
             prompt = self._build_prompt(complete_problem, tester_feedbacks)
+            llm = self._get_llm_instance(CompleteProblem, prompt)
             
             self.logger.info(f"Reflecting on {len(tester_feedbacks)} feedback(s) for problem: {complete_problem.title}")
             response = self._invoke_with_retry(llm, prompt)
@@ -368,13 +497,13 @@ class ProblemReflectionService(BaseLLMService):
         if not feedbacks:
             raise ValidationError("No tester feedback provided")
     
-    def _build_prompt(self, problem: CompleteProblem, feedbacks: List[TesterFeedback]) -> str:
+    def _build_prompt(self, problem: CompleteProblem, feedbacks: List[TesterFeedback]) -> AssembledPrompt:
         """Build prompt for problem reflection."""
         try:
-            feedbacks_json = json.dumps([fb.model_dump() for fb in feedbacks], ensure_ascii=False, indent=2)
-            return reflect_prompt.format(
-                tester_feedbacks=feedbacks_json,
-                complete_problem=problem.model_dump_json()
+            return assemble(
+                reflect_prompt,
+                tester_feedbacks=encode(feedbacks, self.config.prompt_encoding),
+                complete_problem=encode(problem, self.config.prompt_encoding)
             )
         except Exception as e:
             raise PromptError(f"Failed to build reflection prompt: {str(e)}")
@@ -0,0 +1,209 @@
+"""
+Performance Fuzzing
+
+This module searches for worst-case inputs that separate the intended complexity
+from a slower one. It mutates generator seeds and arguments, times the naive and
+optimal solutions on each candidate, and keeps the inputs that maximize the naive
+solution's runtime while the optimal solution stays within the time limit.
+
+Arguments start from each generator's `default_args`; generators declaring none
+are only reseeded. Runtimes are the best of several runs, so scheduling noise
+does not decide which inputs survive.
+"""
+
+import os
+import random
+import time
+from dataclasses import dataclass, field, replace
+from typing import List, Optional
+
+from structures import CompleteProblem, TestGenerator
+from executor import ExecutionJob, run_jobs
+from validator import validate_inputs
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_TIME_BUDGET = 60.0
+DEFAULT_TIME_LIMIT = 2.0
+DEFAULT_KEEP = 5
+# Each solution's runtime is the best of this many runs (a naive timeout is not re-run)
+DEFAULT_REPEATS = 3
+MAX_ARG_VALUE = 10 ** 9
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass
+class FuzzCandidate:
+    """A generator invocation: seed and optional integer arguments."""
+    generator: TestGenerator
+    seed: int
+    args: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FuzzResult:
+    """A measured candidate with its input and both solutions' runtimes."""
+    candidate: FuzzCandidate
+    input: str
+    output: str
+    naive_time: float
+    optimal_time: float
+    naive_timed_out: bool
+
+    @property
+    def fitness(self) -> tuple:
+        """Rank by naive runtime first, then by the naive/optimal ratio."""
+        ratio = self.naive_time / max(self.optimal_time, 1e-6)
+        return (self.naive_timed_out, self.naive_time, ratio)
+
+
+# =============================================================================
+# Search
+# =============================================================================
+
+def anti_naive_subtasks(problem: CompleteProblem) -> List[str]:
+    """Return the subtasks the naive solution is not expected to pass."""
+    naive = problem.get_naive_solution()
+    return [
+        subtask.name for subtask in problem.subtasks
+        if subtask.name not in naive.suitable_for
+    ]
+
+
+def mutate(candidate: FuzzCandidate, rng: random.Random) -> FuzzCandidate:
+    """Derive a new candidate with a fresh seed and perturbed integer arguments."""
+    args = []
+    for arg in candidate.args:
+        try:
+            value = int(arg)
+        except ValueError:
+            args.append(arg)
+            continue
+        scaled = int(value * rng.choice([0.5, 0.9, 1.1, 2.0])) + rng.randint(-1, 1)
+        args.append(str(max(1, min(MAX_ARG_VALUE, scaled))))
+    return replace(candidate, seed=rng.randrange(1, 2 ** 31), args=args)
+
+
+def _time_solutions(problem: CompleteProblem, inputs: List[str], time_limit: float, repeats: int) -> List[tuple]:
+    """(naive, optimal) runs per input, each with the best elapsed time of `repeats` runs."""
+    naive = problem.get_naive_solution()
+    optimal = problem.get_optimal_solution()
+    jobs = []
+    # Every repeat has to run, so no backend may answer it with an earlier result
+    for data in inputs:
+        jobs.append(ExecutionJob(code=naive.code, language=naive.language, stdin=data, time_limit=time_limit,
+                                 cacheable=False))
+        jobs.append(ExecutionJob(code=optimal.code, language=optimal.language, stdin=data, time_limit=time_limit,
+                                 cacheable=False))
+    timings = run_jobs(jobs)
+    pairs = [[timings[2 * index], timings[2 * index + 1]] for index in range(len(inputs))]
+
+    # Re-run only inputs whose runs all finished; a timeout cannot get any faster
+    rerun = [index for index, (naive_run, optimal_run) in enumerate(pairs) if naive_run.ok and optimal_run.ok]
+    if rerun and repeats > 1:
+        again = run_jobs([jobs[2 * index + side] for index in rerun for side in (0, 1)] * (repeats - 1))
+        for offset, result in enumerate(again):
+            index, side = rerun[(offset // 2) % len(rerun)], offset % 2
+            if result.ok and result.elapsed < pairs[index][side].elapsed:
+                pairs[index][side] = result
+    return [tuple(pair) for pair in pairs]
+
+
+def _evaluate(problem: CompleteProblem, candidates: List[FuzzCandidate], time_limit: float,
+              repeats: int = DEFAULT_REPEATS) -> List[FuzzResult]:
+    """Generate, validate and time a batch of candidates in parallel."""
+    generated = run_jobs([
+        ExecutionJob(code=c.generator.code, language=c.generator.language, seed=c.seed, args=c.args)
+        for c in candidates
+    ])
+    produced = [(c, r.stdout) for c, r in zip(candidates, generated) if r.ok]
+    if not produced:
+        return []
+
+    verdicts = validate_inputs(problem, [c.generator for c, _ in produced], [data for _, data in produced])
+    valid = [(c, data) for (c, data), verdict in zip(produced, verdicts) if verdict.valid]
+    if not valid:
+        return []
+
+    timings = _time_solutions(problem, [data for _, data in valid], time_limit, repeats)
+
+    results = []
+    for (candidate, data), (naive_run, optimal_run) in zip(valid, timings):
+        if not optimal_run.ok:
+            continue
+        results.append(FuzzResult(
+            candidate=candidate,
+            input=data,
+            output=optimal_run.stdout,
+            naive_time=naive_run.elapsed,
+            optimal_time=optimal_run.elapsed,
+            naive_timed_out=naive_run.timed_out
+        ))
+    return results
+
+
+def fuzz_worst_cases(
+    problem: CompleteProblem,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+    time_limit: float = DEFAULT_TIME_LIMIT,
+    keep: int = DEFAULT_KEEP,
+    repeats: int = DEFAULT_REPEATS,
+    max_workers: Optional[int] = None,
+    seed: int = 0
+) -> List[FuzzResult]:
+    """
+    Search for inputs that maximize the naive solution's runtime.
+
+    Only generators targeting subtasks the naive solution should fail are
+    fuzzed. Each round evaluates one candidate per core; the best `keep`
+    results survive and seed the next round's mutations.
+    """
+    targets = set(anti_naive_subtasks(problem))
+    generators = [g for g in problem.test_generators if targets & set(g.target_subtasks)]
+    if not generators or len(problem.solution_approaches) < 2:
+        return []
+
+    rng = random.Random(seed)
+    batch_size = max_workers or os.cpu_count() or 1
+    deadline = time.monotonic() + time_budget
+    population = [
+        FuzzCandidate(generator=g, seed=rng.randrange(1, 2 ** 31), args=list(g.default_args))
+        for g in generators
+    ]
+    best: List[FuzzResult] = []
+
+    while population and time.monotonic() < deadline:
+        best.extend(_evaluate(problem, population, time_limit, repeats))
+        best = sorted(best, key=lambda r: r.fitness, reverse=True)[:keep]
+
+        parents = [r.candidate for r in best] or population
+        population = [mutate(rng.choice(parents), rng) for _ in range(batch_size)]
+
+    return best
+
+
+def fuzz_testcases(problem: CompleteProblem, case_id_start: int = 1, **kwargs) -> List[dict]:
+    """Run the fuzzer and return its worst cases as anti-naive test cases."""
+    targets = anti_naive_subtasks(problem)
+    testcases = []
+    for case_id, result in enumerate(fuzz_worst_cases(problem, **kwargs), case_id_start):
+        generator = result.candidate.generator
+        testcases.append({
+            "id": case_id,
+            "input": result.input,
+            "output": result.output,
+            "generator": generator.name,
+            "seed": result.candidate.seed,
+            "args": list(result.candidate.args),
+            "subtasks": [name for name in generator.target_subtasks if name in targets],
+            "anti_naive": True,
+            "naive_time": result.naive_time,
+            "optimal_time": result.optimal_time
+        })
+    return testcases
@@ -1,8 +1,24 @@
 from langgraph.graph import StateGraph, END
 from structures import *
 from functions import ProblemGenerationService, convert_problem_to_markdown
-from testcase_processor import create_testcase
-from typing import List
+from executor import ExecutionJob, run_jobs
+from validator import validate_inputs
+from fuzzer import fuzz_testcases
+from coverage_selection import select_testcases
+from recipes import compact_testcases
+from checker import stress_test
+from run_log import finish_run, new_run_id, record_update, start_run
+from reporting import event, get_reporter, show, warn
+from corpus import DEFAULT_CORPUS_PATH, ProblemCorpus
+from dedup import filter_duplicate_ideas, get_index
+from artifact_store import DEFAULT_OFFLOAD, load_artifact, offload
+from metrics import use_run
+from tracing import span, use_tracing
+from profiling import profiled, use_profiling
+from context_cache import cache_run
+from typing import Any, Callable, Dict, List
+import os
+import threading
 
 # ============================================================================
 # CONFIGURATION AND CONSTANTS
@@ -26,6 +42,13 @@ TESTER_TYPES = [
 DEFAULT_MAX_REGENERATIONS = 2
 DEFAULT_MAX_REVISIONS = 2
 DEFAULT_RANDOM_CASES_PER_GENERATOR = 3
+DEFAULT_VALIDATION_ATTEMPTS = 3
+DEFAULT_SEED_BASE = 1
+# Fuzzing for anti-naive tests is opt-in: it can add a minute to a run
+DEFAULT_FUZZ_TIME_BUDGET = float(os.getenv("GEN_PROBLEM_FUZZ_TIME_BUDGET", "0"))
+
+# Workflow graph compiled and shared by every run (see get_problem_generation_graph)
+DEFAULT_GRAPH_TOPOLOGY = os.getenv("GEN_PROBLEM_GRAPH_TOPOLOGY", "default")
 
 # ============================================================================
 # SERVICE INITIALIZATION
@@ -45,7 +68,7 @@ class WorkflowService:
                 idea = self.problem_service.create_problem_idea(creator, requirements)
                 ideas.append(idea)
             except Exception as e:
-                print(f"⚠️ Warning: Failed to create idea from {creator}: {e}")
+                warn(f"Failed to create idea from {creator}: {e}")
         return ideas
     
     def evaluate_ideas(self, requirements: ProblemRequirements, ideas: List[ProblemIdea]) -> List[ExpertEvaluation]:
@@ -56,7 +79,7 @@ class WorkflowService:
                 evaluation = self.problem_service.evaluate_problem_idea(requirements, idea)
                 evaluations.append(evaluation)
             except Exception as e:
-                print(f"⚠️ Warning: Failed to evaluate idea '{idea.title}': {e}")
+                warn(f"Failed to evaluate idea '{idea.title}': {e}")
         return evaluations
     
     def test_complete_problem(self, problem: CompleteProblem) -> List[TesterFeedback]:
@@ -67,7 +90,7 @@ class WorkflowService:
                 feedback = self.problem_service.test_problem(tester, problem)
                 feedbacks.append(feedback)
             except Exception as e:
-                print(f"⚠️ Warning: Failed to test with {tester}: {e}")
+                warn(f"Failed to test with {tester}: {e}")
         return feedbacks
 
 # Global service instance
@@ -77,23 +100,22 @@ workflow_service = WorkflowService()
 # UTILITY FUNCTIONS
 # ============================================================================
 
-def log_state(state: ProblemGenerationState, filename: str = "logs.txt") -> None:
-    """Log current state to file."""
+def log_update(state: ProblemGenerationState, update: Dict[str, Any]) -> Dict[str, Any]:
+    """Record the fields a node's partial update changes in the run log, then return the update."""
     try:
-        with open(filename, "a", encoding="utf-8") as f:
-            f.write(f"\n{'='*80}\n")
-            f.write(f"STEP: {state.current_step}\n")
-            f.write(f"STATUS: {state.status}\n")
-            f.write(f"{'='*80}\n")
-            f.write(state.display())
-            f.write("\n")
+        record_update(state, update)
     except Exception as e:
-        print(f"Failed to log state: {e}")
+        warn(f"Failed to log state: {e}")
+    return update
+
+def offload_into(update: Dict[str, Any], role: str, models: List[Any]) -> None:
+    """Move `models` to the artifact store and add their handles to a node's update."""
+    update["artifacts"] = update.get("artifacts", []) + offload(role, models)
 
 def print_section_header(title: str, icon: str = "🔹") -> None:
-    """Print formatted section header."""
-    print(f"\n{icon} {title.upper()} {icon}")
-    print("-" * (len(title) + 6))
+    """Print formatted section header and report it as a progress event."""
+    event("section", title=title)
+    show(f"\n{icon} {title.upper()} {icon}", "-" * (len(title) + 6))
 
 def select_best_recommended_idea(ideas: List[ProblemIdea], evaluations: List[ExpertEvaluation]) -> tuple[ProblemIdea, ExpertEvaluation]:
     """Select the best recommended idea from evaluations."""
@@ -102,9 +124,9 @@ def select_best_recommended_idea(ideas: List[ProblemIdea], evaluations: List[Exp
     for idea, evaluation in zip(ideas, evaluations):
         if evaluation.is_recommended:
             recommended_pairs.append((idea, evaluation))
-            print(f"✅ ACCEPTED: '{idea.title}' (Score: {evaluation.total_score})")
+            show(f"✅ ACCEPTED: '{idea.title}' (Score: {evaluation.total_score})")
         else:
-            print(f"❌ REJECTED: '{idea.title}' - {evaluation.rejection_reason}")
+            show(f"❌ REJECTED: '{idea.title}' - {evaluation.rejection_reason}")
     
     if not recommended_pairs:
         raise ValueError("No ideas were accepted by the curator")
@@ -133,187 +155,278 @@ def analyze_feedback_severity(feedbacks: List[TesterFeedback]) -> bool:
     # Require revision if more than 2 serious issues total
     return serious_issues > 2
 
-def generate_testcases(problem: CompleteProblem, case_id_start: int = 1) -> List[dict]:
-    """Generate test cases from the complete problem."""
+def generate_testcases(
+    problem: CompleteProblem,
+    case_id_start: int = 1,
+    max_attempts: int = DEFAULT_VALIDATION_ATTEMPTS
+) -> List[dict]:
+    """
+    Generate test cases from the complete problem.
+
+    Runs in three parallel stages: generate inputs, validate them against the
+    constraints (regenerating rejected inputs with fresh seeds), then run the
+    optimal solution on the valid inputs only.
+    """
+    cases_per_generator = 10 if len(problem.solution_approaches) == 1 else DEFAULT_RANDOM_CASES_PER_GENERATOR
+    pending = []
+    for generator in problem.test_generators:
+        show(generator.code)
+        pending.extend([generator] * cases_per_generator)
+
+    # Generate and validate inputs, retrying rejected ones with new seeds
+    accepted = []
+    seed = DEFAULT_SEED_BASE
+    for attempt in range(max_attempts):
+        if not pending:
+            break
+        seeds = list(range(seed, seed + len(pending)))
+        seed += len(pending)
+
+        results = run_jobs([
+            ExecutionJob(code=generator.code, language=generator.language, seed=case_seed, args=generator.default_args)
+            for generator, case_seed in zip(pending, seeds)
+        ])
+
+        generated = []
+        for generator, case_seed, result in zip(pending, seeds, results):
+            if result.ok:
+                generated.append((generator, case_seed, result.stdout))
+            else:
+                warn(f"Generator '{generator.name}' failed: {result.stderr.strip()[:200]}")
+
+        verdicts = validate_inputs(problem, [g for g, _, _ in generated], [data for _, _, data in generated])
+        pending = []
+        for (generator, case_seed, data), verdict in zip(generated, verdicts):
+            if verdict.valid:
+                accepted.append((generator, case_seed, data))
+            else:
+                warn(f"Rejected input from '{generator.name}' (seed {case_seed}): {verdict.reason}")
+                pending.append(generator)
+
+    if pending:
+        warn(f"Dropped {len(pending)} case(s) still invalid after {max_attempts} attempts")
+
+    # Run the optimal solution on valid inputs only
+    solution = problem.get_optimal_solution()
+    outputs = run_jobs([
+        ExecutionJob(code=solution.code, language=solution.language, stdin=data)
+        for _, _, data in accepted
+    ])
+
     testcases = []
     case_id = case_id_start
-    
-    # Generate random test cases
-    for generator in problem.test_generators:
-        print(generator.code)
-        for _ in range(10 if len(problem.solution_approaches) == 1 else DEFAULT_RANDOM_CASES_PER_GENERATOR):
-            try:
-                case = create_testcase(
-                    case_id=case_id,
-                    solution_code=problem.solution_approaches[-1].code,
-                    input_code=generator.code
-                )
-                testcases.append(case)
-                case_id += 1
-            except Exception as e:
-                print(f"⚠️ Warning: Failed to generate random test case: {e}")
-    
+    for (generator, case_seed, data), result in zip(accepted, outputs):
+        if not result.ok:
+            reason = "time limit exceeded" if result.timed_out else result.stderr.strip()[:200]
+            warn(f"Failed to generate random test case: {reason}")
+            continue
+        testcases.append({
+            "id": case_id,
+            "input": data,
+            "output": result.stdout,
+            "generator": generator.name,
+            "seed": case_seed,
+            "args": list(generator.default_args),
+            "subtasks": list(generator.target_subtasks)
+        })
+        case_id += 1
+
     return testcases
 
+def build_subtask_manifest(problem: CompleteProblem, testcases: List[dict]) -> Dict[str, List[int]]:
+    """Map every subtask name to the ids of the test cases it is judged on."""
+    manifest = {subtask.name: [] for subtask in problem.subtasks}
+    for case in testcases:
+        for name in case.get("subtasks", []):
+            manifest.setdefault(name, []).append(case["id"])
+    return manifest
+
 # ============================================================================
 # GRAPH NODES
 # ============================================================================
 
-def create_problem_ideas_node(state: ProblemGenerationState) -> ProblemGenerationState:
+def create_problem_ideas_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Generate new problem ideas from multiple expert creators."""
     print_section_header("Generating Problem Ideas", "💡")
     
-    # Update state
-    state.current_step = "idea_generation"
-    
     # Generate ideas
-    state.ideas = workflow_service.create_problem_ideas(state.requirements)
+    ideas = workflow_service.create_problem_ideas(state.requirements)
+    update = {"current_step": "idea_generation", "ideas": ideas}
+    event("ideas_generated", count=len(ideas))
     
     # Display generated ideas
-    for i, idea in enumerate(state.ideas, 1):
-        print(f"\n--- Idea {i}: {idea.title} ---")
-        print(idea.display())
+    for i, idea in enumerate(ideas, 1):
+        show(f"\n--- Idea {i}: {idea.title} ---")
+        show(idea.display)
     
     # Handle regeneration tracking
     if state.regeneration_needed:
-        state.regeneration_count += 1
-        state.regeneration_needed = False
-        print(f"\n🔄 Regeneration #{state.regeneration_count} completed")
+        update["regeneration_count"] = 1
+        update["regeneration_needed"] = False
+        show(f"\n🔄 Regeneration #{state.regeneration_count + 1} completed")
     
-    log_state(state)
-    return state
+    return log_update(state, update)
 
-def evaluate_and_select_idea_node(state: ProblemGenerationState) -> ProblemGenerationState:
+def evaluate_and_select_idea_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Evaluate all ideas and select the best one."""
     print_section_header("Evaluating and Selecting Best Idea", "🧐")
     
-    # Update state
-    state.current_step = "expert_evaluation"
+    # Drop near-duplicates of earlier problems before paying for their evaluation
+    ideas, duplicates = filter_duplicate_ideas(state.ideas)
+    for idea, match in duplicates:
+        warn(f"Idea '{idea.title}' is a near-duplicate of '{match.label}' (similarity {match.similarity:.2f})")
+        event("duplicate_idea", title=idea.title, match=match.label, similarity=match.similarity)
     
     # Evaluate all ideas
-    state.expert_evaluations = workflow_service.evaluate_ideas(state.requirements, state.ideas)
+    evaluations = workflow_service.evaluate_ideas(state.requirements, ideas)
+    update = {"current_step": "expert_evaluation", "expert_evaluations": evaluations}
+    if duplicates:
+        update["ideas"] = ideas
     
     # Display evaluations
-    for i, evaluation in enumerate(state.expert_evaluations, 1):
-        print(f"\n--- Evaluation {i} ---")
-        print(evaluation.display())
+    for i, evaluation in enumerate(evaluations, 1):
+        show(f"\n--- Evaluation {i} ---")
+        show(evaluation.display)
     
     # Try to select best idea
     try:
-        best_idea, best_evaluation = select_best_recommended_idea(state.ideas, state.expert_evaluations)
-        state.selected_idea = best_idea
-        state.best_evaluation = best_evaluation
-        state.current_step = "idea_selected"
+        best_idea, best_evaluation = select_best_recommended_idea(ideas, evaluations)
+        update["selected_idea"] = best_idea
+        update["best_evaluation"] = best_evaluation
+        update["current_step"] = "idea_selected"
 
-        print(f"\n⭐ SELECTED: '{best_idea.title}' with score {best_evaluation.total_score}")
+        show(f"\n⭐ SELECTED: '{best_idea.title}' with score {best_evaluation.total_score}")
+        event("idea_selected", title=best_idea.title, score=best_evaluation.total_score)
         
     except ValueError as e:
-        print(f"\n⚠️ WARNING: {e}")
+        show(f"\n⚠️ WARNING: {e}")
         
         # Check if we can regenerate
         if state.regeneration_count >= state.max_regenerations:
-            print("⛔ FAILURE: Maximum regeneration limit reached")
-            state.status = ProcessStatus.FAILED
-            state.current_step = "failed"
+            show("⛔ FAILURE: Maximum regeneration limit reached")
+            update["status"] = ProcessStatus.FAILED
+            update["current_step"] = "failed"
+            event("failed", reason=str(e))
         else:
-            print(f"🔄 Marking for regeneration (attempt {state.regeneration_count + 1}/{state.max_regenerations})")
-            state.regeneration_needed = True
-            state.selected_idea = None
-            state.current_step = "regeneration_needed"
-    
-    log_state(state)
-    return state
-
-def develop_complete_problem_node(state: ProblemGenerationState) -> ProblemGenerationState:
+            show(f"🔄 Marking for regeneration (attempt {state.regeneration_count + 1}/{state.max_regenerations})")
+            update["regeneration_needed"] = True
+            update["selected_idea"] = None
+            update["current_step"] = "regeneration_needed"
+            event("regeneration_needed", attempt=state.regeneration_count + 1)
+    
+    # In offload mode only the selected idea and its evaluation stay in the state
+    if state.offload:
+        selected, best = update.get("selected_idea"), update.get("best_evaluation")
+        offload_into(update, "idea", [idea for idea in ideas if idea is not selected])
+        offload_into(update, "evaluation", [evaluation for evaluation in evaluations if evaluation is not best])
+        update["ideas"] = [selected] if selected else []
+        update["expert_evaluations"] = [best] if best else []
+    
+    return log_update(state, update)
+
+def develop_complete_problem_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Develop the selected idea into a complete problem."""
     print_section_header("Developing Complete Problem", "✍️")
     
-    # Update state
-    state.current_step = "problem_development"
-    
     # Display evaluations
-    print("Best Evaluation:")
-    print(state.best_evaluation.display())
+    show("Best Evaluation:")
+    show(state.best_evaluation.display)
     
     # Develop complete problem
-    state.complete_problem = workflow_service.problem_service.complete_problem(
+    complete_problem = workflow_service.problem_service.complete_problem(
         problem_idea=state.selected_idea, 
         expert_evaluation=state.best_evaluation,
         problem_requirements=state.requirements
     )
     
-    print(f"\n--- Complete Problem: {state.complete_problem.title} ---")
-    print(state.complete_problem.display())
+    event("problem_developed", title=complete_problem.title)
+    show(f"\n--- Complete Problem: {complete_problem.title} ---")
+    show(complete_problem.display)
     
-    log_state(state)
-    return state
+    return log_update(state, {"current_step": "problem_development", "complete_problem": complete_problem})
 
-def test_problem_node(state: ProblemGenerationState) -> ProblemGenerationState:
+def test_problem_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Test the complete problem with virtual testers."""
     print_section_header("Testing Problem with Virtual Testers", "🧪")
     
-    # Update state
-    state.current_step = "testing"
-    
     # Test with multiple testers
-    state.tester_feedbacks = workflow_service.test_complete_problem(state.complete_problem)
+    feedbacks = workflow_service.test_complete_problem(state.complete_problem)
     
     # Display feedback
-    for i, feedback in enumerate(state.tester_feedbacks, 1):
-        print(f"\n--- Tester Feedback {i} ---")
-        print(feedback.display())
+    for i, feedback in enumerate(feedbacks, 1):
+        show(f"\n--- Tester Feedback {i} ---")
+        show(feedback.display)
+    
+    # Decide here rather than in the router, whose state changes would be discarded
+    revision_needed = analyze_feedback_severity(feedbacks) and state.revision_count < state.max_revisions
+    event("problem_tested", feedback_count=len(feedbacks), revision_needed=revision_needed)
     
-    log_state(state)
-    return state
+    return log_update(state, {
+        "current_step": "testing",
+        "tester_feedbacks": feedbacks,
+        "revision_needed": revision_needed
+    })
 
-def refine_problem_node(state: ProblemGenerationState) -> ProblemGenerationState:
+def refine_problem_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Refine the problem based on tester feedback."""
     print_section_header("Refining Problem Based on Feedback", "🛠️")
     
-    # Update state
-    state.current_step = "revision"
-    state.revision_count += 1
-    
-    print(f"🔄 Revision #{state.revision_count}")
+    show(f"🔄 Revision #{state.revision_count + 1}")
     
     # Refine the problem
-    state.complete_problem = workflow_service.problem_service.reflect_on_feedback(
+    complete_problem = workflow_service.problem_service.reflect_on_feedback(
         state.complete_problem, 
         state.tester_feedbacks
     )
     
-    print(f"\n--- Refined Problem: {state.complete_problem.title} ---")
-    print(state.complete_problem.display())
+    event("problem_refined", revision=state.revision_count + 1)
+    show(f"\n--- Refined Problem: {complete_problem.title} ---")
+    show(complete_problem.display)
     
     # Reset for next testing round
-    state.tester_feedbacks = []
-    state.revision_needed = False
-    
-    log_state(state)
-    return state
+    update = {
+        "current_step": "revision",
+        "revision_count": 1,
+        "complete_problem": complete_problem,
+        "tester_feedbacks": [],
+        "revision_needed": False
+    }
+    if state.offload:
+        offload_into(update, "problem_draft", [state.complete_problem])
+        offload_into(update, "feedback", state.tester_feedbacks)
+    return log_update(state, update)
 
-def finalize_problem_node(state: ProblemGenerationState) -> ProblemGenerationState:
+def finalize_problem_node(state: ProblemGenerationState) -> Dict[str, Any]:
     """Finalize the problem generation process."""
     print_section_header("Finalizing Problem", "🎉")
     
     if state.status == ProcessStatus.FAILED:
-        print("❌ Problem generation failed")
-        return state
+        show("❌ Problem generation failed")
+        return {}
     
     # Update state to completed
-    state.status = ProcessStatus.COMPLETED
-    state.current_step = "completed"
+    update = {"status": ProcessStatus.COMPLETED.value, "current_step": "completed"}
     
-    print("✅ Problem generation completed successfully!")
+    show("✅ Problem generation completed successfully!")
+    event("completed")
     
     # Display final summary
-    summary = state.get_summary()
-    print("\n--- Final Summary ---")
-    for key, value in summary.items():
-        print(f"{key}: {value}")
-    
-    log_state(state)
-    return state
+    if get_reporter().enabled:
+        summary = state.model_copy(update=update).get_summary()
+        show("\n--- Final Summary ---")
+        for key, value in summary.items():
+            show(f"{key}: {value}")
+    
+    # A finished offloaded state holds nothing but handles
+    if state.offload:
+        offload_into(update, "selected_idea", [state.selected_idea])
+        offload_into(update, "best_evaluation", [state.best_evaluation])
+        offload_into(update, "problem", [state.complete_problem])
+        offload_into(update, "feedback", state.tester_feedbacks)
+        update.update(ideas=[], expert_evaluations=[], selected_idea=None, best_evaluation=None,
+                      complete_problem=None, tester_feedbacks=[])
+    
+    return log_update(state, update)
 
 # ============================================================================
 # ROUTING FUNCTIONS
@@ -324,32 +437,28 @@ def route_after_evaluation(state: ProblemGenerationState) -> str:
     print_section_header("Routing Decision After Evaluation", "🤔")
     
     if state.status == ProcessStatus.FAILED:
-        print("❌ Process failed - routing to finalization")
+        show("❌ Process failed - routing to finalization")
         return "finalize"
     
     if state.regeneration_needed:
-        print("🔄 No acceptable ideas - routing to regeneration")
+        show("🔄 No acceptable ideas - routing to regeneration")
         return "regenerate"
     
-    print("✅ Good idea selected - routing to development")
+    show("✅ Good idea selected - routing to development")
     return "develop"
 
 def route_after_testing(state: ProblemGenerationState) -> str:
     """Route after testing - either refine or finalize."""
     print_section_header("Routing Decision After Testing", "🤔")
     
-    # Analyze feedback to determine if revision is needed
-    needs_revision = analyze_feedback_severity(state.tester_feedbacks)
-    
-    if needs_revision and state.revision_count < state.max_revisions:
-        print(f"🔧 Issues found - routing to revision (attempt {state.revision_count + 1}/{state.max_revisions})")
-        state.revision_needed = True
+    if state.revision_needed:
+        show(f"🔧 Issues found - routing to revision (attempt {state.revision_count + 1}/{state.max_revisions})")
         return "refine"
     
-    if needs_revision and state.revision_count >= state.max_revisions:
-        print("⚠️ Issues found but max revisions reached - proceeding to finalization")
+    if analyze_feedback_severity(state.tester_feedbacks):
+        show("⚠️ Issues found but max revisions reached - proceeding to finalization")
     else:
-        print("✅ Problem is ready - routing to finalization")
+        show("✅ Problem is ready - routing to finalization")
     
     return "finalize"
 
@@ -357,17 +466,31 @@ def route_after_testing(state: ProblemGenerationState) -> str:
 # GRAPH CONSTRUCTION
 # ============================================================================
 
+def traced_node(name: str, node):
+    """
+    Wrap a graph node so every execution is a trace span carrying the loop counters
+    and problem title, and is profiled when selected by name (see profiling.py).
+    """
+    def run(state: ProblemGenerationState) -> Dict[str, Any]:
+        problem = state.complete_problem or state.selected_idea
+        with span(f"node:{name}", run_id=state.run_id, regeneration_count=state.regeneration_count,
+                  revision_count=state.revision_count, title=problem.title if problem else None), \
+                profiled(name, state.run_id, node.__name__):
+            return node(state)
+    return run
+
+
 def build_problem_generation_graph() -> StateGraph:
     """Build and return the problem generation workflow graph."""
     workflow = StateGraph(ProblemGenerationState)
     
     # Add nodes
-    workflow.add_node("create_ideas", create_problem_ideas_node)
-    workflow.add_node("evaluate_select", evaluate_and_select_idea_node)
-    workflow.add_node("develop_problem", develop_complete_problem_node)
-    workflow.add_node("test_problem", test_problem_node)
-    workflow.add_node("refine_problem", refine_problem_node)
-    workflow.add_node("finalize", finalize_problem_node)
+    workflow.add_node("create_ideas", traced_node("create_ideas", create_problem_ideas_node))
+    workflow.add_node("evaluate_select", traced_node("evaluate_select", evaluate_and_select_idea_node))
+    workflow.add_node("develop_problem", traced_node("develop_problem", develop_complete_problem_node))
+    workflow.add_node("test_problem", traced_node("test_problem", test_problem_node))
+    workflow.add_node("refine_problem", traced_node("refine_problem", refine_problem_node))
+    workflow.add_node("finalize", traced_node("finalize", finalize_problem_node))
     
     # Set entry point
     workflow.set_entry_point("create_ideas")
@@ -400,6 +523,40 @@ def build_problem_generation_graph() -> StateGraph:
     
     return workflow.compile()
 
+
+# Builders of the compiled graph per topology key
+GRAPH_BUILDERS: Dict[str, Callable[[], Any]] = {
+    "default": build_problem_generation_graph,
+}
+
+_compiled_graphs: Dict[str, Any] = {}
+_compiled_graphs_lock = threading.Lock()
+
+
+def get_problem_generation_graph(topology: str = DEFAULT_GRAPH_TOPOLOGY):
+    """
+    Return the compiled workflow graph of `topology`, compiling it on first use.
+    
+    A compiled graph keeps no per-run state (there is no checkpointer and the nodes
+    look up `workflow_service` when they run), so one instance is shared by every
+    run, including concurrent runs on other threads or async tasks.
+    """
+    app = _compiled_graphs.get(topology)
+    if app is not None:
+        return app
+    if topology not in GRAPH_BUILDERS:
+        raise ValueError(f"Unknown graph topology '{topology}'. Available: {list(GRAPH_BUILDERS)}")
+    with _compiled_graphs_lock:
+        if topology not in _compiled_graphs:
+            _compiled_graphs[topology] = GRAPH_BUILDERS[topology]()
+        return _compiled_graphs[topology]
+
+
+def clear_graph_cache() -> None:
+    """Drop every compiled graph, e.g. after changing GRAPH_BUILDERS."""
+    with _compiled_graphs_lock:
+        _compiled_graphs.clear()
+
 # ============================================================================
 # MAIN EXECUTION FUNCTION
 # ============================================================================
@@ -409,7 +566,14 @@ def generate_problem(
     constraints: str = "",
     special_requirements: str = "",
     max_regenerations: int = DEFAULT_MAX_REGENERATIONS,
-    max_revisions: int = DEFAULT_MAX_REVISIONS
+    max_revisions: int = DEFAULT_MAX_REVISIONS,
+    fuzz_time_budget: float = DEFAULT_FUZZ_TIME_BUDGET,
+    select_tests: bool = True,
+    compact_threshold: Optional[int] = None,
+    offload: bool = DEFAULT_OFFLOAD,
+    profile: Optional[List[str]] = None,
+    context_cache: Optional[bool] = None,
+    trace: Optional[bool] = None
 ) -> Dict[str, Any]:
     """
     Generate a complete competitive programming problem.
@@ -420,10 +584,45 @@ def generate_problem(
         special_requirements: Additional requirements
         max_regenerations: Maximum idea regeneration attempts
         max_revisions: Maximum problem revision attempts
+        fuzz_time_budget: Seconds spent searching for anti-naive tests; 0 (the default unless
+            GEN_PROBLEM_FUZZ_TIME_BUDGET is set) skips fuzzing
+        select_tests: Reduce the test set to a coverage-preserving subset
+        compact_threshold: Store cases larger than this many bytes as generator recipes
+            (materialize them with recipes.materialize_testcases); None keeps every case inline
+        offload: Keep idea, evaluation, feedback and draft bodies in the artifact store
+            instead of the workflow state (see artifact_store.py)
+        profile: Node or phase names to profile with cProfile and tracemalloc, or ["all"];
+            None uses GEN_PROBLEM_PROFILE (see profiling.py)
+        context_cache: Keep static prompt prefixes in provider context caches for this run,
+            deleting them when it ends; None uses GEN_PROBLEM_CONTEXT_CACHE (see context_cache.py)
+        trace: Record the run's spans to the trace directory; None uses GEN_PROBLEM_TRACING
+            (see tracing.py)
         
     Returns:
         Dictionary containing the complete problem or empty dict if failed
     """
+    run_id = new_run_id()
+    # Root span: the run's trace is written to the trace directory when it ends (see tracing.py)
+    with use_tracing(trace), span("generate_problem", run_id=run_id, topic=topic, offload=offload), \
+            use_profiling(profile), cache_run(context_cache):
+        return _generate_problem(
+            run_id, topic, constraints, special_requirements, max_regenerations, max_revisions,
+            fuzz_time_budget, select_tests, compact_threshold, offload
+        )
+
+
+def _generate_problem(
+    run_id: str,
+    topic: str,
+    constraints: str,
+    special_requirements: str,
+    max_regenerations: int,
+    max_revisions: int,
+    fuzz_time_budget: float,
+    select_tests: bool,
+    compact_threshold: Optional[int],
+    offload: bool
+) -> Dict[str, Any]:
     print_section_header("Starting Problem Generation Workflow", "🚀")
     
     # Initialize requirements
@@ -438,31 +637,81 @@ def generate_problem(
         requirements=requirements,
         max_regenerations=max_regenerations,
         max_revisions=max_revisions,
+        run_id=run_id,
+        offload=offload,
         current_step="initialization",
         status=ProcessStatus.IN_PROGRESS
     )
+    show(f"Run id: {initial_state.run_id}")
+    event("run_started", run_id=initial_state.run_id)
+    start_run(initial_state)
     
-    # Build and run workflow
-    app = build_problem_generation_graph()
-    final_state = app.invoke(initial_state)
-    final_state = ProblemGenerationState(**final_state)
+    # Run the shared compiled workflow
+    app = get_problem_generation_graph()
+    try:
+        with use_run(initial_state.run_id):
+            final_state = app.invoke(initial_state)
+    finally:
+        finish_run(initial_state.run_id)
+    # Everything but finalize's own status fields was validated as finalize's input.
+    # LangGraph also exposes the private fingerprint caches as channels; passing them
+    # on would make the new model share the initial state's stale caches
+    final_state = ProblemGenerationState.model_construct(
+        **{name: value for name, value in final_state.items() if name in ProblemGenerationState.model_fields}
+    )
     
     # Check final status
     if final_state.status == ProcessStatus.FAILED:
         print_section_header("Problem Generation Failed", "❌")
         return {}
     
-    # Extract complete problem
-    problem = final_state.complete_problem
+    # Extract complete problem; an offloaded run only holds its handle
+    if final_state.offload:
+        problem = load_artifact(final_state.artifacts, "problem")
+        selected_idea = load_artifact(final_state.artifacts, "selected_idea")
+    else:
+        problem, selected_idea = final_state.complete_problem, final_state.selected_idea
     if not problem:
         print_section_header("No Complete Problem Generated", "⚠️")
         return {}
     
+    # Later ideas resembling this problem are rejected before evaluation
+    duplicate_index = get_index()
+    duplicate_index.add_idea(selected_idea)
+    duplicate_index.add_problem(problem)
+    
     # Generate test cases
     
     print_section_header("Generating Test Cases", "📝")
-    testcases = generate_testcases(problem)
-    print(f"Generated {len(testcases)} test cases")
+    with span("generate_testcases", title=problem.title), profiled("generate_testcases", run_id):
+        testcases = generate_testcases(problem)
+    show(f"Generated {len(testcases)} test cases")
+    event("testcases_generated", count=len(testcases))
+    
+    if fuzz_time_budget > 0:
+        print_section_header("Fuzzing Worst-Case Tests", "🔥")
+        with span("fuzz_testcases", time_budget=fuzz_time_budget), profiled("fuzz_testcases", run_id):
+            anti_naive = fuzz_testcases(problem, case_id_start=len(testcases) + 1, time_budget=fuzz_time_budget)
+        testcases.extend(anti_naive)
+        show(f"Added {len(anti_naive)} anti-naive test cases")
+    
+    print_section_header("Stress Testing Solutions", "⚖️")
+    with span("stress_test", testcases=len(testcases)), profiled("stress_test", run_id):
+        stress_failures = stress_test(problem, testcases)
+    for failure in stress_failures:
+        warn(f"'{failure['solution']}' failed case {failure['case_id']}: {failure['message']}")
+    show(f"Stress test finished with {len(stress_failures)} failure(s)")
+    
+    coverage_report = {}
+    if select_tests:
+        print_section_header("Selecting Tests by Coverage", "🎯")
+        with span("select_testcases", testcases=len(testcases)), profiled("select_testcases", run_id):
+            testcases, coverage_report = select_testcases(problem, testcases)
+        show(f"Kept {coverage_report['selected_count']}/{coverage_report['candidate_count']} test cases")
+    
+    manifest = build_subtask_manifest(problem, testcases)
+    if compact_threshold is not None:
+        testcases = compact_testcases(problem, testcases, compact_threshold)
     
     print_section_header("Problem Generation Completed Successfully", "✅")
     
@@ -472,7 +721,12 @@ def generate_problem(
     return {
         "problem_statement": problem_statement,
         "solution": solution,
-        "testcases": testcases
+        "complete_problem": problem,
+        "testcases": testcases,
+        "manifest": manifest,
+        "coverage_report": coverage_report,
+        "stress_failures": stress_failures,
+        "artifacts": final_state.artifacts
     }
 
 # ============================================================================
@@ -489,17 +743,20 @@ def main():
         constraints=constraints,
         special_requirements=special_requirements
     )
+    if not result:
+        return
 
     import json
 
-    id=7
+    with ProblemCorpus() as corpus:
+        id = corpus.add(result["complete_problem"], topic=topic)
+        corpus.export("demo", [id])
 
-    with open(f"demo/problem_statement{id}.md", "w") as f:
-        f.write(result["problem_statement"])
-    with open(f"demo/solution{id}.md", "w") as f:
-        f.write(result["solution"])
-    with open(f"demo/testcases{id}.txt", "w") as f:
-            f.write(str(json.dumps({"testcase":result["testcases"]})))
+        testcase_path = f"demo/testcases{id}.txt"
+        with open(testcase_path, "w") as f:
+                f.write(str(json.dumps({"testcase":result["testcases"], "manifest":result["manifest"]})))
+        corpus.attach_testcases(id, testcase_path, result["manifest"])
+    print(f"Stored problem {id} in {DEFAULT_CORPUS_PATH}")
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,185 @@
+"""
+Load Test
+
+This module load-tests `generate_problem` against the fake LLM provider in
+fake_provider.py, with no network. For every concurrency level it runs a batch of
+problem generations on that many worker threads (as a batch worker would) and
+reports throughput and the tail latency of whole runs and of single LLM calls,
+together with the retries caused by simulated errors and rate limits.
+
+Latencies are those of the fake profile times `--time-scale`; divide the reported
+times (and multiply throughput) by the scale to read them in real-model terms.
+Test generation, validation and stress testing downstream run for real.
+
+Usage:
+    python loadtest.py --concurrency 1 4 16 --runs 32 --time-scale 0.01
+    python loadtest.py --concurrency 8 32 --rate-limit 0.05 --max-in-flight 40 --json report.json
+
+Run logs are written as usual; set GEN_PROBLEM_LOG_DIR to keep them out of logs/runs.
+"""
+
+import argparse
+import dataclasses
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+import dedup
+import gen_problem
+import metrics
+from fake_provider import FakeLLMProfile, set_fake_profile
+from functions import LLMProvider
+from reporting import headless, use_reporter
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_RUNS = 32
+DEFAULT_TIME_SCALE = 0.01
+DEFAULT_TOPIC = "Arrays"
+
+
+# =============================================================================
+# Results
+# =============================================================================
+
+@dataclass
+class LoadTestResult:
+    """Outcome of one batch at one concurrency level."""
+    concurrency: int
+    runs: int
+    completed: int
+    failed: int
+    wall_time: float
+    throughput_per_min: float
+    run_p50: float
+    run_p95: float
+    run_p99: float
+    llm_calls: int
+    llm_failures: int
+    llm_retries: int
+    llm_p50: float
+    llm_p99: float
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+# =============================================================================
+# Load Test
+# =============================================================================
+
+def use_fake_provider(profile: FakeLLMProfile) -> None:
+    """Point every service of the workflow at the fake provider with `profile`."""
+    set_fake_profile(profile)
+    service = gen_problem.workflow_service.problem_service
+    for llm_service in (service.idea_service, service.evaluation_service, service.completion_service,
+                        service.testing_service, service.reflection_service):
+        llm_service.config = dataclasses.replace(llm_service.config, provider=LLMProvider.FAKE)
+
+
+def _timed_run(topic: str, generate_kwargs: Dict[str, Any]) -> Optional[float]:
+    """Seconds one generate_problem call took, or None if it produced no problem."""
+    started = time.perf_counter()
+    with use_reporter(headless()):
+        try:
+            result = gen_problem.generate_problem(topic=topic, **generate_kwargs)
+        except Exception:
+            return None
+    return time.perf_counter() - started if result else None
+
+
+def run_load(concurrency: int, runs: int, profile: FakeLLMProfile, topic: str = DEFAULT_TOPIC,
+             **generate_kwargs: Any) -> LoadTestResult:
+    """Generate `runs` problems on `concurrency` threads against the fake provider."""
+    use_fake_provider(profile)
+    generate_kwargs.setdefault("fuzz_time_budget", 0.0)
+    with tempfile.TemporaryDirectory() as root:
+        metrics_path = os.path.join(root, "metrics.jsonl")
+        metrics.set_sink(metrics.MetricsSink(metrics_path))
+        # Fake ideas must not be compared with (or added to) the real duplicate index
+        dedup.set_index(dedup.DuplicateIndex())
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = list(pool.map(lambda _: _timed_run(topic, generate_kwargs), range(runs)))
+            wall_time = time.perf_counter() - started
+            records = metrics.load_records(metrics_path) if os.path.exists(metrics_path) else []
+        finally:
+            metrics.set_sink(None)
+            dedup.set_index(None)
+
+    completed = [latency for latency in latencies if latency is not None]
+    call_latencies = [record["latency"] for record in records]
+    return LoadTestResult(
+        concurrency=concurrency,
+        runs=runs,
+        completed=len(completed),
+        failed=runs - len(completed),
+        wall_time=wall_time,
+        throughput_per_min=len(completed) / wall_time * 60,
+        run_p50=percentile(completed, 50),
+        run_p95=percentile(completed, 95),
+        run_p99=percentile(completed, 99),
+        llm_calls=len(records),
+        llm_failures=sum(not record["success"] for record in records),
+        llm_retries=sum(record["retries"] for record in records),
+        llm_p50=percentile(call_latencies, 50),
+        llm_p99=percentile(call_latencies, 99),
+    )
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test generate_problem against the fake LLM provider")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Problems generated per concurrency level")
+    parser.add_argument("--time-scale", type=float, default=DEFAULT_TIME_SCALE, help="Multiplier of fake latencies")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Log-normal sigma of fake latencies")
+    parser.add_argument("--errors", type=float, default=0.0, help="Share of calls failing with a server error")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Share of calls rejected with 429")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Calls beyond this many in flight get 429")
+    parser.add_argument("--acceptance", type=float, default=0.7, help="Share of ideas the evaluator accepts")
+    parser.add_argument("--revision", type=float, default=0.2, help="Share of tester feedbacks requesting a revision")
+    parser.add_argument("--offload", action="store_true", help="Run in artifact offload mode")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'conc':>4} {'done':>5} {'fail':>4} {'wall s':>8} {'per min':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+          f"{'calls':>6} {'retry':>6} {'c.p50':>6} {'c.p99':>6}")
+    for concurrency in args.concurrency:
+        profile = FakeLLMProfile(
+            latency_sigma=args.latency_sigma, time_scale=args.time_scale, error_rate=args.errors,
+            rate_limit_rate=args.rate_limit, max_concurrent_calls=args.max_in_flight,
+            acceptance_rate=args.acceptance, revision_rate=args.revision, seed=args.seed
+        )
+        result = run_load(concurrency, args.runs, profile, offload=args.offload)
+        results.append(result)
+        print(f"{result.concurrency:>4} {result.completed:>5} {result.failed:>4} {result.wall_time:>8.2f} "
+              f"{result.throughput_per_min:>8.1f} {result.run_p50:>7.2f} {result.run_p95:>7.2f} {result.run_p99:>7.2f} "
+              f"{result.llm_calls:>6} {result.llm_retries:>6} {result.llm_p50:>6.2f} {result.llm_p99:>6.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
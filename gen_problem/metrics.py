@@ -0,0 +1,255 @@
+"""
+LLM Call Metrics
+
+This module records one metrics record per LLM call made by the services in
+functions.py: the service and stage, the model, the prompt size, the token usage
+reported by the provider (prompt, output, reasoning and cached tokens), the time
+to first byte, the total latency and the number of retries. Records are appended
+to a local JSONL file and tagged with the run id of the problem being generated,
+so the command line can summarize token usage and cost per problem and per stage.
+
+Usage:
+    python metrics.py summary                    # cost per stage
+    python metrics.py summary --by run           # cost per problem
+    python metrics.py summary --run RUN_ID --by model
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+# An empty path disables recording.
+DEFAULT_METRICS_PATH = os.getenv("GEN_PROBLEM_METRICS", os.path.join("logs", "metrics.jsonl"))
+
+# USD per million tokens: (input, cached input, output). Reasoning tokens are billed as output.
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gemini-2.5-pro-preview-03-25": (1.25, 0.31, 10.0),
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "o3-mini": (1.10, 0.55, 4.40),
+}
+
+SUMMARY_KEYS = ("run", "stage", "service", "model")
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Records
+# =============================================================================
+
+@dataclass
+class CallMetrics:
+    """Metrics of one LLM call, including every retry it took."""
+    service: str
+    stage: str
+    model: str
+    prompt_chars: int
+    run_id: str = ""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    reasoning_tokens: int = 0
+    cached_tokens: int = 0
+    time_to_first_byte: Optional[float] = None
+    latency: float = 0.0
+    retries: int = 0
+    cache_hit: bool = False
+    success: bool = True
+    error: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+    def add_usage(self, usage: Optional[Mapping[str, Any]]) -> None:
+        """Add a response's `usage_metadata`; failed attempts that returned a response are billed too."""
+        if not usage:
+            return
+        self.input_tokens += usage.get("input_tokens", 0)
+        self.output_tokens += usage.get("output_tokens", 0)
+        self.reasoning_tokens += (usage.get("output_token_details") or {}).get("reasoning", 0)
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        self.cached_tokens += cached
+        self.cache_hit = self.cache_hit or cached > 0
+
+    @property
+    def cost(self) -> float:
+        """Estimated cost in USD, or 0 for models without a known price."""
+        return estimate_cost(self.model, self.input_tokens, self.cached_tokens, self.output_tokens)
+
+
+def estimate_cost(model: str, input_tokens: int, cached_tokens: int, output_tokens: int) -> float:
+    """Estimated cost in USD of the given token counts."""
+    prices = MODEL_PRICES.get(model.split("/")[-1])
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    return ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+            + output_tokens * output_price) / 1e6
+
+
+class CallTimer(BaseCallbackHandler):
+    """Callback handler noting when the first part of a response arrived."""
+
+    def __init__(self):
+        self.first_byte_at: Optional[float] = None
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        # Without streaming the whole response arrives at once
+        if self.first_byte_at is None:
+            self.first_byte_at = time.perf_counter()
+
+    def elapsed(self, started: float) -> Optional[float]:
+        """Seconds from `started` to the first byte, if a response arrived."""
+        return None if self.first_byte_at is None else self.first_byte_at - started
+
+
+# =============================================================================
+# Sink
+# =============================================================================
+
+_run_id: ContextVar[str] = ContextVar("gen_problem_metrics_run", default="")
+
+
+@contextmanager
+def use_run(run_id: str) -> Iterator[None]:
+    """Tag every call recorded inside the block with `run_id`."""
+    token = _run_id.set(run_id)
+    try:
+        yield
+    finally:
+        _run_id.reset(token)
+
+
+class MetricsSink:
+    """Appends metrics records to a JSONL file."""
+
+    def __init__(self, path: str = DEFAULT_METRICS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, metrics: CallMetrics) -> None:
+        """Append one record; a sink without a path drops it."""
+        if not self.path:
+            return
+        line = json.dumps(dict(asdict(metrics), cost=metrics.cost), ensure_ascii=False) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_sink: Optional[MetricsSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> MetricsSink:
+    """Return the process-wide sink, creating it on first use."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = MetricsSink()
+        return _sink
+
+
+def set_sink(sink: Optional[MetricsSink]) -> None:
+    """Send every later record to `sink`; None restores the default sink."""
+    global _sink
+    with _sink_lock:
+        _sink = sink
+
+
+def record_call(metrics: CallMetrics) -> None:
+    """Tag `metrics` with the current run and write it to the sink."""
+    metrics.run_id = metrics.run_id or _run_id.get()
+    try:
+        get_sink().write(metrics)
+    except OSError as e:
+        logger.warning(f"Failed to record LLM call metrics: {e}")
+
+
+# =============================================================================
+# Summaries
+# =============================================================================
+
+def load_records(path: str = DEFAULT_METRICS_PATH, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Read the records of a metrics file, optionally of one run only."""
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record for record in records if run_id is None or record["run_id"] == run_id]
+
+
+def summarize(records: List[Dict[str, Any]], by: str = "stage") -> List[Dict[str, Any]]:
+    """Aggregate records per run, stage, service or model; most expensive first."""
+    key = "run_id" if by == "run" else by
+    groups: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        groups[record.get(key) or "-"].append(record)
+
+    rows = []
+    for name, group in groups.items():
+        latencies = sorted(record["latency"] for record in group)
+        first_bytes = [record["time_to_first_byte"] for record in group if record["time_to_first_byte"] is not None]
+        rows.append({
+            by: name,
+            "calls": len(group),
+            "failures": sum(not record["success"] for record in group),
+            "retries": sum(record["retries"] for record in group),
+            "cache_hits": sum(record["cache_hit"] for record in group),
+            "input_tokens": sum(record["input_tokens"] for record in group),
+            "cached_tokens": sum(record["cached_tokens"] for record in group),
+            "output_tokens": sum(record["output_tokens"] for record in group),
+            "reasoning_tokens": sum(record["reasoning_tokens"] for record in group),
+            "cost": sum(record["cost"] for record in group),
+            "mean_ttfb": sum(first_bytes) / len(first_bytes) if first_bytes else 0.0,
+            "mean_latency": sum(latencies) / len(latencies),
+            "p95_latency": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        })
+    return sorted(rows, key=lambda row: -row["cost"])
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize LLM call metrics")
+    parser.add_argument("--path", default=DEFAULT_METRICS_PATH, help="Metrics JSONL file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = subparsers.add_parser("summary", help="Token usage, cost and latency per group")
+    summary_parser.add_argument("--by", choices=SUMMARY_KEYS, default="stage")
+    summary_parser.add_argument("--run", default=None, help="Only this run id")
+
+    args = parser.parse_args()
+    rows = summarize(load_records(args.path, args.run), args.by)
+    print(f"{args.by:<28} {'calls':>5} {'fail':>4} {'retry':>5} {'hits':>6} {'input':>9} {'output':>9} "
+          f"{'reason':>9} {'cost $':>9} {'ttfb s':>7} {'mean s':>7} {'p95 s':>7}")
+    for row in rows:
+        print(f"{row[args.by]:<28} {row['calls']:>5} {row['failures']:>4} {row['retries']:>5} {row['cache_hits']:>6} "
+              f"{row['input_tokens']:>9} {row['output_tokens']:>9} {row['reasoning_tokens']:>9} {row['cost']:>9.4f} "
+              f"{row['mean_ttfb']:>7.2f} {row['mean_latency']:>7.2f} {row['p95_latency']:>7.2f}")
+    if rows:
+        print(f"{'total':<28} {sum(row['calls'] for row in rows):>5} {'':>4} {'':>5} {'':>6} "
+              f"{sum(row['input_tokens'] for row in rows):>9} {sum(row['output_tokens'] for row in rows):>9} "
+              f"{sum(row['reasoning_tokens'] for row in rows):>9} {sum(row['cost'] for row in rows):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from langchain_openai import AzureChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 from dotenv import load_dotenv
+from fake_provider import FakeChatModel
 
 load_dotenv()
 
@@ -13,16 +14,21 @@ def gemini_2_flash(temperature):
         max_tokens=8190
     )
 
-def gemini_2_5_pro(temperature):
+def gemini_2_5_pro(temperature, cached_content=None):
     return ChatGoogleGenerativeAI(
         api_key=os.getenv("GEMINI_API_KEY"),
         model="gemini-2.5-pro-preview-03-25",
         temperature=temperature,
         max_tokens=65000,
         max_retries=3,
-        timeout=120
+        timeout=120,
+        cached_content=cached_content
     )
 
+def fake_llm(temperature=0.0):
+    # Local stand-in without network access; see fake_provider.py
+    return FakeChatModel(temperature=temperature)
+
 def gpt_4o_mini(temperature=0.7):
     return AzureChatOpenAI(
         model="gpt-4o-mini",
@@ -0,0 +1,251 @@
+"""
+Stage Profiling
+
+This module profiles selected graph nodes and post-processing phases of a run
+(see gen_problem.py) with cProfile and tracemalloc, without editing the workflow.
+Profiling is off by default. Stages are selected by node or phase name (or node
+function name), either with GEN_PROBLEM_PROFILE or the `profile` argument of
+`generate_problem`.
+
+Every profiled stage writes to `{profile_dir}/{run_id}/`:
+    {stage}.prof          cProfile stats (python -m pstats, snakeviz, ...)
+    {stage}.txt           the hottest functions by own time and by cumulative time
+    {stage}.memory.txt    the allocation sites that grew the most (tracemalloc)
+    summary.jsonl         one line per stage: wall time, CPU time of the stage's thread,
+                          time spent waiting (on LLM calls, subprocesses or worker
+                          threads), own time per category
+                          (pydantic, display, json, subprocess, ...) and allocation peak
+
+A stage that runs several times (e.g. test_problem once per revision) gets
+numbered files. cProfile only follows the thread running the stage. tracemalloc
+is process-wide, so allocations of concurrent runs are mixed in.
+
+Usage:
+    GEN_PROBLEM_PROFILE=develop_problem,generate_testcases python gen_problem.py
+    GEN_PROBLEM_PROFILE=all GEN_PROBLEM_PROFILE_KINDS=cpu python gen_problem.py
+    generate_problem("Graph", profile=["develop_complete_problem_node"])
+    python profiling.py summary RUN_ID
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+# Comma-separated stage names, or "all"; empty disables profiling.
+DEFAULT_PROFILE = os.getenv("GEN_PROBLEM_PROFILE", "")
+DEFAULT_PROFILE_KINDS = os.getenv("GEN_PROBLEM_PROFILE_KINDS", "cpu,memory")
+DEFAULT_PROFILE_DIR = os.getenv("GEN_PROBLEM_PROFILE_DIR", os.path.join("logs", "profiles"))
+PROFILE_KINDS = ("cpu", "memory")
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 30
+
+# Own time is attributed to the first category whose marker occurs in "file:function"
+CATEGORIES = [
+    ("wait", ("acquire", "time.sleep", "select.", "'poll'", "_wait", "ssl", "socket")),
+    ("pydantic", ("pydantic",)),
+    ("display", ("rich", "reporting.py", "display")),
+    ("json", ("json", "orjson")),
+    ("subprocess", ("subprocess", "posix", "fork_exec")),
+    ("langchain", ("langchain", "langgraph", "langsmith")),
+]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_selection(value: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """Stage names from a comma-separated string or a list."""
+    if value is None:
+        return frozenset()
+    names = value.split(",") if isinstance(value, str) else value
+    return frozenset(name.strip() for name in names if name.strip())
+
+
+_selection: ContextVar[FrozenSet[str]] = ContextVar("gen_problem_profile", default=parse_selection(DEFAULT_PROFILE))
+_active: ContextVar[bool] = ContextVar("gen_problem_profile_active", default=False)
+
+
+@contextmanager
+def use_profiling(stages: Optional[Iterable[str]]) -> Iterator[None]:
+    """Profile `stages` (names, or "all") within the block; None keeps the current selection."""
+    if stages is None:
+        yield
+        return
+    token = _selection.set(parse_selection(stages))
+    try:
+        yield
+    finally:
+        _selection.reset(token)
+
+
+def is_selected(*names: str) -> bool:
+    selection = _selection.get()
+    return bool(selection) and ("all" in selection or any(name in selection for name in names))
+
+
+# =============================================================================
+# Profiling
+# =============================================================================
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+# Whether this module started tracemalloc, rather than the caller (e.g. python -X tracemalloc)
+_tracemalloc_owned = False
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def categorize(stats: pstats.Stats) -> Dict[str, float]:
+    """Own time of the profiled functions per category (see CATEGORIES)."""
+    totals: Dict[str, float] = {name: 0.0 for name, _ in CATEGORIES}
+    totals["other"] = 0.0
+    for (filename, _, function), (_, _, own_time, _, _) in stats.stats.items():
+        location = f"{filename}:{function}"
+        category = next((name for name, markers in CATEGORIES if any(marker in location for marker in markers)), "other")
+        totals[category] += own_time
+    return {name: round(seconds, 4) for name, seconds in totals.items()}
+
+
+def _stage_path(run_dir: str, stage: str) -> str:
+    """`{run_dir}/{stage}`, numbered from the second run of a stage on."""
+    path, index = os.path.join(run_dir, stage), 2
+    while os.path.exists(path + ".prof") or os.path.exists(path + ".memory.txt"):
+        path, index = os.path.join(run_dir, f"{stage}.{index}"), index + 1
+    return path
+
+
+def _write_cpu(path: str, profiler: cProfile.Profile, summary: Dict[str, Any]) -> None:
+    profiler.dump_stats(path + ".prof")
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    summary["categories"] = categorize(stats)
+    report.write(f"wall {summary['wall']:.3f}s  cpu {summary['cpu']:.3f}s  wait {summary['wait']:.3f}s\n")
+    report.write(f"own time by category: {summary['categories']}\n")
+    stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    with open(path + ".txt", "w", encoding="utf-8") as f:
+        f.write(report.getvalue())
+
+
+def _write_memory(path: str, before: tracemalloc.Snapshot, after: tracemalloc.Snapshot,
+                  summary: Dict[str, Any]) -> None:
+    differences = after.compare_to(before, "lineno")
+    summary["alloc_net_kb"] = round(sum(difference.size_diff for difference in differences) / 1024, 1)
+    with open(path + ".memory.txt", "w", encoding="utf-8") as f:
+        f.write(f"peak {summary['alloc_peak_kb']} KiB  net {summary['alloc_net_kb']} KiB\n")
+        for difference in differences[:TOP_ALLOCATIONS]:
+            f.write(f"{difference}\n")
+
+
+@contextmanager
+def profiled(stage: str, run_id: str, *aliases: str, kinds: str = DEFAULT_PROFILE_KINDS,
+             directory: str = DEFAULT_PROFILE_DIR) -> Iterator[None]:
+    """Profile the block when `stage` (or an alias) is selected; stages nested in a profiled one are not."""
+    if _active.get() or not is_selected(stage, *aliases):
+        yield
+        return
+    kinds = parse_selection(kinds) & set(PROFILE_KINDS)
+    profiler = cProfile.Profile() if "cpu" in kinds else None
+    before = None
+    if "memory" in kinds:
+        _start_tracemalloc()
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+    token = _active.set(True)
+    wall_started, cpu_started = time.perf_counter(), time.thread_time()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Python 3.12+ allows one cProfile at a time, e.g. for concurrent runs
+            logger.warning(f"Not CPU-profiling {stage}: {e}")
+            profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall, cpu = time.perf_counter() - wall_started, time.thread_time() - cpu_started
+        _active.reset(token)
+        summary: Dict[str, Any] = {"stage": stage, "wall": round(wall, 4), "cpu": round(cpu, 4),
+                                   "wait": round(max(0.0, wall - cpu), 4)}
+        try:
+            run_dir = os.path.join(directory, run_id)
+            os.makedirs(run_dir, exist_ok=True)
+            path = _stage_path(run_dir, stage)
+            summary["files"] = os.path.basename(path)
+            if before is not None:
+                summary["alloc_peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                _write_memory(path, before, tracemalloc.take_snapshot(), summary)
+            if profiler is not None:
+                _write_cpu(path, profiler, summary)
+            with open(os.path.join(run_dir, "summary.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary) + "\n")
+            logger.info(f"Profiled {stage}: {summary}")
+        except OSError as e:
+            logger.warning(f"Could not write the profile of {stage}: {e}")
+        finally:
+            if before is not None:
+                _stop_tracemalloc()
+
+
+def load_summary(run_id: str, directory: str = DEFAULT_PROFILE_DIR) -> List[Dict[str, Any]]:
+    """Summaries of every profiled stage of a run, in completion order."""
+    with open(os.path.join(directory, run_id, "summary.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect the stage profiles of a run")
+    parser.add_argument("--dir", default=DEFAULT_PROFILE_DIR, help="Profile directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Wall, CPU and wait time and own time per category")
+    summary_parser.add_argument("run_id")
+    args = parser.parse_args()
+
+    categories = [name for name, _ in CATEGORIES] + ["other"]
+    print(f"{'stage':<24} {'wall s':>8} {'cpu s':>8} {'wait s':>8} "
+          + " ".join(f"{name[:10]:>10}" for name in categories) + f" {'peak KiB':>10}")
+    for summary in load_summary(args.run_id, args.dir):
+        own = summary.get("categories", {})
+        print(f"{summary['files']:<24} {summary['wall']:>8.3f} {summary['cpu']:>8.3f} {summary['wait']:>8.3f} "
+              + " ".join(f"{own.get(name, 0.0):>10.3f}" for name in categories)
+              + f" {summary.get('alloc_peak_kb', 0.0):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Prompt Assembly
+
+The templates in prompts.py embed their inputs (`<requirements>{problem_requirements}</requirements>`,
+...) in the middle of long static instructions, so every prompt differs from the
+others after a few hundred characters and no provider-side prefix cache can be
+reused. This module splits every template once into a static prefix, identical for
+every call, and a dynamic suffix holding the tagged inputs at the end of the
+prompt. The prefix points the model to the inputs where they used to be.
+
+Usage:
+    prompt = assemble(problem_completer_prompt, problem_idea=..., problem_requirements=..., expert_evaluation=...)
+    prompt.static   # cacheable instructions
+    prompt.dynamic  # inputs of this call
+    str(prompt)     # the full prompt
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+# `<tag>{placeholder}</tag>` input blocks of the templates
+_INPUT_BLOCK = re.compile(r"<(\w+)>\s*\{(\w+)\}\s*</\1>")
+_INPUT_HEADER = "## INPUT DATA (for the tags referenced above)"
+
+
+# =============================================================================
+# Assembled Prompts
+# =============================================================================
+
+@dataclass(frozen=True)
+class AssembledPrompt:
+    """A prompt split into a static, cacheable prefix and the dynamic inputs of one call."""
+    static: str
+    dynamic: str
+
+    @property
+    def text(self) -> str:
+        return self.static + self.dynamic
+
+    @property
+    def prefix_hash(self) -> str:
+        """Stable identifier of the static prefix."""
+        return hashlib.sha256(self.static.encode("utf-8")).hexdigest()
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __len__(self) -> int:
+        return len(self.static) + len(self.dynamic)
+
+
+@lru_cache(maxsize=None)
+def split_template(template: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Return the static prefix of `template` and its (tag, placeholder) input blocks in order."""
+    blocks = [(match.group(1), match.group(2)) for match in _INPUT_BLOCK.finditer(template)]
+    static = _INPUT_BLOCK.sub(lambda match: f"<{match.group(1)}> (given at the end of this prompt)", template)
+    if "{" in static.replace("{{", "").replace("}}", ""):
+        raise ValueError("Template has placeholders outside of <tag>{placeholder}</tag> input blocks")
+    return static.replace("{{", "{").replace("}}", "}").rstrip() + "\n", blocks
+
+
+def assemble(template: str, **values: str) -> AssembledPrompt:
+    """Fill a prompts.py template, moving its inputs behind the static instructions; KeyError if one is missing."""
+    static, blocks = split_template(template)
+    for _, placeholder in blocks:
+        if placeholder not in values:
+            raise KeyError(placeholder)
+    sections = [f"<{tag}>\n{values[placeholder]}\n</{tag}>" for tag, placeholder in blocks]
+    return AssembledPrompt(static, "\n" + _INPUT_HEADER + "\n\n" + "\n\n".join(sections) + "\n")
@@ -0,0 +1,114 @@
+"""
+Prompt Payload Encoding
+
+This module renders the pydantic models embedded in prompts (requirements, ideas,
+evaluations, problems, tester feedback). Every character of a payload is paid for
+as input tokens, so besides the plain pydantic JSON it offers two cheaper encodings:
+
+    json     pydantic JSON, as the prompts were originally built
+    compact  JSON without indentation, nulls, empty lists or empty objects; default
+             values are kept, since they carry meaning (topic, language, flags)
+    terse    the compact payload as YAML-like indented text: no quotes, braces or
+             escaped newlines; multi-line strings (code, editorial text) as
+             unindented fenced blocks, so their lines carry no extra indentation
+
+Services pick an encoding through `LLMConfig.prompt_encoding`; the default comes
+from GEN_PROBLEM_PROMPT_ENCODING and is "json".
+
+Usage:
+    encode(problem, "terse", include=CompleteProblem.TESTER_VIEWS["Statement_Tester"])
+    encode(feedbacks, "compact")
+"""
+
+import json
+import os
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+PROMPT_ENCODINGS = ("json", "compact", "terse")
+DEFAULT_PROMPT_ENCODING = os.getenv("GEN_PROBLEM_PROMPT_ENCODING", "json")
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+
+def encode(value: Any, encoding: str = DEFAULT_PROMPT_ENCODING, include: Optional[Any] = None) -> str:
+    """
+    Render a model or a list of models for a prompt.
+
+    Args:
+        value: Model or list of models
+        encoding: One of PROMPT_ENCODINGS
+        include: Pydantic include set applied to a single model
+
+    Raises:
+        ValueError: For an unknown encoding
+    """
+    if encoding not in PROMPT_ENCODINGS:
+        raise ValueError(f"Unknown prompt encoding '{encoding}'. Available: {list(PROMPT_ENCODINGS)}")
+    if encoding == "json":
+        if isinstance(value, BaseModel):
+            return value.model_dump_json(include=include)
+        return json.dumps(to_jsonable_python(value), ensure_ascii=False, indent=2)
+
+    if isinstance(value, BaseModel):
+        data = value.model_dump(mode="json", include=include)
+    else:
+        data = [item.model_dump(mode="json") for item in value]
+    data = _prune(data)
+    if encoding == "compact":
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return "\n".join(_terse_lines(data, ""))
+
+
+def _prune(value: Any) -> Any:
+    """Drop nulls and empty lists or dicts from nested dicts; every other value is kept."""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item is not None and item != [] and item != {}}
+    if isinstance(value, list):
+        return [_prune(item) for item in value]
+    return value
+
+
+# =============================================================================
+# Terse Rendering
+# =============================================================================
+
+def _scalar(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "null" if value is None else str(value)
+
+
+def _terse_lines(value: Any, indent: str) -> List[str]:
+    """Lines of a dict (one per key) or list (one `-` item each) at `indent`."""
+    if isinstance(value, dict):
+        return [line for key, item in value.items() for line in _terse_entry(f"{key}:", item, indent)]
+    if isinstance(value, list):
+        return [line for item in value for line in _terse_entry("-", item, indent)]
+    return [indent + _scalar(value)]
+
+
+def _terse_entry(label: str, value: Any, indent: str) -> List[str]:
+    """Lines of one `key: value` or `- value` entry."""
+    if isinstance(value, str) and "\n" in value:
+        fence = "~~~~" if "```" in value else "```"
+        return [f"{indent}{label}", fence, value.strip("\n"), fence]
+    if isinstance(value, (dict, list)) and value:
+        nested = _terse_lines(value, indent + "  ")
+        if label == "-" and isinstance(value, dict) and nested[1:2] != ["```"] and nested[1:2] != ["~~~~"]:
+            # The first key of a list item shares the dash line
+            return [f"{indent}- {nested[0].lstrip()}"] + nested[1:]
+        return [f"{indent}{label}"] + nested
+    if isinstance(value, (dict, list)):
+        return [f"{indent}{label} {json.dumps(value)}"]
+    return [f"{indent}{label} {_scalar(value)}"]
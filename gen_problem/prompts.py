@@ -824,7 +824,8 @@ Trả về CompleteProblem instance với enhanced professional quality và stru
 **QUAN TRỌNG**: TOÀN BỘ CODE CỦA CÁC LỜI GIẢI PHẢI VIẾT BẰNG PYTHON, TUÂN THỦ FORMAT INPUT/OUTPUT VÀ PHẢI CHẠY ĐƯỢC NGAY MÀ KHÔNG CẦN CHỈNH SỬA GÌ THÊM
 
 ### Testing Infrastructure
-- `test_generators`: List[TestGenerator(name, description, code, language, target_subtasks)] with comprehensive test creation
+- `test_generators`: List[TestGenerator(name, description, code, language, target_subtasks, default_args)] with comprehensive test creation
+  - Size parameters (n, max value, ...) may be read from `sys.argv`/`argv` as integers; list their defaults in `default_args`
   - `random_test_generator`: General purpose automated generation
     - Controlled randomness with realistic constraints
     - Uniform distribution across input space
@@ -850,6 +851,16 @@ Trả về CompleteProblem instance với enhanced professional quality và stru
     - Large-scale random case generation
 **QUAN TRỌNG**: tOÀN BỘ CODE CỦA test generator phải tuân theo format_input , không in THÊM BẤT KỲ LỜI GIẢI THÍCH NÀO và phải chạy được ra kết quả ngay MÀ KHÔNG CẦN CHỈNH SỬA GÌ THÊM!
 
+- `input_validator`: Python program validating one test input
+  - Reads the whole input from stdin using the exact input format
+  - Checks every bound in `constraints` (values, lengths, sums, structural guarantees)
+  - Exits with code 0 if valid, otherwise prints the violated constraint to stderr and exits with a non-zero code
+
+- `special_judge`: Python checker, ONLY for problems with several valid answers
+  - Called as `checker <input_file> <output_file> <answer_file>`
+  - Exits with code 0 to accept, otherwise prints the reason to stderr and exits with a non-zero code
+  - Leave empty (null) when the answer is unique; floating-point answers are compared with tolerance automatically
+
 ### Quality Assurance Requirements
 - **Algorithm Foundation**: Every component must trace back to solid algorithmic principles
 - **Progressive Learning**: Each subtask builds naturally on previous insights
@@ -1719,6 +1730,16 @@ Trả về CompleteProblem instance với enhanced professional quality và stru
     - Large-scale random case generation
 **QUAN TRỌNG**: tOÀN BỘ CODE CỦA test generator phải tuân theo format_input , không in THÊM BẤT KỲ LỜI GIẢI THÍCH NÀO và phải chạy được ra kết quả ngay MÀ KHÔNG CẦN CHỈNH SỬA GÌ THÊM!
 
+- `input_validator`: Python program validating one test input
+  - Reads the whole input from stdin using the exact input format
+  - Checks every bound in `constraints` (values, lengths, sums, structural guarantees)
+  - Exits with code 0 if valid, otherwise prints the violated constraint to stderr and exits with a non-zero code
+
+- `special_judge`: Python checker, ONLY for problems with several valid answers
+  - Called as `checker <input_file> <output_file> <answer_file>`
+  - Exits with code 0 to accept, otherwise prints the reason to stderr and exits with a non-zero code
+  - Leave empty (null) when the answer is unique; floating-point answers are compared with tolerance automatically
+
 ### Quality Assurance Requirements
 - **Algorithm Foundation**: Every component must trace back to solid algorithmic principles
 - **Progressive Learning**: Each subtask builds naturally on previous insights
@@ -0,0 +1,213 @@
+"""
+Test Case Recipes
+
+This module stores large test cases compactly. Instead of the full input and
+output, a case keeps the recipe that produced it (generator code hash, seed and
+arguments) plus checksums of both files. A case is only compacted after it was
+regenerated once from its recipe and matched its checksums; cases whose generator
+is not reproducible (e.g. a C++ generator ignoring TESTCASE_SEED) keep their data
+inline. Cases are materialized lazily, when they are exported or judged, and
+every regenerated case is verified against its checksums again.
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from structures import CompleteProblem, TestGenerator
+from executor import ExecutionError, ExecutionJob, run_jobs, source_hash
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_COMPACT_THRESHOLD = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Exceptions
+# =============================================================================
+
+class RecipeError(ExecutionError):
+    """Exception for recipes that cannot be regenerated or fail verification."""
+    pass
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass
+class TestcaseRecipe:
+    """Everything needed to regenerate and verify one test case."""
+    generator_hash: str
+    language: str
+    seed: Optional[int]
+    args: List[str] = field(default_factory=list)
+    input_sha256: str = ""
+    output_sha256: str = ""
+    input_size: int = 0
+    output_size: int = 0
+
+
+def checksum(data: str) -> str:
+    """Return the checksum stored for test inputs and outputs."""
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _matches(data: Optional[str], expected: str) -> bool:
+    return data is not None and checksum(data) == expected
+
+
+# =============================================================================
+# Compaction
+# =============================================================================
+
+def _find_generator(problem: CompleteProblem, case: dict) -> Optional[TestGenerator]:
+    """Return the generator a case was produced by, if it is known."""
+    for generator in problem.test_generators:
+        if generator.name == case.get("generator"):
+            return generator
+    return None
+
+
+def _recipe_for(problem: CompleteProblem, case: dict) -> Optional[Tuple[TestcaseRecipe, TestGenerator]]:
+    """The recipe describing a case, or None if its generator or seed is unknown."""
+    generator = _find_generator(problem, case)
+    if generator is None or case.get("seed") is None:
+        return None
+    recipe = TestcaseRecipe(
+        generator_hash=source_hash(generator.code),
+        language=generator.language,
+        seed=case["seed"],
+        args=list(case.get("args", [])),
+        input_sha256=checksum(case["input"]),
+        output_sha256=checksum(case["output"]),
+        input_size=len(case["input"]),
+        output_size=len(case["output"])
+    )
+    return recipe, generator
+
+
+def compact_testcase(problem: CompleteProblem, case: dict) -> dict:
+    """Replace the input and output of a case by its recipe, if the recipe reproduces them."""
+    return compact_testcases(problem, [case], threshold=0)[0]
+
+
+def compact_testcases(
+    problem: CompleteProblem,
+    testcases: List[dict],
+    threshold: int = DEFAULT_COMPACT_THRESHOLD
+) -> List[dict]:
+    """
+    Store every case larger than `threshold` bytes as a recipe.
+
+    Candidates are regenerated once in parallel; a case whose regenerated input
+    or output differs from its data stays inline.
+    """
+    pending = []
+    for index, case in enumerate(testcases):
+        if "recipe" in case or len(case["input"]) + len(case["output"]) <= threshold:
+            continue
+        found = _recipe_for(problem, case)
+        if found is not None:
+            pending.append((index, case, found))
+
+    result = list(testcases)
+    regenerated = _regenerate(problem, [found for _, _, found in pending])
+    for (index, case, (recipe, _)), (generated, solved) in zip(pending, regenerated):
+        if not _matches(generated, recipe.input_sha256) or not _matches(solved, recipe.output_sha256):
+            logger.warning(f"Test case {case.get('id')} is not reproducible from generator "
+                           f"'{case.get('generator')}' (seed {recipe.seed}); keeping it inline")
+            continue
+        compact = {key: value for key, value in case.items() if key not in ("input", "output")}
+        compact["recipe"] = asdict(recipe)
+        result[index] = compact
+    return result
+
+
+def _regenerate(
+    problem: CompleteProblem,
+    recipes: Sequence[Tuple[TestcaseRecipe, TestGenerator]]
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Rerun every recipe's generator and the optimal solution on its output, in parallel; None for failed runs."""
+    if not recipes:
+        return []
+    inputs = run_jobs([
+        ExecutionJob(code=generator.code, language=recipe.language, seed=recipe.seed, args=recipe.args)
+        for recipe, generator in recipes
+    ])
+    solution = problem.get_optimal_solution()
+    outputs = run_jobs([
+        ExecutionJob(code=solution.code, language=solution.language, stdin=generated.stdout)
+        for generated in inputs
+    ])
+    return [
+        (generated.stdout if generated.ok else None, solved.stdout if generated.ok and solved.ok else None)
+        for generated, solved in zip(inputs, outputs)
+    ]
+
+
+# =============================================================================
+# Materialization
+# =============================================================================
+
+def materialize_testcases(problem: CompleteProblem, testcases: List[dict]) -> List[dict]:
+    """
+    Regenerate every recipe case in parallel and verify it against its checksums.
+
+    Cases that already carry their data are returned unchanged.
+
+    Raises:
+        RecipeError: If a generator is missing or a checksum does not match
+    """
+    generators = {source_hash(g.code): g for g in problem.test_generators}
+    pending = [(index, case) for index, case in enumerate(testcases) if "recipe" in case]
+    result = list(testcases)
+    if not pending:
+        return result
+
+    recipes = []
+    for _, case in pending:
+        recipe = TestcaseRecipe(**case["recipe"])
+        generator = generators.get(recipe.generator_hash)
+        if generator is None:
+            raise RecipeError(f"Test case {case.get('id')}: generator {recipe.generator_hash[:12]} is not part of the problem")
+        recipes.append((recipe, generator))
+
+    for (index, case), (recipe, _), (generated, solved) in zip(pending, recipes, _regenerate(problem, recipes)):
+        if not _matches(generated, recipe.input_sha256):
+            raise RecipeError(f"Test case {case.get('id')}: regenerated input does not match its checksum")
+        if not _matches(solved, recipe.output_sha256):
+            raise RecipeError(f"Test case {case.get('id')}: regenerated output does not match its checksum")
+        full = {key: value for key, value in case.items() if key != "recipe"}
+        full["input"] = generated
+        full["output"] = solved
+        result[index] = full
+
+    return result
+
+
+def iter_materialized(problem: CompleteProblem, testcases: List[dict], batch_size: Optional[int] = None) -> Iterator[dict]:
+    """Yield fully materialized cases, regenerating one batch at a time to bound memory."""
+    batch_size = batch_size or os.cpu_count() or 1
+    for start in range(0, len(testcases), batch_size):
+        yield from materialize_testcases(problem, testcases[start:start + batch_size])
+
+
+def export_testcases(problem: CompleteProblem, testcases: List[dict], directory: str) -> List[str]:
+    """Write every case as `<id>.in` / `<id>.out`, materializing recipes on the fly."""
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for case in iter_materialized(problem, testcases):
+        for suffix, key in ((".in", "input"), (".out", "output")):
+            path = os.path.join(directory, f"{case['id']}{suffix}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(case[key])
+            written.append(path)
+    return written
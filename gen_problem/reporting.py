@@ -0,0 +1,111 @@
+"""
+Progress Reporting
+
+This module decouples progress output from the workflow. Nodes hand text (or a
+callable that renders it) to the current reporter, which only renders when a
+sink is attached, and emit lightweight named events for programmatic progress
+tracking. The reporter lives in a context variable, so concurrent runs in one
+process can report differently.
+
+Usage:
+    # Headless: nothing is rendered or printed, progress arrives as events
+    with use_reporter(headless(on_event=lambda name, data: queue.put((name, data)))):
+        generate_problem(topic="Graph")
+
+    # Or for every run in the process
+    GEN_PROBLEM_HEADLESS=1 python gen_problem.py
+"""
+
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+# Text, or a zero-argument callable producing it (e.g. a bound `display` method)
+Renderable = Union[str, Callable[[], str]]
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+HEADLESS_ENV_VAR = "GEN_PROBLEM_HEADLESS"
+
+
+# =============================================================================
+# Reporter
+# =============================================================================
+
+class Reporter:
+    """Routes rendered text to an optional sink and events to an optional callback."""
+
+    def __init__(self, sink: Optional[Callable[[str], None]] = print, on_event: Optional[EventCallback] = None):
+        self.sink = sink
+        self.on_event = on_event
+
+    @property
+    def enabled(self) -> bool:
+        """Whether text output is rendered at all."""
+        return self.sink is not None
+
+    def show(self, *parts: Renderable) -> None:
+        """Render and emit each part in order; nothing is rendered without a sink."""
+        if self.sink is None:
+            return
+        for part in parts:
+            self.sink(part() if callable(part) else part)
+
+    def event(self, name: str, **data: Any) -> None:
+        """Report a named progress event to the callback, if any."""
+        if self.on_event is not None:
+            self.on_event(name, data)
+
+
+def headless(on_event: Optional[EventCallback] = None) -> Reporter:
+    """Reporter that never renders text and only forwards events."""
+    return Reporter(sink=None, on_event=on_event)
+
+
+def _default_reporter() -> Reporter:
+    if os.getenv(HEADLESS_ENV_VAR, "").lower() in ("1", "true", "yes"):
+        return headless()
+    return Reporter()
+
+
+_current: ContextVar[Reporter] = ContextVar("gen_problem_reporter", default=_default_reporter())
+
+
+def get_reporter() -> Reporter:
+    """Return the reporter of the current context."""
+    return _current.get()
+
+
+@contextmanager
+def use_reporter(reporter: Reporter) -> Iterator[Reporter]:
+    """Use `reporter` for everything run inside the block."""
+    token = _current.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current.reset(token)
+
+
+# =============================================================================
+# Convenience Functions
+# =============================================================================
+
+def show(*parts: Renderable) -> None:
+    """Render and emit text through the current reporter."""
+    _current.get().show(*parts)
+
+
+def event(name: str, **data: Any) -> None:
+    """Emit a progress event through the current reporter."""
+    _current.get().event(name, **data)
+
+
+def warn(message: str) -> None:
+    """Show a warning and report it as a `warning` event, so headless runs still see it."""
+    reporter = _current.get()
+    reporter.show(f"⚠️ Warning: {message}")
+    reporter.event("warning", message=message)
@@ -0,0 +1,234 @@
+"""
+Structured Run Log
+
+This module records every problem generation run as a JSONL event log with one
+file per run id. The first event holds the full initial state; every later event
+holds only the fields a graph node changed. A buffered background thread writes
+the events, so logging never blocks the workflow and concurrent runs never share
+a file. `replay_state` folds the events back into the full state at any step.
+
+Usage:
+    python run_log.py list RUN_ID            # one line per recorded step
+    python run_log.py show RUN_ID [--step N] # full state after step N (default: last)
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Dict, IO, List, Optional
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from codec import construct_trusted
+from structures import ProblemGenerationState
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+DEFAULT_LOG_DIR = os.getenv("GEN_PROBLEM_LOG_DIR", os.path.join("logs", "runs"))
+# Maximum number of events the writer drains before flushing to disk.
+WRITE_BATCH_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Background Writer
+# =============================================================================
+
+class RunLogWriter:
+    """Single background thread appending events to per-run JSONL files."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._files: Dict[str, IO[str]] = {}
+        self._thread = threading.Thread(target=self._loop, name="run-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, event: Dict[str, Any]) -> None:
+        """Queue one event for appending to `path`."""
+        self._queue.put(("event", path, event))
+
+    def close(self, path: str) -> None:
+        """Flush and close `path` once every event queued before this call is written."""
+        self._queue.put(("close", path, None))
+
+    def flush(self) -> None:
+        """Block until every queued event has been written."""
+        self._queue.join()
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            touched = set()
+            for kind, path, event in batch:
+                try:
+                    if kind == "event":
+                        self._file(path).write(json.dumps(event, ensure_ascii=False) + "\n")
+                        touched.add(path)
+                    elif path in self._files:
+                        self._files.pop(path).close()
+                        touched.discard(path)
+                except (OSError, TypeError, ValueError) as e:
+                    logger.warning(f"Failed to write run log {path}: {e}")
+
+            for path in touched:
+                try:
+                    self._files[path].flush()
+                except OSError as e:
+                    logger.warning(f"Failed to flush run log {path}: {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def _file(self, path: str) -> IO[str]:
+        if path not in self._files:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._files[path] = open(path, "a", encoding="utf-8")
+        return self._files[path]
+
+
+_writer: Optional[RunLogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> RunLogWriter:
+    """Return the process-wide writer, starting it on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = RunLogWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+# =============================================================================
+# Recording
+# =============================================================================
+
+def new_run_id() -> str:
+    """Return a sortable unique run id."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def run_log_path(run_id: str, directory: str = DEFAULT_LOG_DIR) -> str:
+    """Path of the JSONL log of one run."""
+    return os.path.join(directory, f"{run_id}.jsonl")
+
+
+def resolve_update(state: ProblemGenerationState, update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a node's partial update into the new values of the fields it changes.
+
+    Reducer fields (e.g. counters) hold increments in the update, so their
+    reducer is applied to the current value; unchanged values are dropped.
+    """
+    fields = type(state).model_fields
+    changes = {}
+    for name, value in update.items():
+        if name not in fields:
+            continue
+        current = getattr(state, name)
+        reducers = [item for item in fields[name].metadata if callable(item)]
+        if reducers:
+            value = reducers[0](current, value)
+        if value is current or (not isinstance(value, (list, BaseModel)) and value == current):
+            continue
+        changes[name] = value
+    return changes
+
+
+def start_run(state: ProblemGenerationState, directory: str = DEFAULT_LOG_DIR) -> None:
+    """Record the full initial state of a run."""
+    _submit(state.run_id, directory, "initial", state.current_step, state.model_dump(mode="json"))
+
+
+def record_update(state: ProblemGenerationState, update: Dict[str, Any], directory: str = DEFAULT_LOG_DIR) -> None:
+    """Record only the fields a node's update changes."""
+    if not state.run_id:
+        return
+    changes = resolve_update(state, update)
+    step = changes.get("current_step", state.current_step)
+    _submit(state.run_id, directory, "update", step, to_jsonable_python(changes))
+
+
+def finish_run(run_id: str, directory: str = DEFAULT_LOG_DIR) -> None:
+    """Flush and close the log of a finished run."""
+    writer = get_writer()
+    writer.close(run_log_path(run_id, directory))
+    writer.flush()
+
+
+def _submit(run_id: str, directory: str, kind: str, step: str, changes: Dict[str, Any]) -> None:
+    event = {"run_id": run_id, "time": time.time(), "type": kind, "step": step, "changes": changes}
+    get_writer().submit(run_log_path(run_id, directory), event)
+
+
+# =============================================================================
+# Replay
+# =============================================================================
+
+def load_events(run_id: str, directory: str = DEFAULT_LOG_DIR) -> List[Dict[str, Any]]:
+    """Read every event of a run in order."""
+    with open(run_log_path(run_id, directory), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_state(run_id: str, step: Optional[int] = None, directory: str = DEFAULT_LOG_DIR) -> ProblemGenerationState:
+    """Rebuild the full state after event number `step` (0 = initial state, None = last)."""
+    events = load_events(run_id, directory)
+    if not events or events[0]["type"] != "initial":
+        raise ValueError(f"Run log '{run_id}' does not start with an initial state")
+
+    last = len(events) - 1 if step is None else step
+    if not 0 <= last < len(events):
+        raise ValueError(f"Step {step} out of range; run '{run_id}' has {len(events)} events")
+
+    fields: Dict[str, Any] = {}
+    for event in events[:last + 1]:
+        fields.update(event["changes"])
+    # The log only ever holds dumps of validated states
+    return construct_trusted(ProblemGenerationState, fields)
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect structured run logs")
+    parser.add_argument("--dir", default=DEFAULT_LOG_DIR, help="Run log directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser("list", help="List the recorded steps of a run")
+    list_parser.add_argument("run_id")
+
+    show_parser = subparsers.add_parser("show", help="Print the full state at a step")
+    show_parser.add_argument("run_id")
+    show_parser.add_argument("--step", type=int, default=None, help="Event number (default: last)")
+
+    args = parser.parse_args()
+    if args.command == "list":
+        for index, event in enumerate(load_events(args.run_id, args.dir)):
+            stamp = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+            print(f"{index:>4}  {stamp}  {event['step']:<24} {', '.join(event['changes'])}")
+    else:
+        print(replay_state(args.run_id, args.step, args.dir).display())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,15 @@ This module contains all the data models for a competitive programming problem
 generation system, including requirements, ideas, evaluations, and testing phases.
 """
 
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, List, Optional, Dict, Any, ClassVar, Tuple
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from pydantic_core import to_jsonable_python
 from enum import Enum
+import hashlib
+import json
 import math
+import operator
+import weakref
 from pprint import pformat
 
 
@@ -45,17 +50,177 @@ class ProcessStatus(str, Enum):
 class BaseModel(BaseModel):
     """Enhanced base model with common configuration and display functionality."""
     
+    # Named subsets of fields that can be fingerprinted separately
+    FINGERPRINT_GROUPS: ClassVar[Dict[str, Tuple[str, ...]]] = {}
+    
+    # Memoized fingerprints per group (None = whole model) and digests of plain fields
+    _fingerprints: Dict[Optional[str], str] = PrivateAttr(default_factory=dict)
+    _field_digests: Dict[str, str] = PrivateAttr(default_factory=dict)
+    # Models holding this one as a field, so changes here invalidate them too
+    _parents: List[weakref.ref] = PrivateAttr(default_factory=list)
+    
     class Config:
         use_enum_values = True
         validate_assignment = True
         # extra = "forbid"
     
+    def model_post_init(self, __context: Any) -> None:
+        """Link nested models back to this model."""
+        for value in self.__dict__.values():
+            _link_children(self, value)
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Assign a field and invalidate the fingerprints of this model and its ancestors."""
+        super().__setattr__(name, value)
+        if not name.startswith("_") and name in type(self).model_fields:
+            private = self.__pydantic_private__
+            private["_field_digests"].pop(name, None)
+            _link_children(self, getattr(self, name))
+            self._invalidate_fingerprints()
+    
+    def __eq__(self, other: Any) -> bool:
+        """Compare field values only; fingerprint caches and parent links are not content."""
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return type(self) is type(other) and self.__dict__ == other.__dict__
+    
+    def __getstate__(self) -> Dict[Any, Any]:
+        """Pickle without fingerprint caches; weak parent links cannot be pickled."""
+        state = super().__getstate__()
+        state["__pydantic_private__"] = {"_fingerprints": {}, "_field_digests": {}, "_parents": []}
+        return state
+    
+    def __setstate__(self, state: Dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self._reset_fingerprint_state()
+    
+    def __copy__(self):
+        copied = super().__copy__()
+        copied._reset_fingerprint_state()
+        return copied
+    
+    def __deepcopy__(self, memo: Optional[Dict[int, Any]] = None):
+        copied = super().__deepcopy__(memo)
+        copied._reset_fingerprint_state()
+        return copied
+    
+    def model_copy(self, *, update: Optional[Dict[str, Any]] = None, deep: bool = False):
+        """Copy the model; the copy never shares fingerprint caches with the original."""
+        copied = super().model_copy(update=update, deep=deep)
+        if update:
+            copied._reset_fingerprint_state()
+        return copied
+    
+    def fingerprint(self, group: Optional[str] = None) -> str:
+        """
+        Return a stable canonical hash of the model or of one field group.
+        
+        Results are memoized. Assigning a field anywhere in the model tree clears
+        the memoized fingerprints of that model and every enclosing model; nested
+        models contribute their own memoized fingerprints, so unchanged subtrees are
+        never re-serialized. Fields set to None are skipped so that adding an
+        optional field does not change existing fingerprints. In-place mutation of
+        lists is not tracked; reassign the field instead.
+        """
+        cache = self.__pydantic_private__["_fingerprints"]
+        cached = cache.get(group)
+        if cached is not None:
+            return cached
+        
+        if group is None:
+            names = tuple(type(self).model_fields)
+        elif group in self.FINGERPRINT_GROUPS:
+            names = self.FINGERPRINT_GROUPS[group]
+        else:
+            raise KeyError(f"Unknown fingerprint group '{group}'. Available: {list(self.FINGERPRINT_GROUPS)}")
+        
+        digest = hashlib.sha256(f"{type(self).__name__}:{group or ''}".encode("utf-8"))
+        for name in names:
+            field_digest = self._field_digest(name)
+            if field_digest is not None:
+                digest.update(f"\0{name}={field_digest}".encode("utf-8"))
+        
+        cache[group] = digest.hexdigest()
+        return cache[group]
+    
+    def fingerprints(self) -> Dict[str, str]:
+        """Return the fingerprint of the whole model and of every field group."""
+        result = {"all": self.fingerprint()}
+        for group in self.FINGERPRINT_GROUPS:
+            result[group] = self.fingerprint(group)
+        return result
+    
+    def _field_digest(self, name: str) -> Optional[str]:
+        """Digest of one field value; plain values are memoized until reassigned."""
+        value = getattr(self, name)
+        if value is None:
+            return None
+        if _contains_models(value):
+            return _digest_value(value)
+        
+        digests = self.__pydantic_private__["_field_digests"]
+        if name not in digests:
+            digests[name] = _digest_value(value)
+        return digests[name]
+    
+    def _invalidate_fingerprints(self) -> None:
+        """Clear memoized fingerprints here and in every live ancestor."""
+        pending = [self]
+        while pending:
+            model = pending.pop()
+            private = model.__pydantic_private__
+            if private["_fingerprints"]:
+                private["_fingerprints"] = {}
+            for ref in private["_parents"]:
+                parent = ref()
+                if parent is not None:
+                    pending.append(parent)
+    
+    def _reset_fingerprint_state(self) -> None:
+        """Give a copy its own caches and link its children to it."""
+        private = self.__pydantic_private__
+        private["_fingerprints"] = {}
+        private["_field_digests"] = {}
+        private["_parents"] = []
+        for value in self.__dict__.values():
+            _link_children(self, value)
+    
     def display(self) -> str:
         """Return a formatted string representation of the model."""
         class_name = self.__class__.__name__
         return f"--- {class_name} ---\n{pformat(self.model_dump())}"
 
 
+def _link_children(parent: BaseModel, value: Any) -> None:
+    """Register `parent` with every model directly held in a field value."""
+    children = [value] if isinstance(value, BaseModel) else value if isinstance(value, (list, tuple)) else ()
+    for child in children:
+        if isinstance(child, BaseModel):
+            private = child.__pydantic_private__
+            parents = [ref for ref in private["_parents"] if ref() is not None]
+            if not any(ref() is parent for ref in parents):
+                parents.append(weakref.ref(parent))
+            private["_parents"] = parents
+
+
+def _contains_models(value: Any) -> bool:
+    """Whether a field value is a model or a list of models."""
+    if isinstance(value, BaseModel):
+        return True
+    return isinstance(value, (list, tuple)) and any(isinstance(item, BaseModel) for item in value)
+
+
+def _digest_value(value: Any) -> str:
+    """Canonical digest of a field value, delegating nested models to their fingerprints."""
+    if isinstance(value, BaseModel):
+        return value.fingerprint()
+    if isinstance(value, (list, tuple)) and any(isinstance(item, BaseModel) for item in value):
+        parts = ",".join(_digest_value(item) for item in value)
+        return hashlib.sha256(f"[{parts}]".encode("utf-8")).hexdigest()
+    canonical = json.dumps(to_jsonable_python(value), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 class DisplayableMixin:
     """Mixin class for models that need custom display functionality."""
     
@@ -93,6 +258,11 @@ class ProblemRequirements(BaseModel):
 class ProblemIdea(BaseModel, DisplayableMixin):
     """Model representing a problem idea from creators."""
     
+    FINGERPRINT_GROUPS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "statement": ("title", "description", "input_format", "output_format", "sample_input", "sample_output"),
+        "analysis": ("key_insights", "time_complexity", "space_complexity", "engagement_factor", "prerequisite_knowledge"),
+    }
+    
     # Basic information
     title: str = Field(..., description="Problem title")
     description: str = Field(
@@ -331,10 +501,45 @@ class TestGenerator(BaseModel):
     code: str = Field(..., description="Generator source code")
     language: str = Field(default="python", description="Programming language")
     target_subtasks: List[str] = Field(default_factory=list, description="Which subtasks this generates for")
+    default_args: List[str] = Field(
+        default_factory=list,
+        description="Default integer command-line arguments (e.g. n, max value) the generator reads from argv; empty if it reads none"
+    )
 
 class CompleteProblem(BaseModel):
     """Complete problem description ready for contest deployment."""
     
+    FINGERPRINT_GROUPS: ClassVar[Dict[str, Tuple[str, ...]]] = {
+        "statement": (
+            "title", "difficulty", "algorithm_categories", "estimated_solve_time",
+            "problem_statement", "input_specification", "output_specification",
+            "constraints", "subtasks", "test_cases"
+        ),
+        "solutions": ("solution_approaches",),
+        "generators": ("test_generators", "input_validator", "special_judge"),
+        "editorial": ("editorial",),
+    }
+    
+    # Fields each tester prompt reads, as pydantic include sets; testers without a view get every field
+    TESTER_VIEWS: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "Statement_Tester": {
+            **dict.fromkeys(FINGERPRINT_GROUPS["statement"], True),
+            "solution_approaches": {"__all__": {"name", "complexity"}},
+        },
+        "Solution_Tester": {
+            **dict.fromkeys(FINGERPRINT_GROUPS["statement"], True),
+            "solution_approaches": True,
+            "editorial": True,
+        },
+        "Testcase_Tester": {
+            **dict.fromkeys(FINGERPRINT_GROUPS["statement"], True),
+            "solution_approaches": {"__all__": {"name", "complexity", "suitable_for"}},
+            "test_generators": True,
+            "input_validator": True,
+            "special_judge": True,
+        },
+    }
+    
     # Basic Information
     title: str = Field(..., description="Problem title")
     difficulty: DifficultyLevel = Field(..., description="Problem difficulty level")
@@ -375,7 +580,18 @@ class CompleteProblem(BaseModel):
     test_generators: List[TestGenerator] = Field(
         default_factory=list, description="Test case generators"
     )
-    
+    input_validator: Optional[str] = Field(
+        None,
+        description="Python program that reads one test input from stdin and exits with a non-zero code "
+                    "(printing the reason to stderr) if the input violates the problem or subtask constraints"
+    )
+    special_judge: Optional[str] = Field(
+        None,
+        description="Python checker for problems with several valid answers, run as "
+                    "`checker <input_file> <output_file> <answer_file>`; exits with code 0 to accept. "
+                    "Leave empty when the answer is unique"
+    )
+
     # Metadata
     author: Optional[str] = Field(None, description="Problem author")
     contest_source: Optional[str] = Field(None, description="Contest or platform source")
@@ -585,6 +801,14 @@ class TesterFeedback(BaseModel, DisplayableMixin):
         
         return "\n".join(sections) + "\n"
 
+class ArtifactHandle(BaseModel):
+    """Compact reference to a model body kept in the artifact store (see artifact_store.py)."""
+    
+    role: str = Field(..., description="What the body was in the workflow (e.g. 'idea', 'feedback')")
+    kind: str = Field(..., description="Model class name of the body")
+    digest: str = Field(..., description="Fingerprint of the body, which also addresses it")
+    title: str = Field("", description="Title of the body, for display without loading it")
+
 # =============================================================================
 # Main State Management
 # =============================================================================
@@ -603,29 +827,43 @@ class ProblemGenerationState(BaseModel):
     selected_idea: Optional[ProblemIdea] = None
     best_evaluation: Optional[ExpertEvaluation] = None
     regeneration_needed: bool = False
-    regeneration_count: int = 0
+    # Counters are reducer channels: graph nodes return increments, not totals
+    regeneration_count: Annotated[int, operator.add] = 0
     max_regenerations: int
     
     # Problem development
-    complete_problem: CompleteProblem = None
+    complete_problem: Optional[CompleteProblem] = None
     
     # Testing phase
     tester_feedbacks: List[TesterFeedback] = Field(default_factory=list)
     revision_needed: bool = False
-    revision_count: int = 0
+    revision_count: Annotated[int, operator.add] = 0
     max_revisions: int  # Limit to avoid infinite loops
     
+    # Offload mode: superseded and finished bodies move to the artifact store,
+    # the state keeps only their handles
+    offload: bool = False
+    artifacts: Annotated[List[ArtifactHandle], operator.add] = Field(default_factory=list)
+    
     # Control flow
+    run_id: str = ""
     current_step: str = ""
     status: ProcessStatus = ProcessStatus.IN_PROGRESS
     
     @model_validator(mode='after')
     def validate_selected_idea_exists(self):
-        """Ensure selected idea exists in the ideas list."""
+        """
+        Ensure selected idea exists in the ideas list.
+        
+        Runs on every field assignment, so it checks identity first and falls back
+        to cached fingerprints; its cost does not depend on the size of the ideas.
+        """
         if self.selected_idea:
-            idea_list = [idea.model_dump() for idea in self.ideas]
-            if self.selected_idea.model_dump() not in idea_list:
-                raise ValueError("selected_idea must be one of the ideas in the 'ideas' list")
+            selected = self.selected_idea
+            if not any(idea is selected for idea in self.ideas):
+                selected_fingerprint = selected.fingerprint()
+                if not any(idea.fingerprint() == selected_fingerprint for idea in self.ideas):
+                    raise ValueError("selected_idea must be one of the ideas in the 'ideas' list")
         return self
     
     def get_summary(self) -> Dict[str, Any]:
@@ -638,6 +876,7 @@ class ProblemGenerationState(BaseModel):
             "has_selected_idea": self.selected_idea is not None,
             "has_complete_problem": self.complete_problem is not None,
             "feedback_count": len(self.tester_feedbacks),
+            "artifacts_count": len(self.artifacts),
             "regeneration_info": f"{self.regeneration_count}/{self.max_regenerations}",
             "revision_info": f"{self.revision_count}/{self.max_revisions}",
             "regeneration_needed": self.regeneration_needed,
@@ -694,6 +933,12 @@ class ProblemGenerationState(BaseModel):
                 sections.append(f"\nFeedback {i}:")
                 sections.append(feedback.display())
         
+        # Offloaded bodies section
+        if self.artifacts:
+            sections.append("\n[Offloaded Artifacts]")
+            for handle in self.artifacts:
+                sections.append(f"{handle.role}: {handle.title or handle.kind} ({handle.digest[:12]})")
+        
         # Summary section
         sections.extend([
             "\n[Process Summary]",
@@ -0,0 +1,359 @@
+"""
+Run Tracing
+
+This module records nested timing spans (graph nodes, LLM service calls, retry
+attempts, sandboxed executions, ...) so a slow run can be broken down afterwards.
+Spans live in a context variable: a span opened inside another one becomes its
+child, and a span opened with no parent starts a new trace. When the root span
+of a trace ends, the whole trace is written to one file in the OTLP/JSON format
+of OpenTelemetry (an ExportTraceServiceRequest), named after the root's `run_id`
+attribute, so it can also be loaded into any OTLP-compatible viewer.
+
+Tracing is off by default. Turn it on with GEN_PROBLEM_TRACING=1, or for one run
+with the `trace` argument of `generate_problem` (see `use_tracing`). Spans whose
+root never ends, e.g. of a thread outliving its run, are dropped after
+GEN_PROBLEM_TRACE_MAX_AGE seconds.
+
+Usage:
+    GEN_PROBLEM_TRACING=1 python gen_problem.py
+    generate_problem("Graph", trace=True)
+
+    with span("generate_problem", run_id=run_id, topic=topic):
+        ...
+        set_attributes(revision_count=2)
+
+    python tracing.py list                    # recorded traces
+    python tracing.py waterfall RUN_ID        # timeline of every span
+    python tracing.py top RUN_ID              # total and self time per span name
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+TRACING_ENABLED = os.getenv("GEN_PROBLEM_TRACING", "0").lower() in ("1", "true", "yes")
+DEFAULT_TRACE_DIR = os.getenv("GEN_PROBLEM_TRACE_DIR", os.path.join("logs", "traces"))
+# Seconds the spans of an unfinished trace are kept waiting for its root span.
+DEFAULT_MAX_PENDING_AGE = float(os.getenv("GEN_PROBLEM_TRACE_MAX_AGE", "21600"))
+SERVICE_NAME = "gen_problem"
+
+# OTLP span kind and status codes
+_KIND_INTERNAL = 1
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+# =============================================================================
+# Spans
+# =============================================================================
+
+@dataclass
+class Span:
+    """One timed operation of a trace."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = ""
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: str = ""
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """Add attributes; None values are skipped."""
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class _NoopSpan(Span):
+    """Span handed out while tracing is disabled."""
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan("", "", "")
+_current: ContextVar[Optional[Span]] = ContextVar("gen_problem_span", default=None)
+_enabled: ContextVar[bool] = ContextVar("gen_problem_tracing", default=TRACING_ENABLED)
+
+
+@contextmanager
+def use_tracing(enabled: Optional[bool]) -> Iterator[None]:
+    """Turn tracing on or off within the block; None keeps the current setting."""
+    if enabled is None:
+        yield
+        return
+    token = _enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _enabled.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """Time the block as a child of the current span, or as the root of a new trace."""
+    if not _enabled.get():
+        yield _NOOP_SPAN
+        return
+    parent = _current.get()
+    current = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+        span_id=os.urandom(8).hex(),
+        parent_id=parent.span_id if parent else "",
+        start_ns=time.time_ns(),
+    )
+    current.set_attributes(**attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        get_exporter().export(current, is_root=parent is None)
+
+
+def current_span() -> Span:
+    """The innermost open span (a no-op span outside of any)."""
+    return _current.get() or _NOOP_SPAN
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes to the innermost open span."""
+    current_span().set_attributes(**attributes)
+
+
+# =============================================================================
+# OTLP/JSON Export
+# =============================================================================
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _python_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    return next(iter(value.values()), None)
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """An OTLP/JSON ExportTraceServiceRequest holding `spans`."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{
+            "scope": {"name": __name__},
+            "spans": [{
+                "traceId": item.trace_id,
+                "spanId": item.span_id,
+                "parentSpanId": item.parent_id,
+                "name": item.name,
+                "kind": _KIND_INTERNAL,
+                "startTimeUnixNano": str(item.start_ns),
+                "endTimeUnixNano": str(item.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+                "status": {"code": _STATUS_ERROR, "message": item.error} if item.error else {"code": _STATUS_OK},
+            } for item in spans],
+        }],
+    }]}
+
+
+def from_otlp(document: Dict[str, Any]) -> List[Span]:
+    """Spans of an OTLP/JSON document."""
+    return [
+        Span(
+            name=item["name"],
+            trace_id=item["traceId"],
+            span_id=item["spanId"],
+            parent_id=item.get("parentSpanId", ""),
+            start_ns=int(item["startTimeUnixNano"]),
+            end_ns=int(item["endTimeUnixNano"]),
+            attributes={attribute["key"]: _python_value(attribute["value"]) for attribute in item.get("attributes", [])},
+            error=item.get("status", {}).get("message", "") if item.get("status", {}).get("code") == _STATUS_ERROR else "",
+        )
+        for resource in document.get("resourceSpans", [])
+        for scope in resource.get("scopeSpans", [])
+        for item in scope.get("spans", [])
+    ]
+
+
+class TraceExporter:
+    """Collects finished spans per trace and writes each trace once its root span ends."""
+
+    def __init__(self, directory: str = DEFAULT_TRACE_DIR, max_pending_age: float = DEFAULT_MAX_PENDING_AGE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.directory = directory
+        self.max_pending_age = max_pending_age
+        self.clock = clock
+        self._pending: Dict[str, List[Span]] = defaultdict(list)
+        # When the first span of each pending trace arrived
+        self._first_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.otlp.json")
+
+    def export(self, finished: Span, is_root: bool) -> None:
+        with self._lock:
+            now = self.clock()
+            self._drop_stale(now)
+            self._first_seen.setdefault(finished.trace_id, now)
+            self._pending[finished.trace_id].append(finished)
+            if not is_root:
+                return
+            spans = self._pending.pop(finished.trace_id)
+            del self._first_seen[finished.trace_id]
+        name = str(finished.attributes.get("run_id") or finished.trace_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(name), "w", encoding="utf-8") as f:
+                json.dump(to_otlp(spans), f, ensure_ascii=False)
+        except OSError:
+            pass
+
+    def _drop_stale(self, now: float) -> None:
+        """Forget traces whose root span has not ended within `max_pending_age`."""
+        for trace_id in [trace_id for trace_id, seen in self._first_seen.items() if now - seen > self.max_pending_age]:
+            del self._first_seen[trace_id]
+            self._pending.pop(trace_id, None)
+
+
+_exporter: Optional[TraceExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> TraceExporter:
+    """Return the process-wide exporter, creating it on first use."""
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = TraceExporter()
+        return _exporter
+
+
+def set_exporter(exporter: Optional[TraceExporter]) -> None:
+    """Send every later trace to `exporter`; None restores the default."""
+    global _exporter
+    with _exporter_lock:
+        _exporter = exporter
+
+
+def load_trace(name: str, directory: str = DEFAULT_TRACE_DIR) -> List[Span]:
+    """Spans of a recorded trace, by run id or trace id."""
+    with open(TraceExporter(directory).path(name), encoding="utf-8") as f:
+        return from_otlp(json.load(f))
+
+
+# =============================================================================
+# Rendering
+# =============================================================================
+
+def ordered_tree(spans: List[Span]) -> List[tuple]:
+    """(depth, span) pairs in depth-first order, children by start time."""
+    children: Dict[str, List[Span]] = defaultdict(list)
+    ids = {item.span_id for item in spans}
+    for item in spans:
+        children[item.parent_id if item.parent_id in ids else ""].append(item)
+    ordered = []
+    pending = [(0, item) for item in sorted(children[""], key=lambda s: s.start_ns, reverse=True)]
+    while pending:
+        depth, item = pending.pop()
+        ordered.append((depth, item))
+        pending.extend((depth + 1, child) for child in sorted(children[item.span_id], key=lambda s: s.start_ns, reverse=True))
+    return ordered
+
+
+def render_waterfall(spans: List[Span], width: int = 50, min_duration: float = 0.0) -> str:
+    """Timeline with one line per span: start offset, duration, name and a bar."""
+    if not spans:
+        return "(empty trace)"
+    start = min(item.start_ns for item in spans)
+    total = max(max(item.end_ns for item in spans) - start, 1)
+    lines = [f"{'start s':>9} {'dur s':>9}  {'span':<48} timeline"]
+    for depth, item in ordered_tree(spans):
+        if item.duration < min_duration:
+            continue
+        offset = int((item.start_ns - start) / total * width)
+        length = max(1, int((item.end_ns - item.start_ns) / total * width))
+        details = " ".join(f"{key}={value}" for key, value in item.attributes.items() if key != "run_id")
+        label = ("  " * depth + item.name + (" !" if item.error else ""))[:48]
+        lines.append(f"{(item.start_ns - start) / 1e9:>9.3f} {item.duration:>9.3f}  {label:<48} "
+                     f"{' ' * offset}{'█' * length}{' ' * (width - offset - length)} {details}")
+    return "\n".join(lines)
+
+
+def self_times(spans: List[Span]) -> List[Dict[str, Any]]:
+    """Calls, total time and self time (minus child spans) per span name, largest self time first."""
+    child_time: Dict[str, float] = defaultdict(float)
+    for item in spans:
+        child_time[item.parent_id] += item.duration
+    rows: Dict[str, Dict[str, Any]] = {}
+    for item in spans:
+        row = rows.setdefault(item.name, {"name": item.name, "calls": 0, "total": 0.0, "self": 0.0, "errors": 0})
+        row["calls"] += 1
+        row["total"] += item.duration
+        # Parallel children can add up to more than their parent
+        row["self"] += max(0.0, item.duration - child_time[item.span_id])
+        row["errors"] += bool(item.error)
+    return sorted(rows.values(), key=lambda row: -row["self"])
+
+
+# =============================================================================
+# Command Line Interface
+# =============================================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect recorded run traces")
+    parser.add_argument("--dir", default=DEFAULT_TRACE_DIR, help="Trace directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="Recorded traces, newest first")
+    waterfall_parser = subparsers.add_parser("waterfall", help="Timeline of every span of a run")
+    waterfall_parser.add_argument("run_id")
+    waterfall_parser.add_argument("--min-ms", type=float, default=0.0, help="Hide spans shorter than this")
+    waterfall_parser.add_argument("--width", type=int, default=50)
+    top_parser = subparsers.add_parser("top", help="Total and self time per span name")
+    top_parser.add_argument("run_id")
+
+    args = parser.parse_args()
+    if args.command == "list":
+        names = [name for name in os.listdir(args.dir) if name.endswith(".otlp.json")]
+        for name in sorted(names, key=lambda name: -os.path.getmtime(os.path.join(args.dir, name))):
+            spans = load_trace(name[:-len(".otlp.json")], args.dir)
+            root = min(spans, key=lambda item: item.start_ns)
+            print(f"{name[:-len('.otlp.json')]:<40} {len(spans):>6} spans {root.duration:>10.2f}s  {root.name}")
+    elif args.command == "waterfall":
+        print(render_waterfall(load_trace(args.run_id, args.dir), args.width, args.min_ms / 1000))
+    else:
+        print(f"{'span':<40} {'calls':>6} {'total s':>10} {'self s':>10} {'errors':>6}")
+        for row in self_times(load_trace(args.run_id, args.dir)):
+            print(f"{row['name']:<40} {row['calls']:>6} {row['total']:>10.3f} {row['self']:>10.3f} {row['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Test Input Validation
+
+This module checks generated test inputs against the problem constraints before
+the reference solution runs on them. Inputs are checked either by the LLM-written
+validator program attached to the problem or, when none exists, against numeric
+bounds declared in `CompleteProblem.constraints` and `Subtask.constraints`.
+"""
+
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from structures import CompleteProblem, TestGenerator
+from executor import ExecutionJob, run_jobs
+
+
+# =============================================================================
+# Configuration and Constants
+# =============================================================================
+
+# Inputs smaller than this are checked in-process; larger batches go to a pool.
+PARALLEL_THRESHOLD_BYTES = 1 << 20
+VALIDATOR_TIME_LIMIT = 10.0
+
+_TOKEN_RE = re.compile(rb"\S+")
+_INT_RE = re.compile(rb"[+-]?\d+")
+_FLOAT_RE = re.compile(rb"[+-]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?")
+
+# Contest notation rewritten before bounds are parsed (LaTeX and ASCII operators).
+_NORMALIZATIONS = [
+    (re.compile(r"\\(?:cdots|ldots|dots)(?![A-Za-z])|…"), "..."),
+    (re.compile(r"\\(?:cdot|times)(?![A-Za-z])"), "·"),
+    (re.compile(r"\\(?:leqslant|leq|le)(?![A-Za-z])|<=|=<|⩽|≦"), "≤"),
+    (re.compile(r"\\(?:geqslant|geq|ge)(?![A-Za-z])|>=|⩾|≧"), "≥"),
+    (re.compile(r"\\lt(?![A-Za-z])"), "<"),
+    (re.compile(r"\\gt(?![A-Za-z])"), ">"),
+    (re.compile(r"\\(?:mathrm|mathit|text|operatorname)\s*\{([^{}]*)\}"), r"\1"),
+    (re.compile(r"[−–]"), "-"),
+    (re.compile(r"\$|\\[,;:! ]"), " "),
+]
+_RELATION_RE = re.compile(r"([≤<≥>])")
+
+# A bound value such as 5, -10^9, 2·10^5, 2^{30}, 1e9 or 10^9 + 7.
+_ATOM = r"\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?:\s*\^\s*(?:\{\s*[+-]?\d+\s*\}|[+-]?\d+))?"
+_PRODUCT = rf"{_ATOM}(?:(?:\s*[·*×]\s*|x){_ATOM})*"
+_NUMBER = rf"[+-]?\s*{_PRODUCT}(?:\s*[+-]\s*{_PRODUCT})*"
+# Variable names such as n, a_i, a_{i,j}, s[i] or lists like `a_1, a_2, ..., a_n`.
+_IDENT = r"[A-Za-z](?:[\w']|\{[^{}]*\}|\[[^\[\]]*\])*"
+_NAMES = rf"(?:{_IDENT}|\.\.\.)(?:\s*,\s*(?:{_IDENT}|\.\.\.))*"
+_LENGTH = r"\|[^|]*\|"
+
+_LEADING_NUMBER_RE = re.compile(_NUMBER)
+_TRAILING_NUMBER_RE = re.compile(rf"(?<![\w.^{{}}])(?:{_NUMBER})$")
+_LEADING_NAMES_RE = re.compile(_NAMES)
+_TRAILING_NAMES_RE = re.compile(rf"(?<![\w'{{}}\[\].]){_NAMES}$")
+_PROSE_RE = re.compile(r"[A-Za-z][\w'{}\[\] ]*")
+_ARITHMETIC = "+-*/^·×%"
+# Operands are taken from both sides of a separator, not across it.
+_SEPARATOR_RE = re.compile(r"[,;\n]|\b(?:and|where|for|if|while)\b")
+# Limits that do not bound token values: resource limits.
+_IGNORED_NAMES_RE = re.compile(r"time|memory|limit|second", re.IGNORECASE)
+
+
+# =============================================================================
+# Data Classes
+# =============================================================================
+
+@dataclass(frozen=True)
+class DeclaredBound:
+    """Numeric bound declared in a constraints string, e.g. `1 ≤ n ≤ 10^5`."""
+    names: str
+    lower: Optional[float]
+    upper: float
+
+
+@dataclass(frozen=True)
+class ValidationResult:
+    """Outcome of validating one generated input."""
+    valid: bool
+    reason: str = ""
+
+
+# =============================================================================
+# Tokenizer
+# =============================================================================
+
+def iter_tokens(data: Union[str, bytes]) -> Iterator[bytes]:
+    """Lazily yield whitespace-separated tokens without splitting the whole input."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    for match in _TOKEN_RE.finditer(data):
+        yield match.group()
+
+
+# =============================================================================
+# Declared Bounds
+# =============================================================================
+
+def normalize_constraints(text: str) -> str:
+    """Rewrite LaTeX and ASCII notation (`\\le`, `<=`, `\\cdot`, `$`, ...) to the plain symbols."""
+    for pattern, replacement in _NORMALIZATIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _parse_number(text: str) -> Union[int, float]:
+    """Evaluate a bound value written in contest notation, e.g. `2·10^5` or `2^{30} - 1`."""
+    text = re.sub(r"[\s{}]", "", text)
+    total: Union[int, float] = 0
+    for term in re.split(r"(?<=[^\^eE])(?=[+-])", text):
+        sign = -1 if term.startswith("-") else 1
+        product: Union[int, float] = 1
+        for atom in re.split(r"[·*×x]", term.lstrip("+-")):
+            base, _, exponent = atom.partition("^")
+            value = float(base) if re.search(r"[.eE]", base) else int(base)
+            if exponent:
+                if abs(int(exponent)) > 1000:
+                    raise OverflowError(f"exponent too large in {text}")
+                value = value ** int(exponent)
+            product *= value
+        total += sign * product
+    return total
+
+
+# An operand is ("number", value), ("names", key) or ("ignored", None); None if unparsed.
+Operand = Optional[Tuple[str, Any]]
+
+
+def _leading_operand(piece: str) -> Operand:
+    text = piece.lstrip()
+    match = _LEADING_NUMBER_RE.match(text)
+    if match:
+        rest = text[match.end():]
+        # `10^9+7x`, `2n` or `10^5 * m` are not plain bounds
+        if re.match(rf"\s*[{re.escape(_ARITHMETIC)}]|[\dA-Za-z_]", rest):
+            return None
+        return "number", _parse_number(match.group())
+    match = re.match(_LENGTH, text)
+    if match:
+        return "ignored", None
+    match = _LEADING_NAMES_RE.match(text)
+    if match and not re.match(rf"\s*[{re.escape(_ARITHMETIC)}(]", text[match.end():]):
+        return "names", match.group()
+    return None
+
+
+def _trailing_operand(piece: str) -> Operand:
+    text = piece.rstrip()
+    match = _TRAILING_NUMBER_RE.search(text)
+    if match:
+        prefix = text[:match.start()].rstrip()
+        number = match.group().strip()
+        binary_minus = number[0] in "+-" and prefix and (prefix[-1].isalnum() or prefix[-1] in ")]}_")
+        if prefix and prefix[-1] in _ARITHMETIC or binary_minus:
+            return None
+        return "number", _parse_number(number)
+    if re.search(rf"{_LENGTH}$", text):
+        return "ignored", None
+    match = _TRAILING_NAMES_RE.search(text)
+    if match and not (text[:match.start()].rstrip()[-1:] or " ") in _ARITHMETIC:
+        return "names", match.group()
+    return None
+
+
+def _whole_operand(piece: str) -> Operand:
+    """The operand a chain's middle piece (e.g. `n` in `1 ≤ n ≤ 10^5`) forms as a whole."""
+    text = piece.strip()
+    if re.fullmatch(_NUMBER, text):
+        return "number", _parse_number(text)
+    if re.fullmatch(_LENGTH, text):
+        return "ignored", None
+    if re.fullmatch(_NAMES, text) or _PROSE_RE.fullmatch(text):
+        return "names", text
+    return None
+
+
+def parse_declared_bounds(constraints: str) -> List[DeclaredBound]:
+    """
+    Extract the bounds of every variable from a constraints string.
+
+    Chains such as `1 ≤ m ≤ n ≤ 2 \\cdot 10^5` are split into relations and
+    bounds are carried along variable-to-variable relations. Parsing fails open:
+    a relation that cannot be read confidently (`n + m ≤ 10`, `2n ≤ 10^5`, ...)
+    adds an unbounded entry, so the envelope never rejects a valid input
+    because of notation. A variable without a declared upper bound is unbounded
+    above.
+    """
+    pieces = _RELATION_RE.split(normalize_constraints(constraints or ""))
+    texts, operators = pieces[0::2], pieces[1::2]
+    whole = [
+        0 < index < len(texts) - 1 and not _SEPARATOR_RE.search(text)
+        for index, text in enumerate(texts)
+    ]
+
+    lowers: Dict[str, Any] = {}
+    uppers: Dict[str, Any] = {}
+    names_order: List[str] = []
+    edges: List[Tuple[str, str]] = []
+    unparsed: List[str] = []
+
+    def bound(key: str, lower: Any = None, upper: Any = None) -> None:
+        if key not in names_order:
+            names_order.append(key)
+        if lower is not None:
+            lowers[key] = max(lowers.get(key, lower), lower)
+        if upper is not None:
+            uppers[key] = min(uppers.get(key, upper), upper)
+
+    for index, operator in enumerate(operators):
+        try:
+            left = _whole_operand(texts[index]) if whole[index] else _trailing_operand(texts[index])
+            right = _whole_operand(texts[index + 1]) if whole[index + 1] else _leading_operand(texts[index + 1])
+        except (ValueError, OverflowError):
+            left = right = None
+        operands = [operand for operand in (left, right) if operand is not None]
+        if any(kind == "ignored" or (kind == "names" and _IGNORED_NAMES_RE.search(value))
+               for kind, value in operands):
+            continue
+        # `k ≤ n, m ≤ 7`: cannot tell a name list from two separate relations
+        if left is not None and right is not None and left[0] == right[0] == "names" and "," in right[1]:
+            left = None
+        if left is None or right is None:
+            unparsed.append(f"{texts[index].strip()[-20:]} {operator} {texts[index + 1].strip()[:20]}")
+            continue
+        low, high = (left, right) if operator in "≤<" else (right, left)
+        if low[0] == "number" and high[0] == "names":
+            bound(high[1], lower=low[1])
+        elif low[0] == "names" and high[0] == "number":
+            bound(low[1], upper=high[1])
+        elif low[0] == high[0] == "names":
+            bound(low[1])
+            bound(high[1])
+            edges.append((low[1], high[1]))
+
+    # Carry bounds along `a ≤ b` relations: a gets b's upper bound, b gets a's lower bound
+    for _ in range(len(names_order)):
+        for low_name, high_name in edges:
+            if high_name in uppers:
+                bound(low_name, upper=uppers[high_name])
+            if low_name in lowers:
+                bound(high_name, lower=lowers[low_name])
+
+    bounds = [DeclaredBound(names=key, lower=lowers.get(key), upper=uppers.get(key, math.inf)) for key in names_order]
+    bounds.extend(DeclaredBound(names=f"unparsed: {text}", lower=None, upper=math.inf) for text in unparsed)
+    return bounds
+
+
+def bounds_envelope(bounds: Sequence[DeclaredBound]) -> Tuple[float, float]:
+    """
+    Return the (low, high) range every numeric token must fall in.
+
+    Tokens cannot be mapped to variable names without parsing the input format,
+    so the declared bounds are merged into one envelope. A variable without a
+    lower bound leaves the envelope open below.
+    """
+    if not bounds:
+        return -math.inf, math.inf
+    low = -math.inf if any(b.lower is None for b in bounds) else min(b.lower for b in bounds)
+    high = max(b.upper for b in bounds)
+    return low, high
+
+
+def generator_envelope(problem: CompleteProblem, generator: TestGenerator) -> Tuple[float, float]:
+    """
+    Return the envelope for inputs of one generator.
+
+    Subtask bounds override the global bound of the same variable. When the
+    generator targets several subtasks, the loosest of their bounds is used.
+    """
+    declared = {bound.names: bound for bound in parse_declared_bounds(problem.constraints)}
+
+    target_bounds = [
+        {bound.names: bound for bound in parse_declared_bounds(subtask.constraints)}
+        for subtask in problem.subtasks
+        if subtask.name in generator.target_subtasks
+    ]
+    names = {name for bounds in target_bounds for name in bounds}
+
+    merged = dict(declared)
+    for name in names:
+        candidates = [bounds.get(name, declared.get(name)) for bounds in target_bounds]
+        if any(candidate is None for candidate in candidates):
+            continue
+        lowers = [candidate.lower for candidate in candidates]
+        merged[name] = DeclaredBound(
+            names=name,
+            lower=None if None in lowers else min(lowers),
+            upper=max(candidate.upper for candidate in candidates)
+        )
+
+    return bounds_envelope(list(merged.values()))
+
+
+def check_envelope(data: Union[str, bytes], low: float, high: float) -> ValidationResult:
+    """Check that every numeric token of an input lies within [low, high]."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    count = 0
+    for position, token in enumerate(iter_tokens(data), 1):
+        count = position
+        if _INT_RE.fullmatch(token):
+            value = int(token)
+        elif _FLOAT_RE.fullmatch(token):
+            value = float(token)
+        else:
+            continue
+        if value < low or value > high:
+            return ValidationResult(False, f"token {position} = {token.decode()} is outside [{low:g}, {high:g}]")
+
+    if count == 0:
+        return ValidationResult(False, "input is empty")
+    return ValidationResult(True)
+
+
+# =============================================================================
+# Batch Validation
+# =============================================================================
+
+def validate_inputs(
+    problem: CompleteProblem,
+    generators: Sequence[TestGenerator],
+    inputs: Sequence[str],
+    max_workers: Optional[int] = None
+) -> List[ValidationResult]:
+    """
+    Validate generated inputs across all cores.
+
+    `generators[i]` is the generator that produced `inputs[i]`. The problem's
+    LLM-written validator takes precedence; otherwise declared bounds are used.
+    """
+    if not inputs:
+        return []
+
+    if problem.input_validator:
+        jobs = [
+            ExecutionJob(code=problem.input_validator, stdin=data, time_limit=VALIDATOR_TIME_LIMIT)
+            for data in inputs
+        ]
+        return [
+            ValidationResult(True) if result.ok else
+            ValidationResult(False, (result.stderr or result.stdout).strip()[:500] or "validator rejected input")
+            for result in run_jobs(jobs, max_workers=max_workers)
+        ]
+
+    envelopes = [generator_envelope(problem, generator) for generator in generators]
+
+    if sum(len(data) for data in inputs) < PARALLEL_THRESHOLD_BYTES:
+        return [check_envelope(data, *env) for data, env in zip(inputs, envelopes)]
+
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(inputs))) as pool:
+        return list(pool.map(
+            check_envelope,
+            inputs,
+            [env[0] for env in envelopes],
+            [env[1] for env in envelopes],
+            chunksize=max(1, len(inputs) // (workers * 4))
+        ))
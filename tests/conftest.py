@@ -0,0 +1,60 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The gen_problem modules import each other by their flat module names
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gen_problem"))
+
+
+@pytest.fixture
+def problem():
+    """A small complete problem whose generator, validator and solutions run."""
+    from fake_provider import fake_problem
+    return fake_problem(random.Random(0))
+
+
+@pytest.fixture
+def new_state():
+    """Factory of workflow states with a fresh run id and the given field values."""
+    import structures
+    from run_log import new_run_id
+
+    def make(**values):
+        return structures.ProblemGenerationState(**{
+            "requirements": structures.ProblemRequirements(topic="Arrays"), "run_id": new_run_id(),
+            "current_step": "initialization", "status": structures.ProcessStatus.IN_PROGRESS,
+            "max_regenerations": 2, "max_revisions": 2, **values
+        })
+    return make
+
+
+@pytest.fixture
+def fake_pipeline(tmp_path, monkeypatch):
+    """The gen_problem module with every LLM service on the instant fake provider.
+
+    Run logs, metrics, traces and artifacts are written under tmp_path.
+    """
+    import dataclasses
+
+    import dedup
+    import fake_provider
+    import gen_problem
+    import run_log
+    from fake_provider import FakeLLMProfile
+    from functions import LLMProvider
+    from reporting import headless, use_reporter
+
+    monkeypatch.chdir(tmp_path)
+    service = gen_problem.workflow_service.problem_service
+    for llm_service in (service.idea_service, service.evaluation_service, service.completion_service,
+                        service.testing_service, service.reflection_service):
+        monkeypatch.setattr(llm_service, "config", dataclasses.replace(llm_service.config, provider=LLMProvider.FAKE))
+    monkeypatch.setattr(fake_provider, "_profile", FakeLLMProfile(
+        time_scale=0.0, acceptance_rate=1.0, revision_rate=0.0, seed=0))
+    monkeypatch.setattr(dedup, "_index", dedup.DuplicateIndex())
+    with use_reporter(headless()):
+        yield gen_problem
+    # The run log writer opens relative paths lazily, so let it finish inside tmp_path
+    run_log.get_writer().flush()
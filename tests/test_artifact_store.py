@@ -0,0 +1,26 @@
+import artifact_store
+import structures
+from artifact_store import ArtifactStore, load_artifact, load_artifacts
+
+
+def test_finished_offloaded_state_holds_only_handles(fake_pipeline, new_state, monkeypatch, tmp_path):
+    root = str(tmp_path / "artifacts")
+    monkeypatch.setattr(artifact_store, "_store", ArtifactStore(root))
+    fields = structures.ProblemGenerationState.model_fields
+    app = fake_pipeline.get_problem_generation_graph()
+    *_, before, final = (
+        structures.ProblemGenerationState.model_validate(
+            {name: value for name, value in values.items() if name in fields})
+        for values in app.stream(new_state(offload=True), stream_mode="values")
+    )
+
+    assert final.status == "COMPLETED" and before.complete_problem is not None
+    assert final.ideas == [] and final.expert_evaluations == [] and final.tester_feedbacks == []
+    assert final.selected_idea is None and final.best_evaluation is None and final.complete_problem is None
+
+    # Bodies come back from disk, not from the store that wrote them
+    monkeypatch.setattr(artifact_store, "_store", ArtifactStore(root))
+    assert load_artifact(final.artifacts, "problem") == before.complete_problem
+    assert load_artifact(final.artifacts, "selected_idea") == before.selected_idea
+    assert load_artifact(final.artifacts, "best_evaluation") == before.best_evaluation
+    assert load_artifacts(final.artifacts, "feedback")[-len(before.tester_feedbacks):] == before.tester_feedbacks
@@ -0,0 +1,85 @@
+import tracemalloc
+import types
+
+import pytest
+
+import artifact_store
+import benchmarks
+import context_cache
+import dedup
+import fake_provider
+import gen_problem
+import metrics
+from benchmarks import patched, traced_allocations
+
+
+def service_configs():
+    service = gen_problem.workflow_service.problem_service
+    return [llm_service.config for llm_service in (
+        service.idea_service, service.evaluation_service, service.completion_service,
+        service.testing_service, service.reflection_service)]
+
+
+def global_state():
+    return (gen_problem.workflow_service, gen_problem.record_update, artifact_store._store, context_cache._manager,
+            dedup._index, fake_provider._profile, metrics._sink, service_configs())
+
+
+def test_patched_restores_attributes_after_an_error():
+    target = types.SimpleNamespace(kept=1)
+    with pytest.raises(RuntimeError), patched(target, kept=2, added=3):
+        assert (target.kept, target.added) == (2, 3)
+        raise RuntimeError
+    assert target.kept == 1 and not hasattr(target, "added")
+
+
+def test_traced_allocations_leaves_the_callers_tracing_running():
+    was_tracing = tracemalloc.is_tracing()
+    tracemalloc.start()
+    try:
+        with traced_allocations():
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    assert benchmarks.measure_allocations(lambda: bytearray(1 << 20)) >= 1024
+
+
+def test_failing_benchmark_restores_the_workflow_service(monkeypatch):
+    before = global_state()
+
+    def fail(self, requirements):
+        raise RuntimeError("sample service failed")
+
+    monkeypatch.setattr(benchmarks.SampleWorkflowService, "create_problem_ideas", fail)
+    with pytest.raises(Exception):
+        benchmarks.bench_batch_memory(batch_size=1)
+    assert global_state() == before
+
+
+def test_benchmarks_leave_process_wide_state_untouched():
+    before = global_state()
+    results = benchmarks.bench_context_cache(problems=1)
+    assert results["cached_caches_created"] > 0 and results["uncached_caches_created"] == 0
+    benchmarks.bench_node_overhead(runs=1)
+    assert global_state() == before
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr("sys.argv", ["benchmarks.py", "quick", *args])
+    benchmarks.main()
+
+
+def test_missing_baseline_fails_before_running(monkeypatch, tmp_path):
+    runs = []
+    monkeypatch.setattr(benchmarks, "BENCHMARKS", {"quick": lambda: runs.append(1) or {"time_us": 1.0}})
+    baseline = str(tmp_path / "baseline.json")
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, "--baseline", baseline)
+    assert "No benchmark baseline" in str(exit_info.value.code) and not runs
+
+    run_main(monkeypatch, "--baseline", baseline, "--no-compare")
+    run_main(monkeypatch, "--baseline", baseline, "--save-baseline")
+    run_main(monkeypatch, "--baseline", baseline)
+    assert len(runs) == 3
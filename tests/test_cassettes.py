@@ -0,0 +1,54 @@
+import dataclasses
+
+import pytest
+
+import cassettes
+import fake_provider
+import metrics
+import structures
+from cassettes import Cassette, CassetteMissError
+from fake_provider import FakeLLMProfile
+from functions import LLMError, LLMProvider, ProblemReflectionService
+
+FEEDBACK = structures.TesterFeedback(solved=True, understanding_clarity=4, difficulty_perception="Medium")
+
+
+@pytest.fixture
+def records(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "_sink", metrics.MetricsSink(path))
+    return lambda: metrics.load_records(path)
+
+
+@pytest.fixture
+def service(monkeypatch, records):
+    monkeypatch.setattr(fake_provider, "_profile", FakeLLMProfile(time_scale=0.0, seed=0))
+    monkeypatch.setattr(cassettes, "_cassette", None)
+    service = ProblemReflectionService()
+    service.config = dataclasses.replace(service.config, provider=LLMProvider.FAKE)
+    return service
+
+
+def reflect(service, problem, feedback=FEEDBACK):
+    prompt = service._build_prompt(problem, [feedback])
+    return service._invoke_with_retry(service._get_llm_instance(structures.CompleteProblem, prompt), prompt)
+
+
+def test_recorded_responses_are_replayed_in_order(service, problem, tmp_path):
+    directory = str(tmp_path / "cassettes")
+    cassettes.set_cassette(Cassette(directory, mode="record"))
+    recorded = [reflect(service, problem), reflect(service, problem)]
+
+    cassettes.set_cassette(Cassette(directory, mode="replay"))
+    # Repeated recordings of one prompt come back in order, then start over
+    assert [reflect(service, problem) for _ in range(3)] == recorded + recorded[:1]
+
+
+def test_unrecorded_prompt_fails_without_retrying(service, records, problem, tmp_path):
+    cassettes.set_cassette(Cassette(str(tmp_path), mode="replay"))
+    unsolved = FEEDBACK.model_copy(update={"solved": False})
+    with pytest.raises(LLMError) as error:
+        reflect(service, problem, unsolved)
+    assert isinstance(error.value.__cause__, CassetteMissError)
+    (record,) = records()
+    assert not record["success"] and record["retries"] == 0
@@ -0,0 +1,77 @@
+import io
+
+import pytest
+
+import checker
+from checker import CheckJob, check_batch, compare_files, compare_outputs, run_special_judge, stream_tokens, stress_test
+
+# Accepts when the output is the answer plus or minus one
+NEAR_JUDGE = """
+import sys
+output, answer = (open(path).read().split() for path in sys.argv[2:4])
+if abs(int(output[0]) - int(answer[0])) > 1:
+    print("too far off")
+    sys.exit(1)
+"""
+
+
+def test_tokens_are_streamed_across_chunk_boundaries():
+    stream = io.BytesIO(b"12345 678\n\n  9  abcdef")
+    assert list(stream_tokens(stream, chunk_size=4)) == [b"12345", b"678", b"9", b"abcdef"]
+
+
+@pytest.mark.parametrize("expected, actual, accepted", [
+    ("1 2 3\n", "1  2\n3", True),
+    ("0.333333", "0.3333334", True),
+    ("0.5", "0.51", False),
+    ("nan", "NaN", True),
+    ("10", "10.0", False),
+    ("YES", "yes", False),
+])
+def test_outputs_are_compared_token_by_token(expected, actual, accepted):
+    assert compare_outputs(expected, actual).accepted is accepted
+
+
+def test_length_mismatches_are_reported():
+    assert "ended early" in compare_outputs("1 2", "1").message
+    assert "extra output" in compare_outputs("1", "1 2").message
+
+
+def test_files_are_compared_as_streams(tmp_path):
+    (tmp_path / "ans").write_text("1\n2.0\n")
+    (tmp_path / "out").write_text("1 2.0000001")
+    assert compare_files(str(tmp_path / "ans"), str(tmp_path / "out")).accepted
+
+
+def test_special_judge_decides_the_verdict():
+    results = run_special_judge(NEAR_JUDGE, [
+        CheckJob(input="", expected="10", actual="11"),
+        CheckJob(input="", expected="10", actual="13"),
+    ])
+    assert [result.accepted for result in results] == [True, False]
+    assert results[1].message == "too far off"
+
+
+def test_large_batches_are_checked_in_a_process_pool(problem, monkeypatch):
+    monkeypatch.setattr(checker, "PARALLEL_THRESHOLD_BYTES", 0)
+    jobs = [CheckJob(input="", expected=str(i), actual=str(i if i % 3 else -1)) for i in range(12)]
+    results = check_batch(problem, jobs, max_workers=2)
+    assert [result.accepted for result in results] == [bool(i % 3) for i in range(12)]
+
+
+def test_stress_test_reports_wrong_and_crashing_solutions(problem):
+    naive = problem.solution_approaches[0]
+    cases = [
+        {"id": 1, "input": "3\n1 2 3\n", "output": "6\n", "subtasks": ["Subtask 1"]},
+        {"id": 2, "input": "2\n5 5\n", "output": "11\n", "subtasks": ["Subtask 2"]},
+        {"id": 3, "input": "2\n5 5\n", "output": "10\n", "subtasks": []},
+    ]
+    assert stress_test(problem, cases) == [
+        {"solution": naive.name, "case_id": 2, "message": "token 1: expected '11', found '10'"}
+    ]
+
+    crashing = problem.model_copy(update={"solution_approaches": [
+        naive.model_copy(update={"code": "raise SystemExit('boom')"}), problem.solution_approaches[1]
+    ]})
+    failures = stress_test(crashing, cases[:1])
+    assert len(failures) == 1 and failures[0]["message"].startswith("runtime error: boom")
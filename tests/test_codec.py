@@ -0,0 +1,49 @@
+import pytest
+
+import codec
+import structures
+from codec import CODECS, construct_trusted, dump_model, load_archive, load_model, save_archive
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_trusted_load_matches_validated_load(problem, name):
+    payload = dump_model(problem, name)
+    trusted = load_model(structures.CompleteProblem, payload, name, trusted=True)
+    assert trusted == load_model(structures.CompleteProblem, payload, name)
+    assert trusted.fingerprint() == problem.fingerprint()
+
+
+def test_missing_fields_get_defaults_even_with_unknown_keys():
+    data = {"name": "brute", "description": "tries everything", "complexity": "O(2^n)", "code": "pass",
+            "renamed_field": 1}
+    approach = construct_trusted(structures.SolutionApproach, data)
+
+    assert approach == structures.SolutionApproach.model_validate(data)
+    assert approach.language == "python" and approach.suitable_for == []
+    assert "renamed_field" not in approach.__dict__
+    assert approach.model_fields_set == {"name", "description", "complexity", "code"}
+
+
+def test_nested_defaults_are_filled(problem):
+    data = problem.model_dump(mode="json")
+    data["unknown"] = "ignored"
+    for generator in data["test_generators"]:
+        del generator["default_args"]
+        generator["legacy"] = True
+    loaded = construct_trusted(structures.CompleteProblem, data)
+    assert all(generator.default_args == [] for generator in loaded.test_generators)
+    assert loaded == structures.CompleteProblem.model_validate(data)
+
+
+def test_archive_round_trip(problem, tmp_path):
+    path = str(tmp_path / "problems.bin")
+    assert save_archive(path, [problem, problem]) == 2
+    assert load_archive(path, structures.CompleteProblem, trusted=True) == [problem, problem]
+
+
+def test_truncated_archive_is_rejected(problem, tmp_path):
+    path = tmp_path / "problems.bin"
+    save_archive(str(path), [problem])
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(codec.CodecError):
+        load_archive(str(path), structures.CompleteProblem)
@@ -0,0 +1,123 @@
+import dataclasses
+
+import pytest
+
+import context_cache
+import metrics
+from context_cache import (
+    ContextCacheError, ContextCacheManager, FakeCacheProvider, get_cache_manager, is_cache_error, set_cache_manager,
+    use_context_cache
+)
+from fake_provider import FakeLLMProfile, set_fake_profile
+from functions import LLMProvider, ProblemReflectionService
+import structures
+
+FEEDBACK = structures.TesterFeedback(solved=True, understanding_clarity=4, difficulty_perception="Medium")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def manager(clock):
+    manager = ContextCacheManager(FakeCacheProvider(clock), ttl=600, refresh_margin=60, min_tokens=0, clock=clock)
+    set_cache_manager(manager)
+    set_fake_profile(FakeLLMProfile(time_scale=0.0, seed=0))
+    yield manager
+    set_cache_manager(None)
+    set_fake_profile(None)
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    metrics.set_sink(metrics.MetricsSink(path))
+    yield lambda: metrics.load_records(path)
+    metrics.set_sink(None)
+
+
+@pytest.fixture
+def service():
+    service = ProblemReflectionService()
+    service.config = dataclasses.replace(service.config, provider=LLMProvider.FAKE)
+    return service
+
+
+def reflect(service, problem):
+    prompt = service._build_prompt(problem, [FEEDBACK])
+    return service._invoke_with_retry(service._get_llm_instance(structures.CompleteProblem, prompt), prompt)
+
+
+def test_fake_provider_reads_the_cached_prefix(manager, records, service, problem):
+    reflect(service, problem)
+    reflect(service, problem)
+
+    first, second = records()
+    assert first["cache_hit"] and second["cache_hit"]
+    assert first["cached_tokens"] == second["cached_tokens"] > 0
+    assert first["cached_tokens"] < first["input_tokens"]
+    assert manager.provider_for("fake").created == 1
+
+
+def test_expired_cache_is_invalidated_and_the_full_prompt_sent(manager, records, service, problem):
+    reflect(service, problem)
+    provider = manager.provider_for("fake")
+    # Evicted by the provider while the manager still holds the handle
+    provider.caches.clear()
+
+    reflect(service, problem)
+    lost = records()[-1]
+    assert lost["success"] and lost["retries"] == 0
+    # The same prompt in full; token estimates of the two parts may round differently
+    assert not lost["cache_hit"] and abs(lost["input_tokens"] - records()[0]["input_tokens"]) <= 1
+
+    # The next call caches the prefix again
+    reflect(service, problem)
+    assert records()[-1]["cache_hit"] and provider.created == 2
+
+
+def test_context_cache_can_be_turned_off_per_run(manager, records, service, problem):
+    with use_context_cache(False):
+        assert get_cache_manager() is None
+        reflect(service, problem)
+    assert get_cache_manager() is manager
+    assert not records()[0]["cache_hit"] and manager.provider_for("fake").created == 0
+
+
+def test_default_setting_applies_outside_use_context_cache(monkeypatch):
+    monkeypatch.setattr(context_cache, "CONTEXT_CACHE_ENABLED", False)
+    assert get_cache_manager() is None
+    with use_context_cache(True):
+        assert get_cache_manager() is not None
+    set_cache_manager(None)
+
+
+def test_cache_errors_are_recognized():
+    assert is_cache_error(ContextCacheError("gone"))
+    assert is_cache_error(Exception("403 PERMISSION_DENIED. CachedContent not found (or permission denied)"))
+    assert not is_cache_error(Exception("429 RESOURCE_EXHAUSTED"))
+
+
+def test_default_is_off(monkeypatch):
+    monkeypatch.setattr(context_cache, "_manager", None)
+    assert not context_cache.CONTEXT_CACHE_ENABLED
+    assert get_cache_manager() is None
+
+
+def test_run_deletes_its_caches_when_it_ends(fake_pipeline, monkeypatch):
+    provider = FakeCacheProvider()
+    monkeypatch.setattr(context_cache, "_manager", ContextCacheManager(provider, min_tokens=0))
+    result = fake_pipeline.generate_problem("Arrays", fuzz_time_budget=0, context_cache=True)
+    assert result
+    assert provider.created > 0 and provider.deleted == provider.created
+    assert not provider.caches
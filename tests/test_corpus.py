@@ -0,0 +1,62 @@
+import os
+import random
+
+import pytest
+
+from corpus import CorpusError, ProblemCorpus
+from fake_provider import fake_problem
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    with ProblemCorpus(str(tmp_path / "problems.db")) as corpus:
+        yield corpus
+
+
+def test_problems_are_stored_once_per_fingerprint(corpus, problem):
+    problem_id = corpus.add(problem, topic="Arrays")
+    assert corpus.add(problem.model_copy(), topic="Other") == problem_id
+    assert corpus.count() == 1 and corpus.get(problem_id) == problem
+
+    corpus.attach_testcases(problem_id, "cases.json", {"Subtask 1": [1, 2]})
+    assert corpus.get_manifest(problem_id) == {"Subtask 1": [1, 2]}
+    with pytest.raises(CorpusError):
+        corpus.get(problem_id + 1)
+
+    # Reopening the database keeps the problem and its fingerprint
+    with ProblemCorpus(corpus.path) as reopened:
+        assert reopened.add(problem) == problem_id and reopened.count() == 1
+
+
+def test_ingested_problems_are_queryable(corpus, problem):
+    graph = problem.model_copy(update={
+        "title": "Shortest Lantern Paths", "problem_statement": "Find the shortest path between lanterns in a graph.",
+        "difficulty": "Div2 C (1400-1700)", "algorithm_categories": ["Graph"], "tags": ["dijkstra"]
+    })
+    ids = corpus.ingest([(problem, "Arrays"), (graph, "Graphs"), (problem, "Arrays")])
+    assert ids[0] == ids[2] != ids[1] and corpus.count() == 2
+
+    assert [entry.id for entry in corpus.query("lanterns")] == [ids[1]]
+    assert [entry.id for entry in corpus.query(topic="Arrays")] == [ids[0]]
+    assert [entry.id for entry in corpus.query(category="graph", difficulty=graph.difficulty)] == [ids[1]]
+    assert [entry.id for entry in corpus.query("shortest", tag="DIJKSTRA")] == [ids[1]]
+    assert corpus.query("lanterns", topic="Arrays") == [] and corpus.query("!!") == []
+
+
+def test_similar_problems_exclude_the_problem_itself(corpus):
+    rng = random.Random(0)
+    problems = [fake_problem(rng) for _ in range(3)]
+    first, _, _ = corpus.ingest((problem, "Fake") for problem in problems)
+    variant = problems[0].model_copy(update={"title": problems[0].title + " Again"})
+
+    similar = corpus.find_similar(variant)
+    assert similar[0].id == first and all(entry.score is not None for entry in similar)
+    assert first not in [entry.id for entry in corpus.find_similar(problems[0])]
+
+
+def test_export_writes_markdown_per_problem(corpus, problem, tmp_path):
+    problem_id = corpus.add(problem)
+    paths = corpus.export(str(tmp_path / "export"))
+    assert [os.path.basename(path) for path in paths] == [f"problem_statement{problem_id}.md",
+                                                          f"solution{problem_id}.md"]
+    assert problem.title in open(paths[0], encoding="utf-8").read()
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+import dedup
+from dedup import DuplicateIndex, estimate_similarity, filter_duplicate_ideas, minhash
+from fake_provider import fake_idea
+
+TEXT = ("Given an array of n integers, answer q queries asking for the number of distinct values "
+        "in a range, where every query depends on the answer to the previous one.")
+VARIANT = TEXT.replace("distinct values", "distinct elements")
+OTHER = "A robot walks on a grid and must collect every coin while avoiding the rivers and the mountains."
+
+
+@pytest.fixture(params=["numpy", "pure"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(dedup, "np", None)
+    return request.param
+
+
+def test_pure_python_signatures_match_numpy(monkeypatch):
+    pytest.importorskip("numpy")
+    expected = [int(value) for value in minhash(TEXT)]
+    monkeypatch.setattr(dedup, "np", None)
+    assert list(minhash(TEXT)) == expected
+    assert list(minhash("")) == [0xFFFFFFFF] * dedup.NUM_PERM
+
+
+def test_similar_texts_are_found(backend):
+    index = DuplicateIndex()
+    index.add("problem:1", TEXT, "Distinct queries")
+    index.add("problem:2", OTHER, "Robot")
+
+    matches = index.query(VARIANT)
+    assert [match.key for match in matches] == ["problem:1"]
+    assert matches[0].label == "Distinct queries" and matches[0].similarity >= 0.7
+    assert estimate_similarity(minhash(TEXT), minhash(TEXT)) == 1.0
+    assert not index.query("Count the palindromic substrings of a string after every update.")
+
+
+def test_index_file_round_trip(backend, tmp_path):
+    path = str(tmp_path / "dedup.bin")
+    index = DuplicateIndex.load(path)
+    index.add("problem:1", TEXT, "Distinct queries")
+    index.add("problem:1", TEXT, "added twice")
+    index.add("problem:2", OTHER)
+
+    loaded = DuplicateIndex.load(path)
+    assert len(loaded) == 2 and "problem:1" in loaded
+    assert [match.key for match in loaded.query(VARIANT)] == ["problem:1"]
+
+
+def test_truncated_index_file_keeps_complete_records(tmp_path):
+    path = tmp_path / "dedup.bin"
+    index = DuplicateIndex.load(str(path))
+    index.add("problem:1", TEXT)
+    index.add("problem:2", OTHER)
+    path.write_bytes(path.read_bytes()[:-10])
+    assert len(DuplicateIndex.load(str(path))) == 1
+
+
+def test_duplicate_ideas_are_filtered_within_a_batch(backend):
+    rng = random.Random(0)
+    first, second = fake_idea(rng), fake_idea(rng)
+    copy = first.model_copy(update={"title": "Copy", "description": first.description + " Again."})
+
+    index = DuplicateIndex()
+    novel, duplicates = filter_duplicate_ideas([first, second, copy], index)
+    assert novel == [first, second]
+    assert [(idea.title, match.label) for idea, match in duplicates] == [("Copy", first.title)]
+    # Only indexed ideas count across batches
+    assert not index.query(first.description)
+
+
+def test_explicit_empty_index_is_used_instead_of_the_global_one():
+    rng = random.Random(1)
+    idea = fake_idea(rng)
+    known = DuplicateIndex()
+    known.add_idea(idea)
+    dedup.set_index(known)
+    try:
+        scratch = DuplicateIndex()
+        novel, duplicates = filter_duplicate_ideas([idea], scratch)
+        assert novel == [idea] and not duplicates
+        assert len(known) == 1 and len(scratch) == 0
+    finally:
+        dedup.set_index(None)
@@ -0,0 +1,106 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import distributed
+import executor
+import fuzzer
+from distributed import Coordinator, DistributedError, _worker_slot, parse_address, recv_message, send_message
+from executor import ExecutionJob
+
+ECHO = "print(input())\n"
+FAIL = "raise SystemExit(1)\n"
+
+
+def start_workers(coordinator, count=1):
+    for _ in range(count):
+        threading.Thread(target=_worker_slot, args=(coordinator.address, coordinator.token, 0.05),
+                         daemon=True).start()
+
+
+def lose_every_job(coordinator):
+    """A worker that takes one job and disconnects without answering."""
+    family, address = parse_address(coordinator.address)
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        send_message(sock, {"type": "hello", "token": coordinator.token})
+        recv_message(sock)
+
+
+def test_token_is_required_beyond_loopback():
+    with pytest.raises(DistributedError):
+        Coordinator("0.0.0.0:0", token="").start()
+    Coordinator("0.0.0.0:0", token="secret").start().close()
+    Coordinator("127.0.0.1:0", token="").start().close()
+
+
+def test_worker_with_wrong_token_is_rejected():
+    with Coordinator("127.0.0.1:0", token="secret", worker_timeout=0.5) as coordinator:
+        threading.Thread(target=_worker_slot, args=(coordinator.address, "wrong", 0.05), daemon=True).start()
+        with pytest.raises(DistributedError):
+            coordinator.run_jobs([ExecutionJob(code=ECHO, stdin="1\n")])
+
+
+def test_run_jobs_fails_without_workers():
+    with Coordinator("127.0.0.1:0", worker_timeout=0.3) as coordinator:
+        started = time.monotonic()
+        with pytest.raises(DistributedError):
+            coordinator.run_jobs([ExecutionJob(code=ECHO, stdin="1\n")])
+        assert time.monotonic() - started < 5
+        # The abandoned job is not left queued
+        assert not coordinator._jobs and not coordinator._orphans and not coordinator._waiters
+
+
+def test_results_keep_order_and_only_successes_are_cached():
+    with Coordinator("127.0.0.1:0") as coordinator:
+        start_workers(coordinator, 2)
+        jobs = [ExecutionJob(code=ECHO, stdin=f"{i}\n") for i in range(4)] + [ExecutionJob(code=FAIL)]
+        results = coordinator.run_jobs(jobs + jobs[:1])
+
+        assert [result.stdout.strip() for result in results[:4]] == ["0", "1", "2", "3"]
+        assert not results[4].ok and results[5].stdout == results[0].stdout
+        assert set(coordinator._cache) == {job.content_hash() for job in jobs[:4]}
+        assert not coordinator._results and not coordinator._waiters
+
+
+def test_cache_is_bounded():
+    with Coordinator("127.0.0.1:0", cache_size=2) as coordinator:
+        start_workers(coordinator)
+        jobs = [ExecutionJob(code=ECHO, stdin=f"{i}\n") for i in range(5)]
+        coordinator.run_jobs(jobs)
+        assert list(coordinator._cache) == [job.content_hash() for job in jobs[-2:]]
+
+
+def test_lost_job_is_not_cached_and_reruns():
+    with Coordinator("127.0.0.1:0", max_attempts=1) as coordinator:
+        job = ExecutionJob(code=ECHO, stdin="7\n")
+        threading.Thread(target=lose_every_job, args=(coordinator,), daemon=True).start()
+        while not coordinator._queues:
+            time.sleep(0.01)
+        lost = coordinator.run_jobs([job])[0]
+        assert not lost.ok and "lost" in lost.stderr
+
+        start_workers(coordinator)
+        assert coordinator.run_jobs([job])[0].stdout.strip() == "7"
+
+
+def test_timing_repeats_all_run_on_the_coordinator(problem, monkeypatch):
+    runs = []
+
+    def counting_run_program(job):
+        runs.append(job.stdin)
+        return executor.run_program(job)
+
+    monkeypatch.setattr(distributed, "run_program", counting_run_program)
+    with Coordinator("127.0.0.1:0") as coordinator:
+        start_workers(coordinator, 2)
+        executor.set_backend(coordinator)
+        try:
+            pairs = fuzzer._time_solutions(problem, ["2\n1 2\n", "1\n5\n"], time_limit=2.0, repeats=3)
+        finally:
+            executor.set_backend(None)
+        # Two solutions on two inputs, three times each, none answered from the cache
+        assert len(runs) == 12 and not coordinator._cache and not coordinator._uncached
+    assert [pair[1].stdout.strip() for pair in pairs] == ["3", "5"]
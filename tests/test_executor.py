@@ -0,0 +1,67 @@
+import shutil
+
+import pytest
+
+import executor
+from executor import ExecutionJob, run_jobs_locally, run_program
+
+ALLOCATE_PYTHON = "data = bytearray(512 * 1024 * 1024)\nprint(len(data))\n"
+ALLOCATE_CPP = """
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+int main() {
+    char *data = (char *) malloc(512u << 20);
+    if (!data) { puts("denied"); return 3; }
+    memset(data, 1, 512u << 20);
+    puts("allocated");
+}
+"""
+ECHO_CPP = """
+#include <cstdio>
+#include <cstdlib>
+int main() {
+    long long a, b;
+    scanf("%lld %lld", &a, &b);
+    const char *seed = getenv("TESTCASE_SEED");
+    printf("%lld %s\\n", a + b, seed ? seed : "");
+}
+"""
+needs_cpp = pytest.mark.skipif(shutil.which("g++") is None, reason="g++ is not installed")
+
+
+def test_python_program_reads_stdin_and_is_seeded():
+    code = "import random\nprint(sum(map(int, input().split())), random.randint(0, 10 ** 9))\n"
+    first = run_program(ExecutionJob(code=code, stdin="2 3\n", seed=7))
+    second = run_program(ExecutionJob(code=code, stdin="2 3\n", seed=7))
+    assert first.ok and first.stdout == second.stdout
+    assert first.stdout.split()[0] == "5"
+
+
+def test_python_memory_limit():
+    assert not run_program(ExecutionJob(code=ALLOCATE_PYTHON), memory_limit_mb=128).ok
+    assert run_program(ExecutionJob(code=ALLOCATE_PYTHON), memory_limit_mb=2048).ok
+
+
+@needs_cpp
+def test_cpp_program_gets_seed():
+    result = run_program(ExecutionJob(code=ECHO_CPP, stdin="40 2", language="cpp", seed=11))
+    assert result.ok and result.stdout.split() == ["42", "11"]
+
+
+@needs_cpp
+@pytest.mark.parametrize("use_prlimit", [True, False])
+def test_cpp_memory_limit(monkeypatch, use_prlimit):
+    if use_prlimit and executor._PRLIMIT is None:
+        pytest.skip("prlimit is not installed")
+    if not use_prlimit:
+        monkeypatch.setattr(executor, "_PRLIMIT", None)
+    limited = run_program(ExecutionJob(code=ALLOCATE_CPP, language="cpp"), memory_limit_mb=128)
+    assert limited.stdout.strip() == "denied"
+    assert run_program(ExecutionJob(code=ALLOCATE_CPP, language="cpp"), memory_limit_mb=2048).ok
+
+
+def test_batch_runs_on_threads_in_order():
+    jobs = [ExecutionJob(code="print(int(input()) * 2)\n", stdin=f"{i}\n") for i in range(12)]
+    results = run_jobs_locally(jobs, max_workers=4)
+    assert [result.stdout.strip() for result in results] == [str(i * 2) for i in range(12)]
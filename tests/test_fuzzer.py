@@ -0,0 +1,88 @@
+import random
+
+import fuzzer
+from executor import ExecutionResult
+from fuzzer import FuzzCandidate, fuzz_worst_cases, mutate
+import structures
+
+SIZED_GENERATOR = """import random, sys
+n = int(sys.argv[1])
+print(n)
+print(*[random.randint(-10**9, 10**9) for _ in range(n)])
+"""
+QUADRATIC_NAIVE = """n = int(input())
+values = list(map(int, input().split()))
+total = 0
+for i in range(n):
+    for j in range(i + 1):
+        pass
+    total += values[i]
+print(total)
+"""
+
+
+def anti_naive(problem):
+    """The sample problem with a quadratic naive solution and a sized generator for the full subtask."""
+    naive, optimal = problem.solution_approaches
+    return problem.model_copy(update={
+        "solution_approaches": [
+            naive.model_copy(update={"code": QUADRATIC_NAIVE, "suitable_for": ["Subtask 1"]}),
+            optimal,
+        ],
+        "test_generators": [structures.TestGenerator(name="sized", description="n from argv", code=SIZED_GENERATOR,
+                                          target_subtasks=["Subtask 2"], default_args=["200"])],
+    })
+
+
+def test_mutate_perturbs_declared_arguments():
+    generator = structures.TestGenerator(name="g", description="", code="", default_args=["1000", "fixed"])
+    candidate = FuzzCandidate(generator=generator, seed=1, args=list(generator.default_args))
+    rng = random.Random(0)
+    mutated = [mutate(candidate, rng) for _ in range(20)]
+    assert any(child.args[0] != "1000" for child in mutated)
+    assert all(child.args[1] == "fixed" for child in mutated)
+
+
+def test_fuzzing_starts_from_default_args(problem):
+    results = fuzz_worst_cases(anti_naive(problem), time_budget=2.0, keep=3, repeats=1, max_workers=2)
+    assert results
+    assert all(len(result.candidate.args) == 1 and int(result.candidate.args[0]) >= 1 for result in results)
+    assert all(result.input.split()[0] == result.candidate.args[0] for result in results)
+
+
+def test_runtimes_are_best_of_repeats(problem, monkeypatch):
+    calls = []
+
+    def fake_run_jobs(jobs):
+        calls.append(len(jobs))
+        # naive then optimal per input; later rounds are faster
+        elapsed = [5.0, 1.0] if len(calls) == 1 else [3.0 + len(calls), 0.5]
+        return [ExecutionResult(stdout="", stderr="", returncode=0, elapsed=elapsed[i % 2]) for i in range(len(jobs))]
+
+    monkeypatch.setattr(fuzzer, "run_jobs", fake_run_jobs)
+    naive_run, optimal_run = fuzzer._time_solutions(problem, ["1\n1\n"], time_limit=2.0, repeats=3)[0]
+    assert calls == [2, 4]
+    assert (naive_run.elapsed, optimal_run.elapsed) == (5.0, 0.5)
+
+
+def test_timed_out_naive_is_not_rerun(problem, monkeypatch):
+    calls = []
+
+    def fake_run_jobs(jobs):
+        calls.append(len(jobs))
+        return [ExecutionResult(stdout="", stderr="", returncode=-1, elapsed=2.0, timed_out=True),
+                ExecutionResult(stdout="1", stderr="", returncode=0, elapsed=0.1)]
+
+    monkeypatch.setattr(fuzzer, "run_jobs", fake_run_jobs)
+    naive_run, _ = fuzzer._time_solutions(problem, ["1\n1\n"], time_limit=2.0, repeats=3)[0]
+    assert calls == [2] and naive_run.timed_out
+
+
+def test_generate_problem_does_not_fuzz_by_default(fake_pipeline, monkeypatch):
+    budgets = []
+    monkeypatch.setattr(fake_pipeline, "fuzz_testcases", lambda *args, **kwargs: budgets.append(kwargs) or [])
+    assert fake_pipeline.DEFAULT_FUZZ_TIME_BUDGET == 0
+    assert fake_pipeline.generate_problem("Arrays")
+    assert not budgets
+    assert fake_pipeline.generate_problem("Arrays", fuzz_time_budget=5.0)
+    assert [kwargs["time_budget"] for kwargs in budgets] == [5.0]
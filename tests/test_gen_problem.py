@@ -0,0 +1,49 @@
+import pytest
+
+import fake_provider
+import gen_problem
+import structures
+from fake_provider import FakeLLMProfile
+from reporting import Reporter, use_reporter
+
+
+def test_final_summary_shows_the_status_value(fake_pipeline, new_state):
+    state = new_state(current_step="final_review")
+    lines = []
+    with use_reporter(Reporter(sink=lines.append)):
+        update = fake_pipeline.finalize_problem_node(state)
+    assert "status: COMPLETED" in lines
+    assert structures.ProblemGenerationState.model_validate({**state.model_dump(), **update}).status == "COMPLETED"
+
+
+@pytest.mark.parametrize("acceptance_rate, counter, node", [
+    (0.0, "regeneration_count", "create_ideas"),
+    (1.0, "revision_count", "refine_problem"),
+])
+def test_counters_increase_once_per_round(fake_pipeline, new_state, monkeypatch, acceptance_rate, counter, node):
+    # Ideas are always rejected, or every tested problem is sent back for revision
+    monkeypatch.setattr(fake_provider, "_profile", FakeLLMProfile(
+        time_scale=0.0, acceptance_rate=acceptance_rate, revision_rate=1.0, seed=0))
+    rounds, counts = 0, []
+    app = fake_pipeline.get_problem_generation_graph()
+    for mode, chunk in app.stream(new_state(), stream_mode=["updates", "values"]):
+        if mode == "updates":
+            rounds += node in chunk
+        else:
+            counts.append(chunk[counter])
+
+    if node == "create_ideas":
+        # The first round of ideas is not a regeneration
+        rounds -= 1
+    assert rounds == 2 and counts[-1] == rounds
+    assert all(later - earlier in (0, 1) for earlier, later in zip(counts, counts[1:]))
+
+
+def test_compiled_graph_is_shared_until_the_cache_is_cleared():
+    app = gen_problem.get_problem_generation_graph()
+    assert gen_problem.get_problem_generation_graph() is app
+    gen_problem.clear_graph_cache()
+    rebuilt = gen_problem.get_problem_generation_graph()
+    assert rebuilt is not app and gen_problem.get_problem_generation_graph() is rebuilt
+    with pytest.raises(ValueError):
+        gen_problem.get_problem_generation_graph("unknown")
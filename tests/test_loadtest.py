@@ -0,0 +1,18 @@
+import metrics
+from fake_provider import FakeLLMProfile
+from loadtest import percentile, run_load
+
+
+def test_percentiles_use_the_nearest_rank():
+    assert percentile([], 50) == 0.0
+    assert [percentile([4.0, 1.0, 3.0, 2.0], q) for q in (1, 50, 99)] == [1.0, 2.0, 4.0]
+
+
+def test_smoke_run_on_the_instant_fake_profile(fake_pipeline, monkeypatch):
+    # run_load resets the process-wide sink when it is done
+    monkeypatch.setattr(metrics, "_sink", metrics._sink)
+    profile = FakeLLMProfile(time_scale=0.0, acceptance_rate=1.0, revision_rate=0.0, seed=0)
+    result = run_load(concurrency=2, runs=3, profile=profile)
+    assert (result.runs, result.completed, result.failed) == (3, 3, 0)
+    assert result.llm_calls > 0 and result.llm_failures == 0 and result.llm_retries == 0
+    assert result.throughput_per_min > 0 and result.run_p50 <= result.run_p99
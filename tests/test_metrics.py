@@ -0,0 +1,40 @@
+import pytest
+
+import metrics
+from metrics import CallMetrics, MetricsSink, estimate_cost, load_records, record_call, summarize, use_run
+
+USAGE = {"input_tokens": 1000, "output_tokens": 200, "input_token_details": {"cache_read": 400},
+         "output_token_details": {"reasoning": 50}}
+
+
+def call(stage, model="gemini-2.5-pro-preview-03-25", latency=1.0, **values):
+    result = CallMetrics(service="ProblemIdeaService", stage=stage, model=model, prompt_chars=100,
+                         latency=latency, **values)
+    result.add_usage(USAGE)
+    return result
+
+
+def test_records_are_tagged_with_their_run_and_summarized(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "_sink", MetricsSink(path))
+    with use_run("run-1"):
+        record_call(call("ideas", latency=1.0))
+        record_call(call("ideas", latency=3.0, retries=2))
+        record_call(call("testing", model="unpriced", success=False, error="boom"))
+    with use_run("run-2"):
+        record_call(call("ideas"))
+
+    records = load_records(path, run_id="run-1")
+    assert len(records) == 3 and len(load_records(path)) == 4
+    assert records[0]["cache_hit"] and records[0]["reasoning_tokens"] == 50
+    assert records[0]["cost"] == pytest.approx((600 * 1.25 + 400 * 0.31 + 200 * 10.0) / 1e6)
+    assert records[2]["cost"] == 0.0 == estimate_cost("unpriced", 1000, 0, 1000)
+
+    ideas, testing = summarize(records, by="stage")
+    assert (ideas["stage"], ideas["calls"], ideas["retries"], ideas["failures"]) == ("ideas", 2, 2, 0)
+    assert ideas["input_tokens"] == 2000 and ideas["cached_tokens"] == 800 and ideas["cache_hits"] == 2
+    assert ideas["mean_latency"] == 2.0 and ideas["p95_latency"] == 3.0
+    assert ideas["cost"] == pytest.approx(2 * records[0]["cost"])
+    assert (testing["stage"], testing["failures"]) == ("testing", 1)
+    assert [row["run"] for row in summarize(load_records(path), by="run")] == ["run-1", "run-2"]
+
@@ -0,0 +1,51 @@
+import tracemalloc
+
+import pytest
+
+import profiling
+from profiling import load_summary, profiled, use_profiling
+
+
+@pytest.fixture(autouse=True)
+def no_tracemalloc():
+    was_tracing = tracemalloc.is_tracing()
+    tracemalloc.stop()
+    yield
+    tracemalloc.stop()
+    if was_tracing:
+        tracemalloc.start()
+
+
+def allocate():
+    return [bytearray(1024) for _ in range(100)]
+
+
+def test_unselected_stage_is_not_profiled(tmp_path):
+    with profiled("develop", "run", directory=str(tmp_path)):
+        allocate()
+    assert not list(tmp_path.iterdir())
+
+
+def test_selected_stage_writes_cpu_and_memory_profiles(tmp_path):
+    with use_profiling(["develop_node"]):
+        with profiled("develop", "run", "develop_node", directory=str(tmp_path)):
+            with profiled("nested", "run", directory=str(tmp_path)):
+                allocate()
+        with profiled("develop", "run", "develop_node", directory=str(tmp_path)):
+            allocate()
+
+    summaries = load_summary("run", str(tmp_path))
+    assert [summary["files"] for summary in summaries] == ["develop", "develop.2"]
+    assert all(summary["alloc_peak_kb"] > 0 and "categories" in summary for summary in summaries)
+    assert (tmp_path / "run" / "develop.prof").exists() and (tmp_path / "run" / "develop.memory.txt").exists()
+    # Started for the stage and stopped after it
+    assert not tracemalloc.is_tracing()
+
+
+def test_tracemalloc_started_by_the_caller_keeps_running(tmp_path):
+    tracemalloc.start()
+    with use_profiling("all"):
+        with profiled("develop", "run", directory=str(tmp_path), kinds="memory"):
+            allocate()
+    assert tracemalloc.is_tracing()
+    assert profiling._tracemalloc_users == 0
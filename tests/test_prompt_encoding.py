@@ -0,0 +1,34 @@
+import json
+
+import prompt_encoding
+import structures
+from prompt_encoding import encode
+
+
+def test_json_is_the_default_encoding():
+    assert prompt_encoding.DEFAULT_PROMPT_ENCODING == "json"
+    requirements = structures.ProblemRequirements()
+    assert encode(requirements) == requirements.model_dump_json()
+
+
+def test_compact_keeps_default_values():
+    data = json.loads(encode(structures.ProblemRequirements(), "compact"))
+    assert data == {"topic": "Math, Implementation", "constraints": "", "special_requirements": "Easy"}
+
+
+def test_compact_drops_only_nulls_and_empty_containers(problem):
+    data = json.loads(encode(problem, "compact"))
+    assert all(solution["language"] == "python" for solution in data["solution_approaches"])
+    assert all(generator["language"] == "python" for generator in data["test_generators"])
+    assert "special_judge" not in data and "proof_of_correctness" not in data["editorial"]
+
+    feedback = structures.TesterFeedback(solved=True, understanding_clarity=4, difficulty_perception="Medium")
+    (encoded,) = json.loads(encode([feedback], "compact"))
+    assert encoded["additional_examples_needed"] is False
+    assert "bad_feedbacks" not in encoded
+
+
+def test_tester_views_keep_defaults(problem):
+    view = structures.CompleteProblem.TESTER_VIEWS["Solution_Tester"]
+    terse = encode(problem, "terse", include=view)
+    assert "language: python" in terse
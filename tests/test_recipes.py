@@ -0,0 +1,87 @@
+import shutil
+
+import pytest
+
+import structures
+from recipes import RecipeError, compact_testcases, materialize_testcases
+
+SEEDED_PYTHON = """import random
+n = 2000
+print(n)
+print(*[random.randint(1, 100) for _ in range(n)])
+"""
+UNSEEDED_PYTHON = """import os
+n = 2000
+print(n)
+print(*[b % 100 + 1 for b in os.urandom(n)])
+"""
+SEEDED_CPP = """
+#include <cstdio>
+#include <cstdlib>
+#include <random>
+int main() {
+    const char *seed = getenv("TESTCASE_SEED");
+    std::mt19937 rng(seed ? atoi(seed) : 0);
+    int n = 2000;
+    printf("%d\\n", n);
+    for (int i = 0; i < n; i++) printf("%d ", (int) (rng() % 100) + 1);
+    printf("\\n");
+}
+"""
+UNSEEDED_CPP = """
+#include <cstdio>
+#include <random>
+int main() {
+    std::random_device device;
+    std::mt19937 rng(device());
+    int n = 2000;
+    printf("%d\\n", n);
+    for (int i = 0; i < n; i++) printf("%d ", (int) (rng() % 100) + 1);
+    printf("\\n");
+}
+"""
+needs_cpp = pytest.mark.skipif(shutil.which("g++") is None, reason="g++ is not installed")
+
+
+def generated_cases(problem, generators):
+    """The problem using `generators`, with one case per generator produced as generate_testcases would."""
+    from executor import ExecutionJob, run_jobs
+    problem = problem.model_copy(update={"test_generators": generators})
+    inputs = run_jobs([ExecutionJob(code=g.code, language=g.language, seed=5) for g in generators])
+    solution = problem.get_optimal_solution()
+    outputs = run_jobs([ExecutionJob(code=solution.code, stdin=result.stdout) for result in inputs])
+    cases = [
+        {"id": index, "input": generated.stdout, "output": solved.stdout, "generator": g.name, "seed": 5, "args": []}
+        for index, (g, generated, solved) in enumerate(zip(generators, inputs, outputs), 1)
+    ]
+    return problem, cases
+
+
+def generator(name, code, language="python"):
+    return structures.TestGenerator(name=name, description="", code=code, language=language)
+
+
+@pytest.mark.parametrize("seeded, unseeded, language", [
+    (SEEDED_PYTHON, UNSEEDED_PYTHON, "python"),
+    pytest.param(SEEDED_CPP, UNSEEDED_CPP, "cpp", marks=needs_cpp),
+])
+def test_only_reproducible_cases_are_compacted(problem, seeded, unseeded, language):
+    problem, cases = generated_cases(problem, [generator("seeded", seeded, language),
+                                               generator("unseeded", unseeded, language)])
+    compact = compact_testcases(problem, cases, threshold=100)
+    assert "recipe" in compact[0] and "input" not in compact[0]
+    assert "recipe" not in compact[1] and compact[1]["input"] == cases[1]["input"]
+    assert materialize_testcases(problem, compact) == cases
+
+
+def test_small_cases_stay_inline(problem):
+    problem, cases = generated_cases(problem, [generator("seeded", SEEDED_PYTHON)])
+    assert compact_testcases(problem, cases, threshold=10 ** 9) == cases
+
+
+def test_changed_generator_fails_materialization(problem):
+    problem, cases = generated_cases(problem, [generator("seeded", SEEDED_PYTHON)])
+    compact = compact_testcases(problem, cases, threshold=100)
+    changed = problem.model_copy(update={"test_generators": [generator("seeded", SEEDED_PYTHON + "# v2\n")]})
+    with pytest.raises(RecipeError):
+        materialize_testcases(changed, compact)
@@ -0,0 +1,27 @@
+import pytest
+
+import run_log
+import structures
+
+
+def test_replay_rebuilds_the_state_after_every_node(fake_pipeline, new_state):
+    state = new_state()
+    run_log.start_run(state)
+    app = fake_pipeline.get_problem_generation_graph()
+    fields = structures.ProblemGenerationState.model_fields
+    try:
+        states = [
+            structures.ProblemGenerationState.model_validate(
+                {name: value for name, value in values.items() if name in fields})
+            for values in app.stream(state, stream_mode="values")
+        ]
+    finally:
+        run_log.finish_run(state.run_id)
+
+    events = run_log.load_events(state.run_id)
+    assert len(events) == len(states) and events[0]["type"] == "initial"
+    for step, expected in enumerate(states):
+        assert run_log.replay_state(state.run_id, step=step) == expected
+    assert run_log.replay_state(state.run_id).status == "COMPLETED"
+    with pytest.raises(ValueError):
+        run_log.replay_state(state.run_id, step=len(events))
@@ -0,0 +1,69 @@
+import pickle
+import random
+
+import pytest
+from pydantic import ValidationError
+
+from fake_provider import fake_idea
+
+
+def revalidated(model):
+    """The same content as a new model with empty fingerprint caches."""
+    return type(model).model_validate(model.model_dump())
+
+
+def test_nested_assignment_invalidates_parent_fingerprints(problem):
+    before = problem.fingerprint()
+    problem.editorial.problem_analysis = "A different analysis."
+    assert problem.fingerprint() != before
+    assert problem.fingerprint() == revalidated(problem).fingerprint()
+
+    before = problem.fingerprint("solutions")
+    problem.solution_approaches[0].complexity = "O(n^2)"
+    assert problem.fingerprint("solutions") != before
+    assert problem.fingerprints() == revalidated(problem).fingerprints()
+
+
+def test_model_copy_with_update_gets_its_own_cache(problem):
+    before = problem.fingerprint()
+    copied = problem.model_copy(update={"title": "Another title"})
+    assert copied.fingerprint() != before
+    assert copied.fingerprint() == revalidated(copied).fingerprint()
+    assert problem.fingerprint() == before
+
+    # Shared nested models invalidate both owners
+    copied.editorial.problem_analysis = "A different analysis."
+    assert copied.fingerprint() == revalidated(copied).fingerprint()
+    assert problem.fingerprint() == revalidated(problem).fingerprint() != before
+
+
+def test_state_with_ideas_compares_and_pickles_by_content(new_state):
+    rng = random.Random(0)
+    ideas = [fake_idea(rng) for _ in range(3)]
+    state = new_state(ideas=ideas, selected_idea=ideas[1])
+    fingerprint = state.fingerprint()
+
+    # Fingerprint caches are not content
+    assert state == new_state(ideas=ideas, selected_idea=ideas[1], run_id=state.run_id)
+    clone = pickle.loads(pickle.dumps(state))
+    assert clone == state and clone.fingerprint() == fingerprint
+
+    # The clone's ideas are linked to the clone only
+    clone.ideas[0].title = "Renamed"
+    assert clone.fingerprint() != fingerprint and state.fingerprint() == fingerprint
+    assert clone.fingerprint() == revalidated(clone).fingerprint()
+
+
+def test_selected_idea_must_match_an_idea(new_state):
+    rng = random.Random(1)
+    ideas = [fake_idea(rng) for _ in range(3)]
+    # An equal idea that is not one of the listed objects is accepted
+    state = new_state(ideas=ideas, selected_idea=revalidated(ideas[1]))
+
+    with pytest.raises(ValidationError):
+        new_state(ideas=ideas, selected_idea=ideas[1].model_copy(update={"title": "Changed"}))
+
+    # Changing the listed idea after selection is caught by the next validation
+    ideas[1].title = "Changed"
+    with pytest.raises(ValidationError):
+        state.current_step = "idea_selected"
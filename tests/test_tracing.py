@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+import tracing
+from tracing import TraceExporter, load_trace, self_times, set_exporter, span, use_tracing
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = TraceExporter(str(tmp_path), max_pending_age=60, clock=Clock())
+    set_exporter(exporter)
+    yield exporter
+    set_exporter(None)
+
+
+def test_tracing_is_off_by_default(exporter, tmp_path):
+    assert not tracing.TRACING_ENABLED
+    with span("run", run_id="off") as root:
+        root.set_attributes(ignored=1)
+    assert root is tracing._NOOP_SPAN and not list(tmp_path.iterdir())
+
+
+def test_enabled_trace_is_written_with_nested_spans(exporter):
+    with use_tracing(True):
+        with span("run", run_id="on", topic="Graph"):
+            with span("node", stage="completion"):
+                tracing.set_attributes(tokens=3)
+            with pytest.raises(ValueError), span("node"):
+                raise ValueError("failed")
+
+    spans = load_trace("on", exporter.directory)
+    root = next(item for item in spans if item.name == "run")
+    assert root.attributes == {"run_id": "on", "topic": "Graph"}
+    assert {item.parent_id for item in spans if item.name == "node"} == {root.span_id}
+    assert [row["errors"] for row in self_times(spans) if row["name"] == "node"] == [1]
+    assert not exporter._pending and not exporter._first_seen
+
+
+def test_spans_of_unfinished_traces_are_dropped_when_stale(exporter):
+    finish_root = threading.Event()
+
+    def orphaned_run():
+        with use_tracing(True), span("run", run_id="stale"):
+            with span("node"):
+                pass
+            finish_root.wait()
+
+    thread = threading.Thread(target=orphaned_run)
+    thread.start()
+    while not exporter._pending:
+        pass
+    exporter.clock.now = 61
+    with use_tracing(True), span("other", run_id="fresh"):
+        pass
+
+    assert not exporter._pending and not exporter._first_seen
+    finish_root.set()
+    thread.join()
+    assert [item.name for item in load_trace("stale", exporter.directory)] == ["run"]
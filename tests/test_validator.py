@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from validator import bounds_envelope, check_envelope, parse_declared_bounds
+
+
+def envelope(constraints):
+    return bounds_envelope(parse_declared_bounds(constraints))
+
+
+@pytest.mark.parametrize("constraints, expected", [
+    ("1 ≤ T ≤ 10, 1 ≤ n ≤ 2 \\cdot 10^5", (1, 200_000)),
+    ("$1 \\le t \\le 10^4$\n$2 \\le n \\le 2 \\cdot 10^5$", (1, 200_000)),
+    ("$1 \\leq n \\leq 10^5$, $0 \\leq a_i < 2^{30}$", (0, 2 ** 30)),
+    ("1 <= n <= 10^5; -10^9 <= a_i <= 10^9", (-10 ** 9, 10 ** 9)),
+    ("1 ≤ n, q ≤ 2 \\times 10^5", (1, 200_000)),
+    ("$1 \\le a_1, a_2, \\ldots, a_n \\le 10^9$", (1, 10 ** 9)),
+    ("1 ≤ m ≤ n ≤ 10^5", (1, 100_000)),
+    ("1 ≤ x ≤ 10^9 + 7", (1, 10 ** 9 + 7)),
+    ("1 ≤ n ≤ 10^{18}", (1, 10 ** 18)),
+    ("2 ≤ n ≤ 2·10^5. It is guaranteed that the sum of n over all test cases does not exceed 2·10^5.", (2, 200_000)),
+])
+def test_statement_constraints(constraints, expected):
+    assert envelope(constraints) == expected
+
+
+def test_sum_of_prose_bounds_only_from_above():
+    assert envelope("1 ≤ n ≤ 2·10^5, the sum of n ≤ 2·10^5") == (1, 200_000)
+    assert envelope("the sum of n ≤ 2·10^5") == (-math.inf, 200_000)
+
+
+@pytest.mark.parametrize("constraints", [
+    "n + m ≤ 10",
+    "2n ≤ 10^5",
+    "1 ≤ k ≤ n, m ≤ 7",
+    "1 ≤ n ≤ 10^5, 1 ≤ f(n) ≤ 5",
+])
+def test_unclear_relations_fail_open(constraints):
+    assert envelope(constraints) == (-math.inf, math.inf)
+
+
+def test_resource_limits_and_lengths_are_ignored():
+    assert envelope("1 ≤ |s| ≤ 10^5, time limit ≤ 2s") == (-math.inf, math.inf)
+    assert envelope("1 ≤ n ≤ 100, memory ≤ 256") == (1, 100)
+
+
+def test_lower_bound_only_is_open_above():
+    assert envelope("n ≥ 1") == (1, math.inf)
+
+
+def test_max_test_within_mixed_latex_constraints_is_accepted():
+    low, high = envelope("1 ≤ T ≤ 10, 1 ≤ n ≤ 2 \\cdot 10^5")
+    assert check_envelope("1\n150000\n", low, high).valid
+    assert not check_envelope("1\n200001\n", low, high).valid